@@ -1,11 +1,16 @@
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict
-from app.config import serper_api_key, baidu_appbuilder_api_key
-from app.providers.serper import search_serper
+from typing import List, Dict, Optional, Set
+from app.config import serper_api_key, baidu_appbuilder_api_key, search_hedge_delay_seconds, search_hedge_paid, search_min_results
+from app.providers.serper import search_serper, serper_quota_available
 from app.providers.rss import fetch_rss_items
 from app.providers.wiki import search_wiki
-from app.providers.baidu_ai import search_baidu_ai
-from app.providers.meili import search_documents
+from app.providers.baidu_ai import search_baidu_ai, baidu_quota_available
+from app.providers.meili import search_documents, upsert_documents
+from app.utils.canonical import canonicalize_items, url_key
+from app.utils.deadline import Deadline, budget_timeout
+from app.utils.hedge import Candidate, hedged_race
+from app.utils.timeparse import stamp_items, within
 from urllib.parse import quote
 
 
@@ -16,90 +21,152 @@ class QueryAgent:
     - 未来可以替换为合规的数据源（RSS、官方 API、内部库）。
     """
 
-    def search(self, topic: str, max_items: int = 6, use_mock: bool = False, source: str = "rss") -> List[Dict]:
+    def search(self, topic: str, max_items: int = 6, use_mock: bool = False, source: str = "rss", deadline: Optional[Deadline] = None, since_ts: Optional[int] = None) -> List[Dict]:
         """
         获取真实数据 URL：
         - source='rss'：从免费 RSS 源（含 RSSHub 公共实例）拉取并按 query 过滤
         - source='wiki'：从中文维基百科搜索 API 获取页面 URL
         - source='serper'：使用 Serper.dev 搜索（需要 SERPER_API_KEY）
+        各数据源按优先级对冲竞速（见 app/utils/hedge.py）：主源超过 SEARCH_HEDGE_DELAY_S 未给出
+        合格结果（至少 SEARCH_MIN_RESULTS 条）或返回空时启动下一个兜底源，先合格者胜出；
+        落败但仍完成的结果写入自建索引做预热。按次计费的兜底源（百度AI搜索、Serper）默认不参与计时对冲，
+        只在前面的数据源全部返回空或失败后才调用（SEARCH_HEDGE_PAID=1 时照常对冲）；所选 source 本身不受此限。
+        source='rss' 时维基同样只作兜底：RSS 主源（先做维基联想再逐词拉取）通常慢于对冲延迟，计时对冲会让百科链接抢先胜出。
+        传入 deadline 时，各数据源的超时压缩到剩余预算内，预算耗尽后不再等待。
+        素材统一补上 published_ts；传入 since_ts 时各数据源尽量在源头按时间过滤（RSS 评分前、Meilisearch 范围过滤、
+        百度AI搜索时效参数），返回前再统一剔除窗口外的素材，竞速的“合格”以剔除后的条数为准。
         """
-        # 若已配置自建索引，优先从索引检索
-        try:
-            indexed_items = search_documents(query=topic, limit=max_items, filter_topic=topic)
-            if indexed_items:
-                return indexed_items[:max_items]
-        except Exception:
-            pass
+        candidates = [("meili", lambda: search_documents(query=topic, limit=max_items, filter_topic=topic, since_ts=since_ts))]
+        candidates.extend(self._fallbacks(topic, max_items, source, deadline, since_ts))
+        candidates = [(name, self._windowed(fn, since_ts)) for name, fn in candidates]
+        min_results = min(search_min_results(), max_items)
+        _, items = hedged_race(
+            candidates,
+            hedge_delay=search_hedge_delay_seconds(),
+            accept=lambda res: len(res) >= min_results,
+            deadline=deadline,
+            on_late_result=lambda name, res: self._warm_index(name, res, topic),
+            fallback_only=self._fallback_only(source),
+        )
+        # 入库前统一规范化 URL 并去重，下游缓存、索引与增量状态都以规范化 URL 为准
+        return canonicalize_items(items)[:max_items]
 
+    @staticmethod
+    def _fallback_only(source: str) -> Set[str]:
+        """不参与计时对冲、只在前面的数据源全部落空后才启动的候选。"""
+        names = set() if search_hedge_paid() else {"baidu", "serper"}
         if source == "rss":
-            # 基于中文维基做联想扩展，提升相关素材覆盖
-            wiki_related = search_wiki(query=topic, num=5)
-            related_terms = [topic]
-            for w in wiki_related[:3]:
-                t = (w.get("title") or "").strip()
-                if t and t not in related_terms:
-                    related_terms.append(t)
+            names.add("wiki")
+        return names - {source}
+
+    @staticmethod
+    def _windowed(fn, since_ts: Optional[int]):
+        def run() -> List[Dict]:
+            return [it for it in stamp_items(fn()) if within(it, since_ts)]
+        return run
 
-            aggregated: List[Dict] = []
-            per_term_limit = max(2, max_items // max(1, len(related_terms)))
-            for term in related_terms:
-                term_items = fetch_rss_items(query=term, max_items=per_term_limit)
-                # 追加并去重（按URL）
-                for it in term_items:
-                    if it.get("url") and all(it.get("url") != x.get("url") for x in aggregated):
-                        aggregated.append(it)
-                if len(aggregated) >= max_items:
-                    break
+    @staticmethod
+    def _baidu_recency(since_ts: Optional[int]) -> str:
+        # 百度AI搜索只支持固定档位：取覆盖时间窗口的最小档，其余由本地过滤
+        days = (time.time() - since_ts) / 86400 if since_ts else 30
+        for recency, limit in (("week", 7), ("month", 30), ("semiyear", 180)):
+            if days <= limit:
+                return recency
+        return "year"
 
-            # 若聚合仍为空，优先使用百度AI搜索（若已配置），再回退到wiki；都无则返回最新RSS（不筛选）
-            if not aggregated:
-                baidu_key = baidu_appbuilder_api_key()
-                if baidu_key:
-                    baidu_items = search_baidu_ai(topic, api_key=baidu_key, top_k=max_items)
-                    if baidu_items:
-                        return baidu_items
-                wiki_items = search_wiki(query=topic, num=max_items)
-                if wiki_items:
-                    return wiki_items
-                return fetch_rss_items(query="", max_items=max_items)
-            return aggregated[:max_items]
+    def _fallbacks(self, topic: str, max_items: int, source: str, deadline: Optional[Deadline], since_ts: Optional[int] = None) -> List[Candidate]:
+        """按优先级返回 source 对应的候选数据源 [(名称, 无参调用)]。"""
+        timeout = lambda: budget_timeout(deadline, 10)
+        # 百度AI搜索配额耗尽且无缓存时视为不可用，直接改用更便宜的数据源
+        recency = self._baidu_recency(since_ts)
+        baidu_key = baidu_appbuilder_api_key()
+        if baidu_key and not baidu_quota_available(topic, max_items, recency=recency):
+            baidu_key = ""
+        baidu = ("baidu", lambda: search_baidu_ai(topic, api_key=baidu_key, top_k=max_items, recency=recency, timeout=timeout()))
+        wiki = ("wiki", lambda: search_wiki(query=topic, num=max_items, timeout=timeout()))
+        rss = ("rss", lambda: fetch_rss_items(query=topic, max_items=max_items, deadline=deadline, since_ts=since_ts))
+
+        if source == "rss":
+            # 聚合为空时：百度AI搜索（若已配置）→ wiki → 最新RSS（不筛选）
+            out: List[Candidate] = [("rss", lambda: self._search_rss_expanded(topic, max_items, deadline, since_ts))]
+            if baidu_key:
+                out.append(baidu)
+            out.append(wiki)
+            out.append(("rss_latest", lambda: fetch_rss_items(query="", max_items=max_items, deadline=deadline, since_ts=since_ts)))
+            return out
         elif source == "wiki":
-            return search_wiki(query=topic, num=max_items)
+            return [wiki]
         elif source == "jina":
-            # 仅使用 Jina Reader：不做搜索，只构造维基百科页面URL供后续正文抽取
-            enc = quote(topic, safe="")
-            items: List[Dict] = []
-            items.append({
-                "title": f"维基百科：{topic}",
-                "summary": "",
-                "source": "Jina Reader",
-                "published_at": None,
-                "url": f"https://zh.wikipedia.org/wiki/{enc}",
-            })
-            # 备用英文维基
-            items.append({
-                "title": f"Wikipedia: {topic}",
-                "summary": "",
-                "source": "Jina Reader",
-                "published_at": None,
-                "url": f"https://en.wikipedia.org/wiki/{enc}",
-            })
-            return items[:max_items]
+            return [("jina", lambda: self._jina_items(topic, max_items))]
         elif source == "serper":
             api_key = serper_api_key()
             if not api_key:
                 return []
-            return search_serper(topic, api_key=api_key, num=max_items)
+            if not serper_quota_available(topic, max_items):
+                return [rss]
+            return [("serper", lambda: search_serper(topic, api_key=api_key, num=max_items, timeout=timeout()))]
         elif source == "baidu":
-            api_key = baidu_appbuilder_api_key()
-            if not api_key:
+            if not baidu_appbuilder_api_key():
                 return []
-            return search_baidu_ai(topic, api_key=api_key, top_k=max_items)
+            return [baidu] if baidu_key else [rss]
 
         # 默认兜底：RSS；若配置了百度AI搜索则增强兜底
-        api_key = baidu_appbuilder_api_key()
-        if api_key:
-            items = search_baidu_ai(topic, api_key=api_key, top_k=max_items)
-            if items:
-                return items
-        return fetch_rss_items(query=topic, max_items=max_items)
\ No newline at end of file
+        out = [baidu] if baidu_key else []
+        out.append(rss)
+        return out
+
+    def _search_rss_expanded(self, topic: str, max_items: int, deadline: Optional[Deadline], since_ts: Optional[int] = None) -> List[Dict]:
+        # 基于中文维基做联想扩展，提升相关素材覆盖
+        wiki_related = search_wiki(query=topic, num=5, timeout=budget_timeout(deadline, 10))
+        related_terms = [topic]
+        for w in wiki_related[:3]:
+            t = (w.get("title") or "").strip()
+            if t and t not in related_terms:
+                related_terms.append(t)
+
+        aggregated: List[Dict] = []
+        seen = set()
+        per_term_limit = max(2, max_items // max(1, len(related_terms)))
+        for term in related_terms:
+            if deadline is not None and deadline.expired():
+                break
+            term_items = fetch_rss_items(query=term, max_items=per_term_limit, deadline=deadline, since_ts=since_ts)
+            # 追加并去重（按规范化URL）
+            for it in term_items:
+                key = url_key(it.get("url") or "")
+                if key and key not in seen:
+                    seen.add(key)
+                    aggregated.append(it)
+            if len(aggregated) >= max_items:
+                break
+        return aggregated[:max_items]
+
+    def _jina_items(self, topic: str, max_items: int) -> List[Dict]:
+        # 仅使用 Jina Reader：不做搜索，只构造维基百科页面URL供后续正文抽取
+        enc = quote(topic, safe="")
+        items: List[Dict] = []
+        items.append({
+            "title": f"维基百科：{topic}",
+            "summary": "",
+            "source": "Jina Reader",
+            "published_at": None,
+            "url": f"https://zh.wikipedia.org/wiki/{enc}",
+        })
+        # 备用英文维基
+        items.append({
+            "title": f"Wikipedia: {topic}",
+            "summary": "",
+            "source": "Jina Reader",
+            "published_at": None,
+            "url": f"https://en.wikipedia.org/wiki/{enc}",
+        })
+        return items[:max_items]
+
+    def _warm_index(self, name: str, items: List[Dict], topic: str):
+        # 落败源的结果写入自建索引，下次检索可直接命中（未配置 Meilisearch 时为空操作）
+        if name == "meili" or not items:
+            return
+        try:
+            upsert_documents(canonicalize_items(items), topic=topic)
+        except Exception:
+            pass
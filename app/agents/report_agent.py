@@ -1,12 +1,23 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from collections import Counter
 import re
+from app.utils import corpus_stats
+from app.utils.canonical import content_digest, url_key
+from app.utils.pool import map_chunked
+
+# 极简中文切词：按非中文字符做分割
+_RE_HAN = re.compile(r"[\u4e00-\u9fff]{1,}")
+
+
+def _tokenize_batch(texts: List[str]) -> List[List[str]]:
+    """批量分词；作为进程池任务时一次处理一批文本，摊薄进程间通信开销。"""
+    return [_RE_HAN.findall(t or "") for t in texts]
 
 
 class ReportAgent:
     """
     报告生成代理（POC 版）：
-    - 关键词统计（基于简单分词/规则）
+    - 关键词统计（基于简单分词/规则），按语料文档频率做 TF-IDF 排序
     - 倾向性（正/负词表的粗略比例）
     - 摘要与建议（规则模板）
     """
@@ -15,33 +26,72 @@ class ReportAgent:
     NEGATIVE_WORDS = {"差", "贵", "复杂", "问题", "故障", "不满", "质疑", "风险", "延迟"}
 
     def _tokenize(self, text: str) -> List[str]:
-        # 极简中文切词：按非中文字符做分割
-        tokens = re.findall(r"[\u4e00-\u9fff]{1,}", text)
-        return tokens
+        return _RE_HAN.findall(text)
 
-    def _extract_keywords(self, items: List[Dict], top_k: int = 10) -> List[Dict]:
+    def _tokenize_many(self, texts: List[str]) -> List[List[str]]:
+        # 开启进程池时分块并行切词，否则在当前线程执行
+        return map_chunked(_tokenize_batch, texts)
+
+    def _keyword_counts(self, items: List[Dict]) -> Counter:
         c = Counter()
+        # 优先使用正文，其次摘要，再次标题
+        fields = []
         for it in items:
-            # 优先使用正文，其次摘要，再次标题
-            for field in [it.get("content", ""), it.get("summary", ""), it.get("title", "")]:
-                for t in self._tokenize(field):
-                    if len(t) >= 2:
-                        c[t] += 1
-        most = c.most_common(top_k)
-        return [{"word": w, "count": cnt} for w, cnt in most]
-
-    def _sentiment_score(self, items: List[Dict]) -> Dict:
-        pos, neg = 0, 0
+            fields.extend([it.get("content", ""), it.get("summary", ""), it.get("title", "")])
+        for tokens in self._tokenize_many(fields):
+            for t in tokens:
+                if len(t) >= 2:
+                    c[t] += 1
+        return c
+
+    @staticmethod
+    def _keywords_from(counts: Counter, top_k: int = 10) -> List[Dict]:
+        """词频 × 语料 IDF 排序：泛用词在各类素材中都出现，权重被压低。只查本次出现过的词，与语料规模无关。"""
+        idf = corpus_stats.idf_weights(counts)
+        ranked = sorted(counts.items(), key=lambda kv: (kv[1] * idf[kv[0]], kv[1]), reverse=True)[:top_k]
+        return [{"word": w, "count": cnt, "weight": round(cnt * idf[w], 2)} for w, cnt in ranked]
+
+    def observe(self, items: List[Dict]) -> int:
+        """素材入库时计入语料文档频率（按规范化 URL 去重，无 URL 时按标题+摘要），返回新计入的条数。"""
+        keys, texts = [], []
         for it in items:
-            text = (it.get("content", "") or (it.get("title", "") + " " + it.get("summary", "")))
-            tokens = set(self._tokenize(text))
-            pos += len(tokens & self.POSITIVE_WORDS)
-            neg += len(tokens & self.NEGATIVE_WORDS)
+            url = it.get("url") or it.get("link")
+            keys.append(url_key(url) if url else content_digest(f"{it.get('title', '')} {it.get('summary', '')}"))
+            texts.append(" ".join((it.get("content") or "", it.get("summary") or "", it.get("title") or "")))
+        terms = ([t for t in toks if len(t) >= 2] for toks in self._tokenize_many(texts))
+        return corpus_stats.add_documents(zip(keys, terms))
+
+    def sentiment_per_item(self, items: List[Dict]) -> List[Tuple[int, int]]:
+        """逐条素材的正/负情感词命中数（同一词在一条素材内只计一次）。"""
+        texts = [
+            (it.get("content", "") or (it.get("title", "") + " " + it.get("summary", "")))
+            for it in items
+        ]
+        out = []
+        for toks in self._tokenize_many(texts):
+            tokens = set(toks)
+            out.append((len(tokens & self.POSITIVE_WORDS), len(tokens & self.NEGATIVE_WORDS)))
+        return out
+
+    def sentiment_counts(self, items: List[Dict]) -> Tuple[int, int]:
+        pairs = self.sentiment_per_item(items)
+        return sum(p for p, _ in pairs), sum(n for _, n in pairs)
+
+    @staticmethod
+    def _sentiment_from(pos: int, neg: int) -> Dict:
         total = max(pos + neg, 1)
         score = (pos - neg) / total
         tendency = "偏积极" if score > 0.2 else ("偏消极" if score < -0.2 else "中性")
         return {"positive": pos, "negative": neg, "score": round(score, 3), "tendency": tendency}
 
+    def score_items(self, items: List[Dict]) -> Dict:
+        """
+        一批素材对关键词与情感的可加贡献：{keywords: Counter, positive, negative}。
+        两者都按素材逐条累加，增量分析只需对新素材打分后与历史合计相加。
+        """
+        pos, neg = self.sentiment_counts(items)
+        return {"keywords": self._keyword_counts(items), "positive": pos, "negative": neg}
+
     def _make_summary(self, topic: str, items: List[Dict]) -> str:
         if not items:
             return f"围绕‘{topic}’暂未检索到有效素材，建议补充数据源或扩大时间窗口。"
@@ -65,9 +115,12 @@ class ReportAgent:
             actions.append("对中性议题进行深挖，发掘可转化的增长点。")
         return actions
 
-    def generate_report(self, topic: str, items: List[Dict]) -> Dict:
-        keywords = self._extract_keywords(items, top_k=10)
-        sentiment = self._sentiment_score(items)
+    def generate_report(self, topic: str, items: List[Dict], scores: Optional[Dict] = None) -> Dict:
+        """scores 为 score_items 格式的（合并后）合计；缺省时按 items 现算。"""
+        if scores is None:
+            scores = self.score_items(items)
+        keywords = self._keywords_from(scores["keywords"], top_k=10)
+        sentiment = self._sentiment_from(scores["positive"], scores["negative"])
         summary = self._make_summary(topic, items)
         actions = self._make_actions(topic, sentiment)
         return {
@@ -76,4 +129,4 @@ class ReportAgent:
             "sentiment": sentiment,
             "items": items,
             "actions": actions,
-        }
\ No newline at end of file
+        }
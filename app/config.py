@@ -44,4 +44,288 @@ def trend_platform_whitelist() -> list[str]:
         if p not in seen:
             wl.append(p)
             seen.add(p)
-    return wl
\ No newline at end of file
+    return wl
+
+def _get_int(key: str, default: int) -> int:
+    raw = get_env(key, "")
+    try:
+        return int(raw) if raw.strip() else default
+    except ValueError:
+        return default
+
+
+# CPU 密集阶段（RSS 解析/相关性评分/分词）的进程池配置
+def cpu_pool_workers() -> int:
+    """
+    从环境变量 CPU_POOL_WORKERS 读取进程池大小。
+    默认 0 表示关闭，全部在请求线程内执行；设为 -1 则使用全部 CPU 核数。
+    """
+    n = _get_int("CPU_POOL_WORKERS", 0)
+    if n < 0:
+        n = os.cpu_count() or 1
+    return n
+
+
+def cpu_pool_chunk_size() -> int:
+    """每个进程池任务携带的条目数（CPU_POOL_CHUNK_SIZE），用于摊薄进程间通信开销。"""
+    return max(1, _get_int("CPU_POOL_CHUNK_SIZE", 64))
+
+
+def rss_relevance_engine() -> str:
+    """
+    RSS 相关性评分引擎（RSS_RELEVANCE_ENGINE）：
+    - ngram（默认）：整 feed 批量评分，哈希字符 n-gram 余弦相似度
+    - difflib：逐条 SequenceMatcher 评分（旧实现）
+    """
+    return (get_env("RSS_RELEVANCE_ENGINE", "ngram") or "ngram").strip().lower()
+
+
+def upstream_override() -> str:
+    """
+    UPSTREAM_OVERRIDE：将所有上游请求改写到指定基址（如本地桩服务 http://127.0.0.1:8765 ），
+    形如 https://rsshub.app/36kr/newsflashes -> {base}/rsshub.app/36kr/newsflashes，用于离线基准与联调。
+    """
+    return get_env("UPSTREAM_OVERRIDE", "").strip().rstrip("/")
+
+
+# 按需请求剖析（/analyze、/export 的 profile 参数）
+def profiling_enabled() -> bool:
+    """PROFILING_ENABLED=1 时才允许请求携带 profile 参数开启剖析；默认关闭。"""
+    return get_env("PROFILING_ENABLED", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def profiling_top_n() -> int:
+    return max(1, _get_int("PROFILING_TOP_N", 30))
+
+
+def profiling_sample_interval_ms() -> int:
+    """采样剖析的采样间隔（毫秒）。"""
+    return max(1, _get_int("PROFILING_SAMPLE_INTERVAL_MS", 5))
+
+
+# 渲染子系统
+def template_cache_dir() -> str:
+    """Jinja2 字节码缓存目录（TEMPLATE_CACHE_DIR），为空字符串时关闭磁盘字节码缓存。"""
+    import tempfile
+    return get_env("TEMPLATE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "weiyu_jinja_cache"))
+
+
+def export_cache_size() -> int:
+    """按内容哈希缓存的导出产物（HTML/Markdown）条数上限（EXPORT_CACHE_SIZE）。"""
+    return max(1, _get_int("EXPORT_CACHE_SIZE", 64))
+
+
+def fast_budget_seconds() -> float:
+    """快速模式的请求总时间预算（FAST_BUDGET_S，秒），各阶段按比例分配。"""
+    raw = get_env("FAST_BUDGET_S", "")
+    try:
+        return max(0.2, float(raw)) if raw.strip() else 2.5
+    except ValueError:
+        return 2.5
+
+
+# 检索兜底的对冲（hedging）策略
+def search_hedge_delay_seconds() -> float:
+    """主数据源在 SEARCH_HEDGE_DELAY_S 秒内未给出合格结果时，启动下一个兜底源（默认 0.8）。"""
+    raw = get_env("SEARCH_HEDGE_DELAY_S", "")
+    try:
+        return max(0.0, float(raw)) if raw.strip() else 0.8
+    except ValueError:
+        return 0.8
+
+
+def search_hedge_paid() -> bool:
+    """按次计费的数据源（百度AI搜索、Serper）作为兜底时是否参与计时对冲（SEARCH_HEDGE_PAID=1）；默认只在所选数据源返回空或失败后才调用。"""
+    return get_env("SEARCH_HEDGE_PAID", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def search_min_results() -> int:
+    """合格结果的最少条数（SEARCH_MIN_RESULTS，默认 1）。"""
+    return max(1, _get_int("SEARCH_MIN_RESULTS", 1))
+
+
+# 上游健康度与熔断
+def breaker_failure_threshold() -> int:
+    """连续失败多少次后打开熔断（BREAKER_FAILURE_THRESHOLD，默认 3）。"""
+    return max(1, _get_int("BREAKER_FAILURE_THRESHOLD", 3))
+
+
+def breaker_cooldown_seconds() -> float:
+    """熔断打开后首次后台探测前的冷却时间（BREAKER_COOLDOWN_S，默认 30 秒，探测失败则翻倍）。"""
+    raw = get_env("BREAKER_COOLDOWN_S", "")
+    try:
+        return max(1.0, float(raw)) if raw.strip() else 30.0
+    except ValueError:
+        return 30.0
+
+
+# 检索结果缓存与付费数据源配额
+_SEARCH_CACHE_TTL_DEFAULTS = {"baidu": 6 * 3600, "serper": 6 * 3600}
+_SEARCH_DAILY_QUOTA_DEFAULTS = {"baidu": 100}
+
+
+def search_cache_ttl_seconds(provider: str) -> int:
+    """检索结果新鲜期：SEARCH_CACHE_TTL_<PROVIDER>_S > SEARCH_CACHE_TTL_S > 内置默认（付费源 6 小时，其余 1 小时）。"""
+    specific = _get_int(f"SEARCH_CACHE_TTL_{provider.upper()}_S", -1)
+    if specific >= 0:
+        return specific
+    return max(0, _get_int("SEARCH_CACHE_TTL_S", _SEARCH_CACHE_TTL_DEFAULTS.get(provider, 3600)))
+
+
+def search_cache_stale_seconds() -> int:
+    """过期结果在配额紧张或上游失败时仍可兜底返回的最长保留时间（SEARCH_CACHE_STALE_S，默认 7 天）。"""
+    return max(0, _get_int("SEARCH_CACHE_STALE_S", 7 * 86400))
+
+
+def search_daily_quota(provider: str) -> int:
+    """付费数据源每日调用配额（<PROVIDER>_DAILY_QUOTA，0 表示不限；百度AI搜索默认 100）。"""
+    return max(0, _get_int(f"{provider.upper()}_DAILY_QUOTA", _SEARCH_DAILY_QUOTA_DEFAULTS.get(provider, 0)))
+
+
+def data_dir() -> str:
+    """本地持久化数据目录（DATA_DIR，默认 ./data），如维基浏览量日数据库。"""
+    return get_env("DATA_DIR", "data") or "data"
+
+
+def trend_snapshot_interval_seconds() -> int:
+    """同一平台热榜快照的最小记录间隔（TREND_SNAPSHOT_INTERVAL_S，默认 300 秒，与热榜缓存一致）。"""
+    return max(0, _get_int("TREND_SNAPSHOT_INTERVAL_S", 300))
+
+
+def term_dictionary_path() -> str:
+    """检索词扩展词典（别名/同义词/修饰词，JSON）路径（TERM_DICT_PATH），修改后自动热加载。"""
+    return get_env("TERM_DICT_PATH", "config/term_dictionary.json") or "config/term_dictionary.json"
+
+
+def topic_state_max_items() -> int:
+    """增量分析每个话题保留用于展示的最近素材条数（TOPIC_STATE_MAX_ITEMS，默认 200；聚合统计不受此限）。"""
+    return max(1, _get_int("TOPIC_STATE_MAX_ITEMS", 200))
+
+
+def monitor_enabled() -> bool:
+    """是否随 Web 服务启动话题监控（MONITOR_ENABLED，默认关闭；也可用 python -m app.monitor 单独运行）。"""
+    return (get_env("MONITOR_ENABLED", "") or "").lower() in ("1", "true", "yes", "on")
+
+
+def monitor_interval_seconds() -> int:
+    """话题监控拉取周期（MONITOR_INTERVAL_S，默认 300 秒，与 feed 缓存一致）。"""
+    return max(10, _get_int("MONITOR_INTERVAL_S", 300))
+
+
+def monitor_z_threshold() -> float:
+    """突增告警的 z 分数阈值（MONITOR_Z_THRESHOLD，默认 3.0）。"""
+    raw = get_env("MONITOR_Z_THRESHOLD", "")
+    try:
+        return max(0.5, float(raw)) if raw.strip() else 3.0
+    except ValueError:
+        return 3.0
+
+
+def monitor_min_mentions() -> int:
+    """触发告警的单周期最少提及数，避免冷门话题 0→1 的波动告警（MONITOR_MIN_MENTIONS，默认 3）。"""
+    return max(1, _get_int("MONITOR_MIN_MENTIONS", 3))
+
+
+def watchlist_topics() -> list[str]:
+    """初始关注话题（WATCHLIST，逗号分隔）；运行中通过 /monitor/topics 增删的话题另存于 DATA_DIR。"""
+    return [t.strip() for t in (get_env("WATCHLIST", "") or "").split(",") if t.strip()]
+
+
+def reader_backend() -> str:
+    """正文抽取方式（READER_BACKEND）：auto（默认，本地抽取失败再用 Jina Reader）、local、jina。"""
+    v = (get_env("READER_BACKEND", "auto") or "auto").strip().lower()
+    return v if v in ("auto", "local", "jina") else "auto"
+
+
+def corpus_df_buckets() -> int:
+    """语料文档频率表的哈希桶数（CORPUS_DF_BUCKETS，默认 2^20，每桶 4 字节）；修改后重新开始统计。"""
+    return max(1024, _get_int("CORPUS_DF_BUCKETS", 1 << 20))
+
+
+def reader_max_age_days() -> int:
+    """发布时间早于该天数的素材不抽取正文，直接用摘要（READER_MAX_AGE_DAYS，默认 30，0 表示不限）。"""
+    return max(0, _get_int("READER_MAX_AGE_DAYS", 30))
+
+
+def feed_registry_path() -> str:
+    """RSS/热榜源注册表（JSON）路径（FEED_REGISTRY_PATH），修改后自动热加载；文件缺失时使用内置源列表。"""
+    return get_env("FEED_REGISTRY_PATH", "config/feeds.json") or "config/feeds.json"
+
+
+def feed_scheduler_enabled() -> bool:
+    """FEED_SCHEDULER_ENABLED=1 时随 Web 服务启动 feed 后台调度（按注册表的周期预先刷新缓存）；默认关闭。"""
+    return get_env("FEED_SCHEDULER_ENABLED", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def feed_max_inflight() -> int:
+    """feed 调度器全局同时进行的请求数上限（FEED_MAX_INFLIGHT，默认 32）。"""
+    return max(1, _get_int("FEED_MAX_INFLIGHT", 32))
+
+
+def feed_host_concurrency() -> int:
+    """注册表未单独配置的主机，同时进行的 feed 请求数上限（FEED_HOST_CONCURRENCY，默认 2）。"""
+    return max(1, _get_int("FEED_HOST_CONCURRENCY", 2))
+
+
+def feed_host_min_interval_seconds() -> float:
+    """注册表未单独配置的主机，相邻两次 feed 请求的最小间隔（FEED_HOST_MIN_INTERVAL_S，默认 0.5 秒）。"""
+    raw = get_env("FEED_HOST_MIN_INTERVAL_S", "")
+    try:
+        return max(0.0, float(raw)) if raw.strip() else 0.5
+    except ValueError:
+        return 0.5
+
+
+def cassette_mode() -> str:
+    """上游调用录制/回放（CASSETTE_MODE）：off（默认）、record（照常请求并写入磁带）、replay（只从磁带回放，不访问网络）。"""
+    v = (get_env("CASSETTE_MODE", "off") or "off").strip().lower()
+    return v if v in ("record", "replay") else "off"
+
+
+def cassette_path() -> str:
+    """录制/回放的磁带文件（CASSETTE_PATH，默认 DATA_DIR/cassette.wcr）。"""
+    return get_env("CASSETTE_PATH", "") or os.path.join(data_dir(), "cassette.wcr")
+
+
+def cassette_latency_scale() -> float:
+    """回放耗时相对录制耗时的倍数（CASSETTE_LATENCY_SCALE，默认 1.0 按原始耗时；0 表示不等待）。"""
+    raw = get_env("CASSETTE_LATENCY_SCALE", "")
+    try:
+        return max(0.0, float(raw)) if raw.strip() else 1.0
+    except ValueError:
+        return 1.0
+
+
+def http_max_connections() -> int:
+    """进程内共享 HTTP 客户端的连接池上限（HTTP_MAX_CONNECTIONS，默认 64，其中至多一半保持空闲长连接）。"""
+    return max(1, _get_int("HTTP_MAX_CONNECTIONS", 64))
+
+
+def warmup_enabled() -> bool:
+    """WARMUP_ENABLED=1 时 Web 服务启动时先预热（拉取热榜/RSS、预分析 WARMUP_TOPICS）再就绪；默认关闭。"""
+    return get_env("WARMUP_ENABLED", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def warmup_feeds_enabled() -> bool:
+    """预热时是否先拉取全部热榜/RSS feed（WARMUP_FEEDS，默认开启）；耗时受注册表中各主机的礼貌限速约束。"""
+    return get_env("WARMUP_FEEDS", "1").strip().lower() in ("1", "true", "yes", "on")
+
+
+def warmup_topics() -> list[str]:
+    """启动预热时预先分析的热门话题（WARMUP_TOPICS，逗号分隔），结果进入检索/正文/指标缓存。"""
+    raw = get_env("WARMUP_TOPICS", "")
+    return [t.strip() for t in raw.split(",") if t.strip()]
+
+
+def warmup_source() -> str:
+    """预分析所用的检索来源（WARMUP_SOURCE，默认 baidu，与页面表单默认值一致以命中同一批缓存）。"""
+    return (get_env("WARMUP_SOURCE", "baidu") or "baidu").strip().lower()
+
+
+def warmup_timeout_seconds() -> float:
+    """启动时最多等待预热的时间（WARMUP_TIMEOUT_S，默认 20 秒）；超时后服务照常启动，预热在后台继续，/ready 在完成前返回 503。"""
+    raw = get_env("WARMUP_TIMEOUT_S", "")
+    try:
+        return max(0.0, float(raw)) if raw.strip() else 20.0
+    except ValueError:
+        return 20.0
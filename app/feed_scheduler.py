@@ -0,0 +1,304 @@
+"""
+Feed 后台调度：按注册表（config/feeds.json）中每个 feed 的周期与优先级预先刷新 RSS/热榜缓存，
+请求路径与话题监控随后直接命中缓存，不再在请求内逐个拉取 feed。
+
+- 单个工作线程运行一个 asyncio 事件循环，共享一个 httpx.AsyncClient（连接按主机复用）
+- 到期的 feed 按 (到期时间, -优先级) 出堆；全局并发不超过 FEED_MAX_INFLIGHT，
+  各主机并发不超过其上限，相邻两次请求至少间隔 min_interval（礼貌限速），主机满载时其 feed 顺延到下一轮；
+  主机名额与请求路径、话题监控共用（见 http.host_try_acquire），调度器关闭时缓存未命中的拉取同样受限
+- 下次到期时间从本次开始时间起算（不随耗时漂移），并加 ±10% 抖动错开同周期的 feed
+- 主地址失败或熔断时依次改用注册表配置的镜像（如 RSSHub 其它公共实例）；写入缓存的有效期为两个周期
+
+随 Web 服务启动（FEED_SCHEDULER_ENABLED=1）。单独运行仅用于诊断（拉取结果只写入本进程的缓存，Web 服务读不到）：
+    python -m app.feed_scheduler --once
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.config import feed_max_inflight
+from app.providers import rss, trending
+from app.utils import feed_registry, http
+from app.utils.instrument import gauge_set, inc
+
+_FETCH_TIMEOUT_S = 10.0
+# 空闲时检查注册表变化与停止信号的最长间隔
+_IDLE_TICK_S = 1.0
+_JITTER = 0.1
+
+
+class FeedScheduler:
+    def __init__(self, max_inflight: Optional[int] = None):
+        self.max_inflight = max_inflight or feed_max_inflight()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._heap: List = []
+        self._version = -1
+        self._seq = 0
+        self._inflight = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.max_lag = 0.0
+
+    # ---- feed 集合 ----
+
+    def _sync(self, now: float):
+        """注册表变化时重建任务：同一 url 的 rss/trend 合并为一个任务（取较短周期与较高优先级），已有任务保留到期时间。"""
+        version = feed_registry.version()
+        if version == self._version:
+            return
+        self._version = version
+        merged: Dict[str, Dict] = {}
+        for f in feed_registry.feeds():
+            job = merged.get(f["url"])
+            if job is None:
+                old = self._jobs.get(f["url"], {})
+                merged[f["url"]] = {
+                    "url": f["url"],
+                    "host": f["host"],
+                    "kinds": {f["kind"]},
+                    "interval": f["interval"],
+                    "priority": f["priority"],
+                    "due": old.get("due", now),
+                    "fetches": old.get("fetches", 0),
+                    "failures": old.get("failures", 0),
+                    "last_ok": old.get("last_ok"),
+                    "last_error": old.get("last_error", ""),
+                    "source": old.get("source", ""),
+                }
+            else:
+                job["kinds"].add(f["kind"])
+                job["interval"] = min(job["interval"], f["interval"])
+                job["priority"] = max(job["priority"], f["priority"])
+        with self._lock:
+            self._jobs = merged
+            self._heap = []
+            for job in merged.values():
+                self._push(job)
+        gauge_set("weiyu_feed_registry_feeds", len(merged))
+
+    def _push(self, job: Dict):
+        self._seq += 1
+        heapq.heappush(self._heap, (job["due"], -job["priority"], self._seq, job["url"]))
+
+    def _due_jobs(self, now: float) -> List[Dict]:
+        """取出可立即开始的到期任务（受全局与主机并发约束），主机满载的任务放回堆中。"""
+        ready, deferred = [], []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and self._inflight < self.max_inflight:
+                entry = heapq.heappop(self._heap)
+                job = self._jobs.get(entry[3])
+                if job is None or job["due"] != entry[0]:
+                    continue  # 注册表已变化或已重新排期
+                if not http.host_try_acquire(job["host"]):
+                    deferred.append(entry)
+                    continue
+                self._inflight += 1
+                self.max_lag = max(self.max_lag, now - job["due"])
+                ready.append(job)
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+        return ready
+
+    # ---- 拉取 ----
+
+    async def _polite_wait(self, host: str):
+        delay = http.host_reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _fetch(self, client: httpx.AsyncClient, job: Dict):
+        started = time.time()
+        result = "error"
+        try:
+            await self._polite_wait(job["host"])
+            for i, candidate in enumerate(feed_registry.mirror_urls(job["url"])):
+                try:
+                    resp = await http.aget(client, candidate, timeout=_FETCH_TIMEOUT_S, feed=True)
+                except Exception as e:
+                    job["last_error"] = f"{candidate}: {type(e).__name__}"
+                    continue
+                ttl = job["interval"] * 2
+                if "rss" in job["kinds"]:
+                    rss.store_feed(job["url"], resp.content, ttl)
+                if "trend" in job["kinds"]:
+                    # 解析榜单与写快照是 CPU/磁盘操作，放到线程中执行，不阻塞事件循环
+                    await asyncio.to_thread(trending.store_feed, job["url"], resp.content, ttl)
+                job["last_ok"] = time.time()
+                job["source"] = candidate
+                result = "ok" if i == 0 else "mirror"
+                break
+        finally:
+            job["fetches"] += 1
+            if result == "error":
+                job["failures"] += 1
+            inc("weiyu_feed_fetch_total", result=result)
+            http.host_release(job["host"])
+            with self._lock:
+                self._inflight -= 1
+                if self._jobs.get(job["url"]) is job:
+                    job["due"] = started + job["interval"] * random.uniform(1 - _JITTER, 1 + _JITTER)
+                    self._push(job)
+            if self._wake is not None:
+                self._wake.set()
+
+    def _next_wait(self, now: float) -> float:
+        """到下一个任务到期的时间；堆顶已到期说明其受并发限制，等任务完成时唤醒即可。"""
+        with self._lock:
+            if not self._heap or self._heap[0][0] <= now:
+                return _IDLE_TICK_S
+            return min(_IDLE_TICK_S, self._heap[0][0] - now)
+
+    async def _main(self, once: bool = False):
+        self._wake = asyncio.Event()
+        limits = httpx.Limits(max_connections=self.max_inflight, max_keepalive_connections=self.max_inflight)
+        tasks = set()
+        async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+            if once:
+                self._sync(time.time())
+                with self._lock:
+                    pending = set(self._jobs)
+                    for job in self._jobs.values():
+                        job["due"] = time.time()
+                    self._heap = []
+                    for job in self._jobs.values():
+                        self._push(job)
+            while not self._stop.is_set():
+                now = time.time()
+                if not once:
+                    self._sync(now)
+                for job in self._due_jobs(now):
+                    if once:
+                        pending.discard(job["url"])
+                    task = asyncio.ensure_future(self._fetch(client, job))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                gauge_set("weiyu_feed_inflight", self._inflight)
+                gauge_set("weiyu_feed_lag_seconds", self.max_lag)
+                if once and not pending and not tasks:
+                    break
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._next_wait(now))
+                except asyncio.TimeoutError:
+                    pass
+            for task in list(tasks):
+                task.cancel()
+
+    # ---- 后台运行 ----
+
+    def run_once(self) -> Dict:
+        """每个 feed 拉取一次（同样遵守并发与礼貌限速），返回调度快照。"""
+        asyncio.run(self._main(once=True))
+        return self.snapshot()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            loop.run_until_complete(self._main())
+        finally:
+            loop.close()
+            self._loop = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="weiyu-feeds", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- 查询 ----
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            feeds = sorted(self._jobs.values(), key=lambda j: (-j["priority"], j["url"]))
+            return {
+                "running": self.running,
+                "max_inflight": self.max_inflight,
+                "inflight": self._inflight,
+                "max_lag_seconds": round(self.max_lag, 3),
+                "overdue": sum(1 for j in feeds if j["due"] < now - _IDLE_TICK_S),
+                "hosts": http.host_stats(sorted({j["host"] for j in feeds})),
+                "feeds": [
+                    {
+                        "url": j["url"],
+                        "kinds": sorted(j["kinds"]),
+                        "interval": j["interval"],
+                        "priority": j["priority"],
+                        "next_in": round(j["due"] - now, 1),
+                        "fetches": j["fetches"],
+                        "failures": j["failures"],
+                        "last_ok": j["last_ok"],
+                        "last_error": j["last_error"],
+                        "source": j["source"],
+                    }
+                    for j in feeds
+                ],
+            }
+
+
+_SCHEDULER: Optional[FeedScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> FeedScheduler:
+    """进程内单例：Web 端点与 lifespan 共用。"""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = FeedScheduler()
+        return _SCHEDULER
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Feed registry scheduler (standalone runs are diagnostic only)")
+    ap.add_argument("--once", action="store_true", help="每个 feed 拉取一次后输出快照并退出")
+    ap.add_argument("--max-inflight", type=int, default=None, help="全局并发上限（默认 FEED_MAX_INFLIGHT）")
+    args = ap.parse_args()
+    scheduler = FeedScheduler(max_inflight=args.max_inflight)
+    if args.once:
+        t0 = time.perf_counter()
+        snap = scheduler.run_once()
+        snap["elapsed_seconds"] = round(time.perf_counter() - t0, 3)
+        print(json.dumps(snap, ensure_ascii=False, indent=2))
+        return
+    scheduler.start()
+    try:
+        while scheduler.running:
+            time.sleep(60)
+            snap = scheduler.snapshot()
+            print(json.dumps({k: snap[k] for k in ("inflight", "max_lag_seconds", "overdue")}), flush=True)
+    except KeyboardInterrupt:
+        pass
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,74 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, Response
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from pathlib import Path
-import jinja2
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
+from html import escape
+from typing import Optional
 
-from .orchestrator import Orchestrator
+from .config import feed_scheduler_enabled, monitor_enabled, profiling_enabled, warmup_enabled, warmup_timeout_seconds
+from .feed_scheduler import get_scheduler
+from .monitor import get_monitor
+from .orchestrator import get_orchestrator, lazy_pending_url
+from .render import (
+    ENV, artifact_response, export_report_view, get_artifact, get_report, json_response, project_report, put_artifact,
+    render_html_export, render_markdown, report_digest, store_report,
+)
+from .providers.reader import cached_content, load_content, prefetch_contents
+from .providers.trending import current_events, rank_trajectory, refresh_trends
+from .utils import corpus_stats, health, http, trend_store
+from .utils.instrument import gauge_set, span, render_prometheus
+from .utils.profiling import PROFILE_MODES, RequestProfiler, get_profile, format_table
+from . import warmup
 
 
-app = FastAPI(title="微舆 POC")
+# 进程启动到就绪（预热完成）的耗时，见 /ready
+_STARTUP = {"ready_after_seconds": None}
+
+
+def _on_ready(_=None):
+    # feed 后台调度（FEED_SCHEDULER_ENABLED=1）：按注册表周期预先刷新 RSS/热榜缓存；
+    # 预热已由调度器把每个 feed 拉取一次，调度在其后启动，从排好的下次到期时间继续
+    if feed_scheduler_enabled():
+        get_scheduler().start()
+    uptime = warmup.process_uptime()
+    if uptime is not None:
+        _STARTUP["ready_after_seconds"] = round(uptime, 3)
+        gauge_set("weiyu_startup_seconds", uptime, phase="ready")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 话题监控随服务启停（MONITOR_ENABLED=1）；未开启时 /monitor 端点仍可手动触发单个周期
+    if monitor_enabled():
+        get_monitor().start()
+    warm = None
+    if warmup_enabled():
+        # 预热在线程中执行，启动最多等待 WARMUP_TIMEOUT_S；超时后继续在后台完成，期间 /ready 返回 503
+        warmup.mark_pending()
+        warm = asyncio.ensure_future(asyncio.to_thread(warmup.run))
+        try:
+            await asyncio.wait_for(asyncio.shield(warm), warmup_timeout_seconds())
+        except asyncio.TimeoutError:
+            pass
+    if warm is None or warm.done():
+        _on_ready()
+    else:
+        warm.add_done_callback(_on_ready)
+    yield
+    if warm is not None:
+        warm.remove_done_callback(_on_ready)
+    get_scheduler().stop()
+    get_monitor().stop()
+    corpus_stats.flush()
+    http.close()
+
+
+app = FastAPI(title="微舆 POC", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+templates = Jinja2Templates(env=ENV)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -18,21 +76,213 @@ async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的运行指标：阶段/上游耗时、缓存命中率、线程池排队深度、上游错误数。"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/ready")
+async def readiness():
+    """就绪探针：开启预热（WARMUP_ENABLED=1）时预热完成前返回 503；附预热各阶段耗时与进程启动到就绪的秒数。"""
+    ready = warmup.ready()
+    body = {"ready": ready, "startup": dict(_STARTUP), "warmup": warmup.status()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/health/feeds")
+async def feed_health():
+    """各 RSS/热榜 feed 与上游 host 的健康度：熔断状态、错误率、p50/p95 耗时、下次探测时间。"""
+    return JSONResponse(health.snapshot())
+
+
+@app.get("/feeds/schedule")
+async def feed_schedule():
+    """feed 后台调度状态：各主机并发/限速、各 feed 的周期、优先级、下次刷新倒计时与最近结果。"""
+    return JSONResponse(get_scheduler().snapshot())
+
+
+@app.get("/trends/events")
+def trend_events(min_platforms: int = 2):
+    """当前跨平台热点事件：各平台热榜全部标题聚类后的事件簇（平台集合、各平台最佳排名、原始标题）。"""
+    refresh_trends()
+    return JSONResponse(current_events(min_platforms=max(1, min_platforms)))
+
+
+@app.get("/trends/trajectory")
+def trend_trajectory(topic: str, days: int = 14):
+    """话题在各平台热榜的排名轨迹：首次/最近上榜时间（epoch 秒）、最高排名与逐次快照。"""
+    days = max(1, min(days, 90))
+    return JSONResponse({"topic": topic, "days": days, "platforms": rank_trajectory(topic, days), "store": trend_store.stats()})
+
+
+@app.get("/monitor")
+def monitor_status():
+    """话题监控状态：关注话题的累计提及/情感、EWMA 基线、逐周期历史与最近命中条目。"""
+    return JSONResponse(get_monitor().snapshot())
+
+
+@app.post("/monitor/topics")
+def monitor_add_topic(topic: str = Form(...)):
+    added = get_monitor().add(topic)
+    return JSONResponse({"topic": topic, "added": added, "topics": get_monitor().topics()})
+
+
+@app.delete("/monitor/topics/{topic}")
+def monitor_remove_topic(topic: str):
+    if not get_monitor().remove(topic):
+        raise HTTPException(status_code=404, detail="topic not watched")
+    return JSONResponse({"topic": topic, "removed": True, "topics": get_monitor().topics()})
+
+
+@app.get("/monitor/alerts")
+def monitor_alerts(since: float = 0.0, topic: Optional[str] = None):
+    """提及数或负面情感词数相对 EWMA 基线突增（z 分数超阈值）的告警，按时间升序。"""
+    return JSONResponse({"alerts": get_monitor().alerts(since=since, topic=topic)})
+
+
+@app.post("/monitor/cycle")
+def monitor_cycle():
+    """立即执行一个监控周期（未随服务启动监控时用于手动刷新）。"""
+    return JSONResponse(get_monitor().run_cycle())
+
+
+def _request_profiler(profile: str, label: str) -> Optional[RequestProfiler]:
+    """仅当配置允许且请求显式指定 profile 模式时返回剖析器；否则为 None，请求路径无任何剖析开销。"""
+    mode = (profile or "").strip().lower()
+    if not mode or mode == "off" or not profiling_enabled():
+        return None
+    if mode not in PROFILE_MODES:
+        mode = "cprofile"
+    return RequestProfiler(mode, label=label)
+
+
+def _profile_headers(profiler: RequestProfiler) -> dict:
+    return {"X-Profile-Id": profiler.id, "X-Profile-Url": f"/profile/{profiler.id}"}
+
+
+@app.get("/profile/{profile_id}")
+async def profile_result(profile_id: str, format: str = "table"):
+    """
+    下载剖析结果：format=table（Top-N 文本表）、collapsed（折叠栈，仅 sample 模式）、json。
+    """
+    result = get_profile(profile_id) if profiling_enabled() else None
+    if not result:
+        raise HTTPException(status_code=404, detail="profile not found")
+    if format == "json":
+        return JSONResponse(result)
+    if format == "collapsed":
+        headers = {"Content-Disposition": f"attachment; filename=profile_{profile_id}.collapsed"}
+        return PlainTextResponse(result.get("collapsed") or "", headers=headers)
+    return PlainTextResponse(format_table(result))
+
+
+@app.get("/content")
+def item_content(report_id: str, url: str = "", index: Optional[int] = None):
+    """
+    按需加载延迟加载报告中单条素材的正文（命中缓存或经 Reader 抽取），用于报告页展开素材。
+    素材以 URL 或序号指定，必须在该报告的待抽取列表中，否则返回 404（不替调用方抓取任意 URL）。
+    """
+    url = lazy_pending_url(report_id, url, index)
+    if url is None:
+        raise HTTPException(status_code=404, detail="item not pending in this report")
+    cached = cached_content(url)
+    content = cached if cached is not None else load_content(url, timeout_seconds=6.0, max_chars=4000)
+    return JSONResponse({"url": url, "content": content, "cached": cached is not None})
+
+
+@app.get("/analyze/{report_id}/refine")
+def refine_report(report_id: str):
+    """延迟加载报告：正文就绪后重算关键词、情感与摘要。"""
+    refined = get_orchestrator().refine(report_id)
+    if refined is None:
+        raise HTTPException(status_code=404, detail="report expired")
+    return JSONResponse(refined)
+
+
 @app.post("/analyze", response_class=HTMLResponse)
-async def analyze(request: Request, topic: str = Form(...), source: str = Form("baidu"), fast: str = Form("on")):
-    orchestrator = Orchestrator()
+async def analyze(
+    request: Request,
+    topic: str = Form(...),
+    source: str = Form("baidu"),
+    fast: str = Form("on"),
+    debug: str = Form("off"),
+    profile: str = Form(""),
+    enrich: str = Form("eager"),
+    incremental: str = Form("off"),
+    window_days: int = Form(0),
+):
+    orchestrator = get_orchestrator()
     fast_flag = fast.lower() in ("on", "true", "1", "yes")
-    report = orchestrator.analyze(topic=topic, use_mock=False, source=source, fast=fast_flag)
-    return templates.TemplateResponse(
-        "report.html",
-        {
-            "request": request,
-            "topic": topic,
-            "report": report,
-            "source": source,
-            "fast": fast_flag,
-        },
+    debug_flag = debug.lower() in ("on", "true", "1", "yes")
+    lazy_flag = enrich.lower() == "lazy"
+    incremental_flag = incremental.lower() in ("on", "true", "1", "yes")
+    profiler = _request_profiler(profile, f"/analyze {topic}")
+    with profiler or nullcontext():
+        report = orchestrator.analyze(topic=topic, use_mock=False, source=source, fast=fast_flag, debug=debug_flag, lazy_content=lazy_flag, incremental=incremental_flag, window_days=window_days)
+        store_report(report)
+        # 延迟加载模式：响应发出后再在后台预取正文
+        background = BackgroundTask(prefetch_contents, report["content_pending"]) if report.get("content_pending") else None
+        with span("render"):
+            response = templates.TemplateResponse(
+                "report.html",
+                {
+                    "request": request,
+                    "topic": topic,
+                    "report": report,
+                    "source": source,
+                    "fast": fast_flag,
+                },
+                background=background,
+            )
+    if profiler is None:
+        return response
+    # 将 Top-N 表附在报告页面底部，完整结果可通过 /profile/{id} 下载
+    block = (
+        '<div class="container" style="margin-top: 16px;"><section class="card"><h2>剖析结果</h2>'
+        f'<p><a href="/profile/{profiler.id}">Top-N 表</a>'
+        + (f' | <a href="/profile/{profiler.id}?format=collapsed">折叠栈（火焰图）</a>' if profiler.mode == "sample" else "")
+        + f'</p><pre>{escape(format_table(profiler.result))}</pre></section></div>'
     )
+    html = response.body.decode("utf-8").replace("</body>", block + "</body>", 1)
+    return HTMLResponse(html, headers=_profile_headers(profiler), background=background)
+
+
+@app.post("/api/analyze")
+def api_analyze(
+    request: Request,
+    topic: str = Form(...),
+    source: str = Form("baidu"),
+    fast: str = Form("on"),
+    incremental: str = Form("off"),
+    window_days: int = Form(0),
+    fields: str = "",
+    exclude: str = "",
+    page: int = 1,
+    page_size: int = 20,
+):
+    """JSON 报告：fields/exclude 为逗号分隔的点号路径（如 exclude=items.content），素材按 page/page_size 分页。
+    分析会阻塞，用同步 def 交给线程池执行，避免卡住事件循环。"""
+    report = get_orchestrator().analyze(
+        topic=topic,
+        use_mock=False,
+        source=source,
+        fast=fast.lower() in ("on", "true", "1", "yes"),
+        incremental=incremental.lower() in ("on", "true", "1", "yes"),
+        window_days=window_days,
+    )
+    store_report(report)
+    with span("render"):
+        return json_response(request, project_report(report, fields, exclude, page, page_size))
+
+
+@app.get("/api/reports/{report_id}")
+async def api_report(request: Request, report_id: str, fields: str = "", exclude: str = "", page: int = 1, page_size: int = 20):
+    """按 id 获取已生成的报告（/analyze 与 /api/analyze 均会登记），参数同 /api/analyze；未变化时返回 304。"""
+    report = get_report(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="report expired or not found")
+    return json_response(request, project_report(report, fields, exclude, page, page_size))
 
 
 @app.post("/export")
@@ -42,74 +292,53 @@ async def export_report(
     source: str = Form("baidu"),
     fast: str = Form("off"),
     format: str = Form("html"),
+    debug: str = Form("off"),
+    profile: str = Form(""),
 ):
-    orchestrator = Orchestrator()
+    profiler = _request_profiler(profile, f"/export {topic} {format}")
+    with profiler or nullcontext():
+        response = _build_export(request, topic, source, fast, format, debug)
+    if profiler is not None:
+        response.headers.update(_profile_headers(profiler))
+    return response
+
+
+def _build_export(request: Request, topic: str, source: str, fast: str, format: str, debug: str) -> Response:
+    orchestrator = get_orchestrator()
     fast_flag = fast.lower() in ("on", "true", "1", "yes")
-    report = orchestrator.analyze(topic=topic, use_mock=False, source=source, fast=fast_flag)
+    debug_flag = debug.lower() in ("on", "true", "1", "yes")
+    report = orchestrator.analyze(topic=topic, use_mock=False, source=source, fast=fast_flag, debug=debug_flag)
 
     # 文件名安全化
     safe_topic = "".join(c for c in topic if c.isalnum() or c in ("_", "-")) or "report"
+    fmt = "md" if format.lower() == "md" else "html"
+
+    # 报告内容未变时直接复用已渲染（并已压缩）的产物
+    digest = report_digest(report, topic, source, fast_flag, fmt)
+    art = get_artifact(digest)
+    if art is None:
+        view = export_report_view(report)
+        with span("render"):
+            if fmt == "md":
+                text = render_markdown(topic, view)
+            else:
+                # 默认导出为自包含的静态 HTML：将 CSS 内联
+                text = render_html_export({
+                    "request": request,
+                    "topic": topic,
+                    "report": view,
+                    "source": source,
+                    "fast": fast_flag,
+                })
+        art = put_artifact(digest, fmt, text, f"report_{safe_topic}.{fmt}")
+    return artifact_response(request, digest, art)
+
 
-    if format.lower() == "md":
-        # 生成 Markdown 文本
-        lines = []
-        lines.append(f"# 舆情报告 - {topic}")
-        lines.append("")
-        lines.append(f"生成时间：{report['generated_at']}")
-        lines.append(f"素材条数：{report['stats']['item_count']} | 来源域名数：{report['stats']['domain_count']}")
-        lines.append("")
-        lines.append("## 关键指标")
-        lines.append(f"- 维基浏览量（中文）：{report['metrics'].get('wiki_pageviews_zh', 'N/A')}")
-        lines.append(f"- 维基浏览量（英文）：{report['metrics'].get('wiki_pageviews_en', 'N/A')}")
-        lines.append(f"- RSS 命中条数：{report['metrics'].get('rss_mentions_count', 0)}")
-        if report['metrics'].get('platform_whitelist'):
-            plats = ", ".join(report['metrics']['platform_whitelist'])
-            lines.append(f"- 平台白名单：{plats}")
-        lines.append("")
-        lines.append("## 热点关键词（Top10）")
-        for kw in report.get('keywords', []):
-            lines.append(f"- {kw['word']} x{kw['count']}")
-        lines.append("")
-        lines.append("## 情感/倾向")
-        s = report.get('sentiment', {})
-        lines.append(f"- 积极：{s.get('positive', 0)}；消极：{s.get('negative', 0)}；分值：{s.get('score', 0)}；倾向：{s.get('tendency', 'N/A')}")
-        lines.append("")
-        lines.append("## 平台热榜匹配")
-        ta = report['metrics'].get('trending_agg', {})
-        for key, label in [
-            ('weibo_items', '微博'), ('zhihu_items', '知乎'), ('bilibili_items', '哔哩哔哩'),
-            ('sina_items', '新浪'), ('toutiao_items', '今日头条'), ('douyin_items', '抖音'), ('xiaohongshu_items', '小红书')
-        ]:
-            items = ta.get(key) or []
-            if items:
-                lines.append(f"- {label}热榜匹配：")
-                for it in items:
-                    title = it.get('title', '')
-                    link = it.get('link', '')
-                    lines.append(f"  - [{title}]({link})")
-        lines.append("")
-        lines.append("## 总体摘要")
-        lines.append(report.get('summary', ''))
-        lines.append("")
-        lines.append("## 后续行动建议")
-        for a in report.get('actions', []):
-            lines.append(f"- {a}")
-        md_text = "\n".join(lines)
-        headers = {"Content-Disposition": f"attachment; filename=report_{safe_topic}.md"}
-        return Response(content=md_text, media_type="text/markdown; charset=utf-8", headers=headers)
-
-    # 默认导出为自包含的静态 HTML：将 CSS 内联
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader("templates"), autoescape=True)
-    template = env.get_template("report.html")
-    html = template.render({
-        "request": request,
-        "topic": topic,
-        "report": report,
-        "source": source,
-        "fast": fast_flag,
-    })
-    css_path = Path("static/style.css")
-    css = css_path.read_text(encoding="utf-8") if css_path.exists() else ""
-    html_export = html.replace('<link rel="stylesheet" href="/static/style.css" />', f"<style>\n{css}\n</style>")
-    headers = {"Content-Disposition": f"attachment; filename=report_{safe_topic}.html"}
-    return Response(content=html_export, media_type="text/html; charset=utf-8", headers=headers)
\ No newline at end of file
+@app.get("/reports/{name}")
+async def cached_report(request: Request, name: str):
+    """按内容哈希获取已导出的产物（{digest}.html / {digest}.md），支持 ETag 条件请求与 gzip。"""
+    digest, _, _fmt = name.partition(".")
+    art = get_artifact(digest)
+    if art is None:
+        raise HTTPException(status_code=404, detail="artifact expired or not found")
+    return artifact_response(request, digest, art)
@@ -0,0 +1,360 @@
+"""
+话题关注列表的持续监控。
+
+每个周期把注册表中的 RSS 与热榜源各拉取一次（复用 feed 缓存与熔断，开启 feed 调度时直接命中缓存），只取出各 feed 新出现的条目，
+用单个 TermIndex 一次扫描匹配全部关注话题；上游流量只与 feed 数有关，与关注话题数无关。
+每个话题按周期维护提及数与负面情感词数的 EWMA 均值/方差，相对基线的 z 分数超过阈值时记录告警。
+
+随 Web 服务启动（MONITOR_ENABLED=1）或单独运行：
+    python -m app.monitor --interval 300
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+from app.agents.report_agent import ReportAgent
+from app.config import (
+    data_dir,
+    monitor_interval_seconds,
+    monitor_min_mentions,
+    monitor_z_threshold,
+    watchlist_topics,
+)
+from app.providers.rss import fetch_feed_entries, rss_feeds
+from app.providers.trending import refresh_trends
+from app.utils import corpus_stats
+from app.utils.canonical import url_key
+from app.utils.instrument import InstrumentedThreadPool, gauge_set, inc, span
+from app.utils.terms import TermIndex, expand_terms, query_key
+
+# EWMA 平滑系数：越大基线越快跟上新水平
+_ALPHA = 0.3
+# 基线至少积累这么多个周期后才判定突增
+_WARMUP_CYCLES = 3
+# 标准差下限：冷门话题基线方差接近 0 时避免任意小波动得到极大 z 分数
+_MIN_STD = 1.0
+# 每个 feed 记住的最近条目数（热榜条目会反复出现，只有新上榜的才计为提及）
+_SEEN_PER_FEED = 500
+# 每个话题保留的周期历史与最近命中条目数
+_HISTORY = 48
+_RECENT = 20
+_MAX_ALERTS = 200
+
+
+class _Ewma:
+    """周期计数的 EWMA 均值/方差基线。"""
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+
+    def update(self, x: float) -> Optional[float]:
+        """返回 x 相对更新前基线的 z 分数（预热期内为 None），再把 x 并入基线。"""
+        z = None
+        if self.n >= _WARMUP_CYCLES:
+            z = (x - self.mean) / max(math.sqrt(self.var), _MIN_STD)
+        if self.n == 0:
+            self.mean = float(x)
+        else:
+            diff = x - self.mean
+            self.mean += _ALPHA * diff
+            self.var = (1 - _ALPHA) * (self.var + _ALPHA * diff * diff)
+        self.n += 1
+        return z
+
+
+def _new_topic(topic: str) -> Dict:
+    return {
+        "topic": topic,
+        "added_at": time.time(),
+        "mentions": _Ewma(),
+        "negative": _Ewma(),
+        "totals": {"mentions": 0, "positive": 0, "negative": 0},
+        "history": deque(maxlen=_HISTORY),
+        "recent": deque(maxlen=_RECENT),
+    }
+
+
+class Monitor:
+    """关注列表监控：topics 为初始话题，之后可通过 add/remove 增删（持久化到 DATA_DIR/watchlist.json）。"""
+
+    def __init__(self, topics: Optional[List[str]] = None, interval: Optional[int] = None):
+        self.interval = interval or monitor_interval_seconds()
+        self.report_agent = ReportAgent()
+        self._lock = threading.Lock()
+        # 串行化周期（后台循环与 /monitor/cycle 可能同时触发）；状态接口只取 _lock
+        self._cycle_lock = threading.Lock()
+        self._topics: Dict[str, Dict] = {}
+        self._index: Optional[TermIndex] = None
+        self._seen: Dict[str, OrderedDict] = {}
+        self._alerts: Deque[Dict] = deque(maxlen=_MAX_ALERTS)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+        self.last_cycle: Optional[Dict] = None
+        for t in list(topics if topics is not None else watchlist_topics()) + self._load_watchlist():
+            self._add(t)
+
+    # ---- 关注列表 ----
+
+    @staticmethod
+    def _watchlist_path() -> str:
+        return os.path.join(data_dir(), "watchlist.json")
+
+    def _load_watchlist(self) -> List[str]:
+        try:
+            with open(self._watchlist_path(), encoding="utf-8") as f:
+                return [t for t in json.load(f) if isinstance(t, str)]
+        except (OSError, ValueError):
+            return []
+
+    def _save_watchlist(self):
+        try:
+            os.makedirs(data_dir(), exist_ok=True)
+            with open(self._watchlist_path(), "w", encoding="utf-8") as f:
+                json.dump([s["topic"] for s in self._topics.values()], f, ensure_ascii=False)
+        except OSError:
+            pass
+
+    def _add(self, topic: str) -> bool:
+        topic = (topic or "").strip()
+        key = query_key(topic)
+        if not key or key in self._topics:
+            return False
+        self._topics[key] = _new_topic(topic)
+        self._index = None
+        return True
+
+    def add(self, topic: str) -> bool:
+        with self._lock:
+            added = self._add(topic)
+            if added:
+                self._save_watchlist()
+        return added
+
+    def remove(self, topic: str) -> bool:
+        with self._lock:
+            removed = self._topics.pop(query_key(topic), None) is not None
+            if removed:
+                self._index = None
+                self._save_watchlist()
+        return removed
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return [s["topic"] for s in self._topics.values()]
+
+    def _term_index(self) -> TermIndex:
+        """关注列表变化后重建：所有话题的扩展词编译进同一个自动机。调用方持有 _lock。"""
+        if self._index is None:
+            self._index = TermIndex({key: expand_terms(s["topic"]) for key, s in self._topics.items()})
+        return self._index
+
+    # ---- 拉取周期 ----
+
+    def _fetch_all(self) -> Dict[str, List[Dict]]:
+        """每个 feed 拉取一次：{feed: entries}；热榜以平台名为 feed。"""
+        feeds = rss_feeds()
+        executor = InstrumentedThreadPool("monitor", max_workers=min(len(feeds) + 1, 16))
+        try:
+            trends_f = executor.submit(refresh_trends)
+            rss_f = {url: executor.submit(fetch_feed_entries, url, 5.0) for url in feeds}
+            fetched: Dict[str, List[Dict]] = {}
+            for url, fut in rss_f.items():
+                try:
+                    fetched[url] = fut.result()
+                except Exception:
+                    fetched[url] = []
+            try:
+                for platform, entries in trends_f.result().items():
+                    fetched[platform] = [{"title": e.get("title", ""), "url": e.get("link", ""), "source": platform} for e in entries]
+            except Exception:
+                pass
+        finally:
+            executor.shutdown(wait=True)
+        return fetched
+
+    def _new_entries(self, fetched: Dict[str, List[Dict]]) -> List[Dict]:
+        """筛出各 feed 新出现的条目；首次见到的 feed 只记录基线，不计为提及。"""
+        fresh: List[Dict] = []
+        for feed, entries in fetched.items():
+            if not entries:
+                continue
+            seen = self._seen.get(feed)
+            first = seen is None
+            if first:
+                seen = self._seen[feed] = OrderedDict()
+            for e in entries:
+                k = url_key(e["url"]) if e.get("url") else (e.get("title") or "")
+                if not k:
+                    continue
+                if k in seen:
+                    seen.move_to_end(k)
+                    continue
+                seen[k] = None
+                if not first:
+                    fresh.append(dict(e, feed=feed))
+            while len(seen) > _SEEN_PER_FEED:
+                seen.popitem(last=False)
+        return fresh
+
+    def run_cycle(self) -> Dict:
+        """执行一个周期：拉取、匹配、更新计数与基线，返回本周期摘要（含新告警）。"""
+        started = time.time()
+        with span("monitor_cycle"), self._cycle_lock:
+            fetched = self._fetch_all()
+            with self._lock:
+                fresh = self._new_entries(fetched)
+                index = self._term_index()
+            # 分词与情感打分可能交给进程池，在 _lock 之外进行，期间状态接口照常响应
+            self.report_agent.observe(fresh)
+            hits: Dict[str, List[Dict]] = {}
+            for e in fresh:
+                for key in index.match(f"{e.get('title', '')} {e.get('summary', '')}"):
+                    hits.setdefault(key, []).append(e)
+            # 只对命中的条目打情感分，每条只算一次
+            matched = list({id(e): e for entries in hits.values() for e in entries}.values())
+            sentiment = dict(zip((id(e) for e in matched), self.report_agent.sentiment_per_item(matched)))
+            with self._lock:
+                alerts = []
+                # 打分期间增删的话题：新增的本周期按零提及计，已移除的不再更新
+                for key, state in self._topics.items():
+                    entries = hits.get(key, [])
+                    pos = sum(sentiment[id(e)][0] for e in entries)
+                    neg = sum(sentiment[id(e)][1] for e in entries)
+                    state["totals"]["mentions"] += len(entries)
+                    state["totals"]["positive"] += pos
+                    state["totals"]["negative"] += neg
+                    state["history"].append({"ts": int(started), "mentions": len(entries), "positive": pos, "negative": neg})
+                    state["recent"].extendleft({"title": e.get("title", ""), "url": e.get("url", ""), "feed": e["feed"], "ts": int(started)} for e in reversed(entries))
+                    for kind, value in (("mentions", len(entries)), ("negative", neg)):
+                        series = state[kind]
+                        baseline = series.mean
+                        z = series.update(value)
+                        if z is not None and z >= monitor_z_threshold() and value >= monitor_min_mentions():
+                            alerts.append({
+                                "ts": int(started),
+                                "topic": state["topic"],
+                                "kind": kind,
+                                "value": value,
+                                "baseline": round(baseline, 2),
+                                "z": round(z, 2),
+                                "samples": [e.get("title", "") for e in entries[:5]],
+                            })
+                self._alerts.extend(alerts)
+                self.cycles += 1
+                self.last_cycle = {
+                    "ts": int(started),
+                    "seconds": round(time.time() - started, 3),
+                    "feeds": len(fetched),
+                    "feeds_ok": sum(1 for v in fetched.values() if v),
+                    "new_entries": len(fresh),
+                    "alerts": len(alerts),
+                }
+                summary = dict(self.last_cycle, new_alerts=alerts)
+                topic_count = len(self._topics)
+        inc("weiyu_monitor_cycles_total")
+        gauge_set("weiyu_monitor_topics", topic_count)
+        for a in alerts:
+            inc("weiyu_monitor_alerts_total", kind=a["kind"])
+        return summary
+
+    # ---- 后台运行 ----
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_cycle()
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="weiyu-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- 查询 ----
+
+    def alerts(self, since: float = 0.0, topic: Optional[str] = None) -> List[Dict]:
+        key = query_key(topic) if topic else None
+        with self._lock:
+            return [a for a in self._alerts if a["ts"] >= since and (key is None or query_key(a["topic"]) == key)]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            topics = [
+                {
+                    "topic": s["topic"],
+                    "totals": dict(s["totals"]),
+                    "mentions_baseline": round(s["mentions"].mean, 2),
+                    "negative_baseline": round(s["negative"].mean, 2),
+                    "history": list(s["history"]),
+                    "recent": list(s["recent"]),
+                }
+                for s in self._topics.values()
+            ]
+            return {
+                "running": self.running,
+                "interval_seconds": self.interval,
+                "cycles": self.cycles,
+                "last_cycle": self.last_cycle,
+                "feeds": len(self._seen),
+                "topics": topics,
+            }
+
+
+_MONITOR: Optional[Monitor] = None
+_MONITOR_LOCK = threading.Lock()
+
+
+def get_monitor() -> Monitor:
+    """进程内单例：Web 端点与 lifespan 共用。"""
+    global _MONITOR
+    with _MONITOR_LOCK:
+        if _MONITOR is None:
+            _MONITOR = Monitor()
+        return _MONITOR
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Topic watchlist monitor")
+    ap.add_argument("topics", nargs="*", help="关注话题（另合并 WATCHLIST 与 DATA_DIR/watchlist.json）")
+    ap.add_argument("--interval", type=int, default=None, help="拉取周期秒数（默认 MONITOR_INTERVAL_S）")
+    ap.add_argument("--cycles", type=int, default=0, help="执行若干周期后退出（默认一直运行）")
+    args = ap.parse_args()
+    monitor = Monitor(topics=watchlist_topics() + args.topics, interval=args.interval)
+    n = 0
+    try:
+        while True:
+            summary = monitor.run_cycle()
+            print(json.dumps(summary, ensure_ascii=False), flush=True)
+            n += 1
+            if args.cycles and n >= args.cycles:
+                break
+            time.sleep(monitor.interval)
+    except KeyboardInterrupt:
+        pass
+    corpus_stats.flush()
+
+
+if __name__ == "__main__":
+    main()
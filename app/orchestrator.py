@@ -1,14 +1,107 @@
 from .agents.query_agent import QueryAgent
 from .agents.report_agent import ReportAgent
-from .providers.reader import fetch_content, fetch_contents_bulk
+from .providers.reader import cached_content, fetch_content, fetch_contents_bulk
 from datetime import datetime
 from urllib.parse import urlparse
-from .providers.metrics import wiki_pageviews
-from .providers.trending import trending_presence
+from .providers.metrics import wiki_pageviews_multi
+from .providers.trending import trending_presence, events_for_titles
 from app.config import trend_platform_whitelist
 from app.utils.terms import normalize_text, expand_terms
 from .providers.meili import upsert_documents
-from collections import defaultdict
+from collections import Counter, defaultdict
+from app.utils.instrument import span, collect_timings, InstrumentedThreadPool
+from app.utils.deadline import Deadline
+from app.config import fast_budget_seconds, reader_max_age_days
+from app.utils.cache import TTLCache
+from app.utils import topic_state
+from app.utils.timeparse import stamp_items
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+import threading
+import time
+import uuid
+
+# 快速模式下检索阶段可使用的预算比例；正文抽取与指标阶段使用剩余的全部预算
+_SEARCH_BUDGET_SHARE = 0.5
+# 后台阶段自身也按同一预算收尾，汇总时多等一个很短的宽限期以收取其部分结果
+_COLLECT_GRACE_S = 0.15
+# 延迟加载报告的素材快照（report_id -> {topic, items, pending}），供正文就绪后重算与按需展开正文；
+# 每份报告一个新 id，限制条数以免从未被读取的快照一直占用内存
+_LAZY_REPORTS = TTLCache(ttl_seconds=1800, name="lazy_reports", max_items=500)
+
+
+def lazy_pending_url(report_id: str, url: str = "", index: Optional[int] = None) -> Optional[str]:
+    """
+    延迟加载报告中待抽取正文的素材 URL（按 URL 或素材序号指定）。
+    报告已过期、序号越界或 URL 不在该报告的待抽取列表中时返回 None。
+    """
+    state = _LAZY_REPORTS.peek(report_id) if report_id else None
+    if state is None:
+        return None
+    if index is not None:
+        items = state["items"]
+        url = (items[index].get("url") or "") if 0 <= index < len(items) else ""
+    return url if url and url in state["pending"] else None
+
+
+def _spanned(stage: str, fn, *args, **kwargs):
+    with span(stage):
+        return fn(*args, **kwargs)
+
+
+def _result_within(fut: Future, deadline: Deadline, default):
+    """在预算内取结果；超时则取消并返回 (default, True)。"""
+    try:
+        return fut.result(timeout=deadline.remaining() + _COLLECT_GRACE_S if deadline is not None else None), False
+    except FutureTimeout:
+        fut.cancel()
+        return default, True
+    except Exception:
+        return default, False
+
+
+def _merge_daily(zh, en):
+    """合并中英文按日浏览量为 [{date, zh, en}]（某语言无数据时为 None）。"""
+    by_date = defaultdict(dict)
+    for lang, series in (("zh", zh), ("en", en)):
+        for p in series or []:
+            by_date[p["date"]][lang] = p["views"]
+    return [{"date": d, "zh": v.get("zh"), "en": v.get("en")} for d, v in sorted(by_date.items())]
+
+
+def _to_date(s: str) -> str:
+    if not s:
+        return ""
+    # 尝试截取 YYYY-MM-DD
+    if len(s) >= 10 and s[4] == '-' and s[7] == '-':
+        return s[:10]
+    # 处理形如 20240601 或含T的ISO格式
+    if 'T' in s and '-' in s:
+        return s.split('T')[0]
+    if len(s) == 8 and s.isdigit():
+        return f"{s[0:4]}-{s[4:6]}-{s[6:8]}"
+    return ""
+
+
+def _older_than(item: Dict, before: Optional[float]) -> bool:
+    ts = item.get("published_ts")
+    return before is not None and ts is not None and ts < before
+
+
+def _aggregate(items: List[Dict]) -> Dict:
+    """素材的可加统计：{domains: Counter, daily: Counter, text_len}，增量分析时与历史合计相加。"""
+    domains, daily, text_len = Counter(), Counter(), 0
+    for it in items:
+        dom = (it.get("source_domain") or "").lower()
+        if dom:
+            domains[dom] += 1
+        # 按日时间序列使用入库时解析的发布时间，未知时用 fetch_time
+        ts = it.get("published_ts")
+        d = time.strftime("%Y-%m-%d", time.localtime(ts)) if ts is not None else _to_date(it.get("fetch_time") or "")
+        if d:
+            daily[d] += 1
+        text_len += len(it.get("content") or it.get("summary") or it.get("title") or "")
+    return {"domains": domains, "daily": daily, "text_len": text_len}
 
 
 class Orchestrator:
@@ -22,8 +115,84 @@ class Orchestrator:
         self.query_agent = QueryAgent()
         self.report_agent = ReportAgent()
 
-    def analyze(self, topic: str, max_items: int = 12, use_mock: bool = False, source: str = "rss", fast: bool = False):
-        items = self.query_agent.search(topic=topic, max_items=max_items, use_mock=use_mock, source=source)
+    def analyze(self, topic: str, max_items: int = 12, use_mock: bool = False, source: str = "rss", fast: bool = False, debug: bool = False, lazy_content: bool = False, incremental: bool = False, window_days: int = 0):
+        """
+        debug=True 时在报告中附加 debug.timings（各阶段与各上游 host 的耗时明细）。
+        lazy_content=True 时跳过正文抽取，仅凭标题/摘要出报告；待抽取的 URL 列在 report["content_pending"]，
+        由调用方后台预取，之后可通过 refine(report_id) 用正文重算关键词与情感。
+        incremental=True 时沿用该话题上次分析的状态：只为新素材抽取正文、打分，并把其贡献合并进历史聚合
+        （此时忽略 lazy_content，新素材通常很少，直接抽取正文）。
+        window_days>0 时只分析最近 window_days 天内发布的素材（发布时间未知的保留）。
+        """
+        if not debug:
+            return self._analyze(topic, max_items=max_items, use_mock=use_mock, source=source, fast=fast, lazy_content=lazy_content, incremental=incremental, window_days=window_days)
+        with collect_timings() as timings:
+            with span("analyze"):
+                report = self._analyze(topic, max_items=max_items, use_mock=use_mock, source=source, fast=fast, lazy_content=lazy_content, incremental=incremental, window_days=window_days)
+        report["debug"] = {"timings": timings}
+        return report
+
+    def refine(self, report_id: str) -> Optional[Dict]:
+        """用已缓存（或补抓）的正文重算延迟加载报告的关键词、情感与摘要；报告已过期时返回 None。"""
+        state = _LAZY_REPORTS.get(report_id)
+        if state is None:
+            return None
+        items = [dict(it) for it in state["items"]]
+        urls = [it.get("url") for it in items if it.get("url") in state["pending"]]
+        with span("reader"):
+            bulk = fetch_contents_bulk(urls, timeout_seconds=4.0, max_chars=4000, max_workers=6)
+        for it in items:
+            content = bulk.get(it.get("url"))
+            if content:
+                it["content"] = content
+        with span("report"):
+            refined = self.report_agent.generate_report(topic=state["topic"], items=items)
+        return {
+            "report_id": report_id,
+            "summary": refined["summary"],
+            "keywords": refined["keywords"],
+            "sentiment": refined["sentiment"],
+            "content_ready": sum(1 for u in urls if bulk.get(u)),
+            "content_total": len(urls),
+        }
+
+    def _merge_incremental(self, topic: str, items: List[Dict]):
+        """在话题锁内复核并合并新素材，按合并后的合计生成报告；返回 (report, 展示素材, 聚合统计)。"""
+        with topic_state.locked(topic) as state:
+            fresh = topic_state.unseen(state, items)
+            if fresh:
+                topic_state.merge(state, fresh, self.report_agent.score_items(fresh), _aggregate(fresh))
+            shown = [dict(it) for it in state["items"]]
+            fresh_keys = {topic_state.item_key(it) for it in fresh}
+            for it in shown:
+                it["is_new"] = topic_state.item_key(it) in fresh_keys
+            report = self.report_agent.generate_report(topic=topic, items=shown, scores=state)
+            agg = {"domains": Counter(state["domains"]), "daily": Counter(state["daily"]), "text_len": state["text_len"]}
+            report["incremental"] = {
+                "new_count": len(fresh),
+                "seen_total": len(state["seen"]),
+                "runs": state["runs"],
+                "updated_at": datetime.fromtimestamp(state["updated_at"]).isoformat(timespec="seconds") if state["updated_at"] else None,
+            }
+        return report, shown, agg
+
+    def _analyze(self, topic: str, max_items: int = 12, use_mock: bool = False, source: str = "rss", fast: bool = False, lazy_content: bool = False, incremental: bool = False, window_days: int = 0):
+        # 快速模式：整个请求共享一个时间预算，各阶段在预算内尽力完成，未完成的部分在报告中标注
+        deadline = Deadline(fast_budget_seconds()) if fast else None
+        missing = []
+
+        # 维基浏览量与平台热榜不依赖检索结果，与检索/正文抽取并行执行
+        side = InstrumentedThreadPool("metrics", max_workers=2)
+        pv_f = side.submit(_spanned, "pageviews", wiki_pageviews_multi, topic, ("zh", "en"), days=30, timeout=6.0 if deadline is None else deadline.timeout(6.0))
+        trend_f = side.submit(_spanned, "trending", trending_presence, topic, deadline=deadline)
+        side.shutdown(wait=False)
+
+        with span("search"):
+            search_deadline = deadline.share(_SEARCH_BUDGET_SHARE) if deadline is not None else None
+            since_ts = int(time.time()) - window_days * 86400 if window_days > 0 else None
+            items = self.query_agent.search(topic=topic, max_items=max_items, use_mock=use_mock, source=source, deadline=search_deadline, since_ts=since_ts)
+        if search_deadline is not None and search_deadline.expired():
+            missing.append({"section": "search", "detail": "检索在预算内未全部完成，素材可能不完整"})
         now_iso = datetime.now().isoformat(timespec="seconds")
         # 丰富素材的审计信息：来源域名 & 抓取时间
         for it in items:
@@ -34,50 +203,86 @@ class Orchestrator:
                 except Exception:
                     it["source_domain"] = None
             it["fetch_time"] = now_iso
+        # 增量模式：已处理过的素材不再抽取正文与打分
+        work = topic_state.unseen(topic_state.peek(topic), items) if incremental else items
+        lazy_content = lazy_content and not incremental
 
         # 为前N条素材并发拉取正文内容（快速模式缩短超时与截断）
         top_n = 6 if fast else 10
         timeout_s = 3.0 if fast else 4.0
         max_chars = 2500 if fast else 4000
-        to_fetch = [it.get("url") for it in items[:top_n] if it.get("url") and not it.get("content")]
-        if to_fetch:
-            bulk = fetch_contents_bulk(to_fetch, timeout_seconds=timeout_s, max_chars=max_chars, max_workers=6)
-            for it in items[:top_n]:
+        # 发布过久的素材不抽取正文（摘要已足够做关键词/情感统计）
+        max_age = reader_max_age_days()
+        stale_before = time.time() - max_age * 86400 if max_age else None
+        to_fetch = [
+            it.get("url") for it in stamp_items(work[:top_n])
+            if it.get("url") and not it.get("content") and not _older_than(it, stale_before)
+        ]
+        content_pending: List[str] = []
+        if lazy_content:
+            # 延迟加载：已缓存的正文直接使用，其余留给后台预取/按需展开
+            for it in work[:top_n]:
+                url = it.get("url")
+                if url in to_fetch:
+                    content = cached_content(url)
+                    if content:
+                        it["content"] = content
+                    else:
+                        content_pending.append(url)
+        elif to_fetch:
+            with span("reader"):
+                bulk = fetch_contents_bulk(to_fetch, timeout_seconds=timeout_s, max_chars=max_chars, max_workers=6, deadline=deadline)
+            skipped = sum(1 for u in to_fetch if u not in bulk)
+            if skipped:
+                missing.append({"section": "content", "detail": f"{skipped}/{len(to_fetch)} 条正文未在预算内返回，使用摘要代替"})
+            for it in work[:top_n]:
                 url = it.get("url")
                 if url and not it.get("content"):
                     content = bulk.get(url)
                     if content:
                         it["content"] = content
 
-        report = self.report_agent.generate_report(topic=topic, items=items)
-        # 数据指标：页面浏览量（维基）与平台热榜出现情况
-        pv_zh = wiki_pageviews(topic, days=30, lang="zh")
-        pv_en = wiki_pageviews(topic, days=30, lang="en")
-        trend = trending_presence(topic)
+        with span("report"):
+            # 先计入语料文档频率，关键词排序的 IDF 已包含本次素材
+            self.report_agent.observe(work)
+            if incremental:
+                report, items, agg = self._merge_incremental(topic, work)
+            else:
+                report = self.report_agent.generate_report(topic=topic, items=items)
+                agg = _aggregate(items)
+        # 数据指标：页面浏览量（维基）与平台热榜出现情况（已在后台并行获取）
+        pv_series, pv_late = _result_within(pv_f, deadline, {})
+        if pv_late:
+            missing.append({"section": "pageviews", "detail": "维基浏览量未在预算内返回"})
+        pv_zh_daily = pv_series.get("zh")
+        pv_en_daily = pv_series.get("en")
+        pv_zh = sum(p["views"] for p in pv_zh_daily) if pv_zh_daily is not None else None
+        pv_en = sum(p["views"] for p in pv_en_daily) if pv_en_daily is not None else None
+        trend, trend_late = _result_within(trend_f, deadline, {})
+        late_platforms = [p for p, d in trend.items() if d.get("timed_out")]
+        if trend_late or late_platforms:
+            detail = "、".join(late_platforms) if late_platforms else "全部平台"
+            missing.append({"section": "trending", "detail": f"热榜未在预算内返回：{detail}"})
         wl = trend_platform_whitelist()
 
-        # 追加报告元信息与KPI
-        total_text_len = sum(
-            len(
-                (
-                    it.get("content")
-                    or it.get("summary")
-                    or it.get("title")
-                    or ""
-                )
-            )
-            for it in items
-        )
-        domain_count = len({it.get("source_domain") for it in items if it.get("source_domain")})
+        # 追加报告元信息与KPI（增量模式下为历次合并后的合计）
+        total_text_len = agg["text_len"]
         # 按域名动态分布（更通用）
-        domain_counts = defaultdict(int)
-        for it in items:
-            dom = (it.get("source_domain") or "").lower()
-            if dom:
-                domain_counts[dom] += 1
+        domain_counts = agg["domains"]
+        domain_count = len(domain_counts)
+        item_count = report["incremental"]["seen_total"] if incremental else len(items)
         report["generated_at"] = now_iso
+        if window_days > 0:
+            report["window_days"] = window_days
+        if lazy_content:
+            report["report_id"] = uuid.uuid4().hex[:12]
+            report["lazy_content"] = True
+            report["content_pending"] = content_pending
+            _LAZY_REPORTS.set(report["report_id"], {"topic": topic, "items": [dict(it) for it in items], "pending": set(content_pending)})
+        report["missing_sections"] = missing
+        report["budget_seconds"] = deadline.budget if deadline is not None else None
         report["stats"] = {
-            "item_count": len(items),
+            "item_count": item_count,
             "domain_count": domain_count,
             "total_text_len": total_text_len,
         }
@@ -101,25 +306,18 @@ class Orchestrator:
         )
         platform_max = max(domain_counts.values()) if domain_counts else 1
 
-        # 交叉平台重合：对各平台热榜标题进行规范化，统计跨平台重复出现的热点
+        # 交叉平台重合：查找命中标题所属的跨平台事件簇（聚类在热榜刷新时按全部标题物化一次）
         try:
-            norm_map = defaultdict(lambda: {"platforms": set(), "sample_title": ""})
-            for plat, data in trend.items():
-                items_list = data.get("matched_items", [])
-                for it in items_list:
-                    t = it.get("title", "")
-                    nt = normalize_text(t)
-                    if not nt:
-                        continue
-                    norm_map[nt]["platforms"].add(plat)
-                    if not norm_map[nt]["sample_title"]:
-                        norm_map[nt]["sample_title"] = t
-            overlaps = []
-            for nt, info in norm_map.items():
-                plats = sorted(list(info["platforms"]))
-                if len(plats) >= 2:
-                    overlaps.append({"title": info["sample_title"], "platforms": plats})
-            overlaps = sorted(overlaps, key=lambda x: len(x["platforms"]), reverse=True)[:8]
+            hits = [
+                {"platform": plat, "title": it.get("title", "")}
+                for plat, data in trend.items()
+                for it in data.get("matched_items", [])
+            ]
+            overlaps = [
+                {"title": c["title"], "platforms": c["platforms"], "ranks": c["ranks"]}
+                for c in events_for_titles(hits)
+                if len(c["platforms"]) >= 2
+            ][:8]
         except Exception:
             overlaps = []
 
@@ -148,7 +346,10 @@ class Orchestrator:
         report["metrics"] = {
             "wiki_pageviews_zh": pv_zh,
             "wiki_pageviews_en": pv_en,
-            "rss_mentions_count": len(items),
+            # 维基浏览量按日序列：[{date, zh, en}]，供趋势图使用
+            "wiki_pageviews_daily": _merge_daily(pv_zh_daily, pv_en_daily),
+            "wiki_pageviews_daily_max": max([p["views"] for p in (pv_zh_daily or []) + (pv_en_daily or [])] or [0]) or 1,
+            "rss_mentions_count": item_count,
             "trending": trend,
             "platform_whitelist": wl,
             # 顶部KPI使用的统计值
@@ -207,37 +408,26 @@ class Orchestrator:
 
         # 索引入库：便于后续高频检索
         try:
-            upsert_documents(items, topic=topic)
+            with span("meili_upsert"):
+                upsert_documents(work, topic=topic)
         except Exception:
             pass
 
-        # 生成近14天按日时间序列（使用 published_at 或 fetch_time）
-        try:
-            def to_date(s: str) -> str:
-                if not s:
-                    return ""
-                # 尝试截取 YYYY-MM-DD
-                if len(s) >= 10 and s[4] == '-' and s[7] == '-':
-                    return s[:10]
-                # 处理形如 20240601 或含T的ISO格式
-                if 'T' in s and '-' in s:
-                    return s.split('T')[0]
-                if len(s) == 8 and s.isdigit():
-                    return f"{s[0:4]}-{s[4:6]}-{s[6:8]}"
-                return ""
-
-            daily = defaultdict(int)
-            for it in items:
-                d = to_date(it.get("published_at") or it.get("fetch_time") or "")
-                if d:
-                    daily[d] += 1
-            # 仅保留最近14天，按日期升序
-            recent = sorted(daily.items(), key=lambda x: x[0])[-14:]
-            timeseries = [{"date": d, "count": c} for d, c in recent]
-            ts_max = max([c for _, c in recent]) if recent else 1
-            report["metrics"]["timeseries_daily"] = timeseries
-            report["metrics"]["timeseries_max_count"] = ts_max
-        except Exception:
-            report["metrics"]["timeseries_daily"] = []
-            report["metrics"]["timeseries_max_count"] = 1
-        return report
\ No newline at end of file
+        # 近14天按日时间序列（使用 published_at 或 fetch_time），按日期升序
+        recent = sorted(agg["daily"].items())[-14:]
+        report["metrics"]["timeseries_daily"] = [{"date": d, "count": c} for d, c in recent]
+        report["metrics"]["timeseries_max_count"] = max([c for _, c in recent]) if recent else 1
+        return report
+
+
+_ORCHESTRATOR: Optional[Orchestrator] = None
+_ORCHESTRATOR_LOCK = threading.Lock()
+
+
+def get_orchestrator() -> Orchestrator:
+    """进程内单例：编排器与各 agent 不保存请求状态，Web 端点、预热共用同一实例。"""
+    global _ORCHESTRATOR
+    with _ORCHESTRATOR_LOCK:
+        if _ORCHESTRATOR is None:
+            _ORCHESTRATOR = Orchestrator()
+        return _ORCHESTRATOR
@@ -1,10 +1,11 @@
-import httpx
+from app.utils import http
+from app.utils.search_cache import cached_search, quota_available
 from typing import List, Dict
 
 BAIDU_AI_SEARCH_ENDPOINT = "https://qianfan.baidubce.com/v2/ai_search/chat/completions"
 
 
-def search_baidu_ai(query: str, api_key: str, top_k: int = 10, recency: str = "month") -> List[Dict]:
+def search_baidu_ai(query: str, api_key: str, top_k: int = 10, recency: str = "month", timeout: float = 10) -> List[Dict]:
     """
     使用百度智能云千帆的“百度AI搜索”V2接口获取实时网页搜索结果。
     参考文档：
@@ -12,10 +13,19 @@ def search_baidu_ai(query: str, api_key: str, top_k: int = 10, recency: str = "m
     - 每日免费额度约100次（需账号开通），鉴权：Bearer <AppBuilder API Key>
 
     返回统一结构：[{title, summary, source, published_at, url}]
+    结果按规范化查询缓存，并受每日配额令牌桶约束（见 app/utils/search_cache.py）。
     """
     if not api_key or not query:
         return []
+    return cached_search("baidu", query, top_k, lambda: _search(query, api_key, top_k, recency, timeout), variant=recency)
 
+
+def baidu_quota_available(query: str, top_k: int = 10, recency: str = "month") -> bool:
+    """该查询可由缓存满足或仍有配额。"""
+    return quota_available("baidu", query, top_k, variant=recency)
+
+
+def _search(query: str, api_key: str, top_k: int, recency: str, timeout: float) -> List[Dict]:
     headers = {
         "Authorization": f"Bearer {api_key}",
         "X-Appbuilder-Authorization": f"Bearer {api_key}",
@@ -31,10 +41,8 @@ def search_baidu_ai(query: str, api_key: str, top_k: int = 10, recency: str = "m
         "enable_deep_search": False,
     }
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.post(BAIDU_AI_SEARCH_ENDPOINT, headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = http.post(BAIDU_AI_SEARCH_ENDPOINT, timeout=timeout, headers=headers, json=payload)
+        data = resp.json()
     except Exception:
         return []
 
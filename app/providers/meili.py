@@ -1,21 +1,35 @@
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, List, Dict, Optional
 import hashlib
-from meilisearch import Client
-from app.config import meili_url, meili_api_key
+from app.config import cassette_mode, meili_url, meili_api_key
+from app.utils.canonical import canonical_url, content_digest, url_key
+from app.utils.timeparse import parse_ts
+
+if TYPE_CHECKING:
+    from meilisearch import Client
 
 
 INDEX_NAME = "documents"
+# 进程内复用的客户端（配置不变时），避免每次调用重建连接
+_CLIENT: Dict[str, object] = {"config": None, "client": None}
 
 
-def _client() -> Optional[Client]:
+def _client() -> Optional["Client"]:
     url = meili_url()
-    if not url:
+    # Meilisearch 客户端不经过 app/utils/http.py，无法录制；回放时视为未配置，保证不访问网络
+    if not url or cassette_mode() == "replay":
         return None
     key = meili_api_key()
+    if _CLIENT["config"] == (url, key):
+        return _CLIENT["client"]
     try:
-        return Client(url, key or None)
+        # 首次使用时才载入 SDK（约 60ms），未配置 Meilisearch 的进程不承担其导入开销
+        from meilisearch import Client
+
+        client = Client(url, key or None)
     except Exception:
         return None
+    _CLIENT.update(config=(url, key), client=client)
+    return client
 
 
 def ensure_index():
@@ -29,35 +43,44 @@ def ensure_index():
         # 可选：设置可搜索字段与可过滤字段
         client.index(INDEX_NAME).update_settings({
             "searchableAttributes": ["title", "summary", "content", "source_domain", "topic"],
-            "filterableAttributes": ["topic", "source_domain", "published_at"],
-            "sortableAttributes": ["published_at", "fetch_time"],
+            "filterableAttributes": ["topic", "source_domain", "published_at", "published_ts"],
+            "sortableAttributes": ["published_ts", "published_at", "fetch_time"],
         })
         return True
     except Exception:
         return False
 
 
-def _doc_id(url: str) -> str:
-    return hashlib.sha1((url or "").encode("utf-8")).hexdigest()
+def _doc_id(url: str, content: str = "") -> str:
+    """正文相同的素材（转载、跟踪参数/移动站链接）共用一个文档；无正文时按规范化 URL。"""
+    if content:
+        return content_digest(content)
+    return hashlib.sha1(url_key(url).encode("utf-8")).hexdigest()
 
 
 def upsert_documents(items: List[Dict], topic: str) -> bool:
     """
     将素材写入 Meilisearch。
-    文档结构：{id, title, summary, content, source_domain, published_at, fetch_time, url, topic}
+    文档结构：{id, title, summary, content, source_domain, published_at, published_ts, fetch_time, url, topic}
+    published_ts 为 epoch 秒（可过滤/排序），发布时间未知的文档不带该字段。
     """
     client = _client()
     if not client:
         return False
     try:
         ensure_index()
-        docs = []
+        docs: Dict[str, Dict] = {}
+        stale = set()
         for it in items:
-            url = it.get("url") or ""
+            url = canonical_url(it.get("url") or "")
             if not url:
                 continue
+            doc_id = _doc_id(url, it.get("content") or "")
+            if doc_id != _doc_id(url):
+                # 该 URL 之前可能以无正文文档入库，补到正文后改用正文摘要 id
+                stale.add(_doc_id(url))
             doc = {
-                "id": _doc_id(url),
+                "id": doc_id,
                 "title": it.get("title") or "",
                 "summary": it.get("summary") or "",
                 "content": it.get("content") or "",
@@ -67,18 +90,25 @@ def upsert_documents(items: List[Dict], topic: str) -> bool:
                 "url": url,
                 "topic": topic,
             }
-            docs.append(doc)
+            ts = it["published_ts"] if "published_ts" in it else parse_ts(it.get("published_at") or "")
+            if ts is not None:
+                doc["published_ts"] = ts
+            docs.setdefault(doc_id, doc)
         if not docs:
             return True
-        client.index(INDEX_NAME).add_documents(docs)
+        index = client.index(INDEX_NAME)
+        index.add_documents(list(docs.values()))
+        if stale:
+            index.delete_documents(list(stale - set(docs)))
         return True
     except Exception:
         return False
 
 
-def search_documents(query: str, limit: int = 10, filter_topic: Optional[str] = None) -> List[Dict]:
+def search_documents(query: str, limit: int = 10, filter_topic: Optional[str] = None, since_ts: Optional[int] = None) -> List[Dict]:
     """
     从 Meilisearch 搜索文档，返回与 QueryAgent 统一的 items 结构。
+    传入 since_ts 时按 published_ts 范围过滤（发布时间未知的文档保留）。
     """
     client = _client()
     if not client or not query:
@@ -90,6 +120,8 @@ def search_documents(query: str, limit: int = 10, filter_topic: Optional[str] =
         }
         if filter_topic:
             params["filter"] = [f"topic = '{filter_topic}'"]
+        if since_ts:
+            params.setdefault("filter", []).append(f"published_ts >= {int(since_ts)} OR published_ts NOT EXISTS")
         res = client.index(INDEX_NAME).search(query, params)
         hits = res.get("hits", [])
         items: List[Dict] = []
@@ -99,6 +131,7 @@ def search_documents(query: str, limit: int = 10, filter_topic: Optional[str] =
                 "summary": h.get("summary") or "",
                 "source": h.get("source_domain") or "Meilisearch",
                 "published_at": h.get("published_at"),
+                "published_ts": h.get("published_ts"),
                 "url": h.get("url") or "",
                 "content": h.get("content") or "",
             })
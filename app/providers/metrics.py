@@ -1,48 +1,135 @@
-from typing import Optional
-import httpx
-from datetime import datetime, timedelta
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+from app.utils import cassette, http
+from datetime import date, timedelta
 from urllib.parse import quote
+from app.config import data_dir
 from app.utils.cache import TTLCache
+from app.utils.instrument import InstrumentedThreadPool
 
-_METRIC_CACHE = TTLCache(ttl_seconds=600)
+# 仅缓存“无数据”（条目不存在/请求失败）的短期结果，避免反复请求；有效数据按天持久化在 sqlite
+_METRIC_CACHE = TTLCache(ttl_seconds=600, name="pageviews")
 
+# 最近两天的数据 Wikimedia 可能尚未产出，响应中缺失时不记为 0，下次再补
+_LAG_DAYS = 2
 
-def _date_range(days: int) -> tuple[str, str]:
-    end = datetime.utcnow().date() - timedelta(days=1)
+_DB_LOCK = threading.Lock()
+_DB: Optional[sqlite3.Connection] = None
+
+
+def _db() -> sqlite3.Connection:
+    global _DB
+    if _DB is None:
+        os.makedirs(data_dir(), exist_ok=True)
+        conn = sqlite3.connect(os.path.join(data_dir(), "pageviews.sqlite3"), check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pageviews ("
+            " project TEXT NOT NULL, article TEXT NOT NULL, day TEXT NOT NULL, views INTEGER NOT NULL,"
+            " PRIMARY KEY (project, article, day))"
+        )
+        conn.commit()
+        _DB = conn
+    return _DB
+
+
+def _window(days: int) -> List[date]:
+    # 回放磁带时以录制当天为准，区间 URL 与录制时一致
+    end = cassette.today() - timedelta(days=1)
     start = end - timedelta(days=days)
-    return (start.strftime("%Y%m%d"), end.strftime("%Y%m%d"))
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _load(project: str, article: str, first: str, last: str) -> Dict[str, int]:
+    with _DB_LOCK:
+        rows = _db().execute(
+            "SELECT day, views FROM pageviews WHERE project = ? AND article = ? AND day BETWEEN ? AND ?",
+            (project, article, first, last),
+        ).fetchall()
+    return dict(rows)
+
+
+def _store(project: str, article: str, views: Dict[str, int]):
+    with _DB_LOCK:
+        conn = _db()
+        conn.executemany(
+            "INSERT OR REPLACE INTO pageviews (project, article, day, views) VALUES (?, ?, ?, ?)",
+            [(project, article, d, v) for d, v in views.items()],
+        )
+        conn.commit()
+
+
+def _fetch_range(project: str, article: str, start: date, end: date, timeout: float) -> Optional[Dict[str, int]]:
+    url = (
+        "https://wikimedia.org/api/rest_v1/metrics/pageviews/per-article/"
+        f"{project}/all-access/user/{article}/daily/{start:%Y%m%d}/{end:%Y%m%d}"
+    )
+    try:
+        resp = http.get(url, timeout=timeout)
+        data = resp.json()
+    except Exception:
+        return None
+    fetched: Dict[str, int] = {}
+    for it in data.get("items", []):
+        ts = str(it.get("timestamp") or "")[:8]
+        if ts:
+            fetched[ts] = int(it.get("views", 0) or 0)
+    # 接口对无访问的日期不返回条目：足够早的缺失日期按 0 入库
+    settled = cassette.today() - timedelta(days=_LAG_DAYS)
+    d = start
+    while d <= end and d <= settled:
+        fetched.setdefault(f"{d:%Y%m%d}", 0)
+        d += timedelta(days=1)
+    return fetched
 
 
-def wiki_pageviews(title: str, days: int = 30, lang: str = "zh") -> Optional[int]:
+def wiki_pageviews_daily(title: str, days: int = 30, lang: str = "zh", timeout: float = 6.0) -> Optional[List[Dict]]:
     """
-    使用 Wikimedia Pageviews API 获取近 N 天的页面浏览量总计。
-    参考：/metrics/pageviews/per-article/{project}/{access}/{agent}/{article}/{granularity}/{start}/{end}
-    project 例如 zh.wikipedia
+    近 N 天按日浏览量：[{date: YYYY-MM-DD, views}]；条目不存在或请求失败时返回 None。
+    按 (项目, 条目, 日期) 持久化到 DATA_DIR/pageviews.sqlite3，窗口滑动后只请求缺失的日期。
     """
     if not title:
         return None
-    start, end = _date_range(days)
     article = quote(title, safe="")
     project = f"{lang}.wikipedia"
-    url = (
-        "https://wikimedia.org/api/rest_v1/metrics/pageviews/per-article/"
-        f"{project}/all-access/user/{article}/daily/{start}/{end}"
-    )
+    window = _window(days)
+    keys = [f"{d:%Y%m%d}" for d in window]
+    stored = _load(project, article, keys[0], keys[-1])
+    missing = [d for d, k in zip(window, keys) if k not in stored]
+    if missing:
+        cache_key = f"pageviews:{project}:{article}:{missing[0]:%Y%m%d}:{missing[-1]:%Y%m%d}"
+        checked = _METRIC_CACHE.get(cache_key)
+        if checked is not None:
+            fetched = {} if checked else None
+        else:
+            # 缺失日期通常是窗口尾部的连续几天，一次区间请求补齐
+            fetched = _fetch_range(project, article, missing[0], missing[-1], timeout)
+            # 记录本次请求：失败或最近几天尚未产出时，10 分钟内不重复请求同一区间（命中时不续期）
+            _METRIC_CACHE.set(cache_key, fetched is not None)
+        if fetched is None:
+            if not stored:
+                return None
+        else:
+            _store(project, article, fetched)
+            stored.update(fetched)
+    return [{"date": f"{k[:4]}-{k[4:6]}-{k[6:]}", "views": stored[k]} for k in keys if k in stored]
 
-    cache_key = f"pageviews:{project}:{article}:{start}:{end}"
-    cached = _METRIC_CACHE.get(cache_key)
-    if cached is not None:
-        return cached
 
-    try:
-        with httpx.Client(timeout=6.0) as client:
-            resp = client.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-    except Exception:
+def wiki_pageviews(title: str, days: int = 30, lang: str = "zh", timeout: float = 6.0) -> Optional[int]:
+    """
+    使用 Wikimedia Pageviews API 获取近 N 天的页面浏览量总计。
+    参考：/metrics/pageviews/per-article/{project}/{access}/{agent}/{article}/{granularity}/{start}/{end}
+    project 例如 zh.wikipedia
+    """
+    series = wiki_pageviews_daily(title, days=days, lang=lang, timeout=timeout)
+    if series is None:
         return None
+    return sum(p["views"] for p in series)
+
 
-    items = data.get("items", [])
-    total = sum(it.get("views", 0) for it in items)
-    _METRIC_CACHE.set(cache_key, total)
-    return total
\ No newline at end of file
+def wiki_pageviews_multi(title: str, langs: Sequence[str] = ("zh", "en"), days: int = 30, timeout: float = 6.0) -> Dict[str, Optional[List[Dict]]]:
+    """并发获取多个语言版本的按日浏览量：{lang: series | None}。"""
+    with InstrumentedThreadPool("pageviews", max_workers=len(langs)) as ex:
+        futures = {lang: ex.submit(wiki_pageviews_daily, title, days, lang, timeout) for lang in langs}
+    return {lang: f.result() for lang, f in futures.items()}
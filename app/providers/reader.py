@@ -1,52 +1,139 @@
 from typing import Optional, List, Dict
-import httpx
-from urllib.parse import quote
+from concurrent.futures import Future
+import codecs
+import threading
+import time
+from app.utils import http
+from urllib.parse import quote, urlsplit
+from app.config import reader_backend
+from app.utils.canonical import content_digest, url_key
 from app.utils.cache import TTLCache
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.utils.extract import ContentExtractor, sniff_charset
+from app.utils.instrument import InstrumentedThreadPool, inc
+from app.utils.deadline import Deadline, budget_timeout, completed_within
 
-# 使用 Jina Reader 的公开端点，无需 API Key
-# 参考：对任意URL使用 r.jina.ai 获取提取后的纯文本
-# e.g. https://r.jina.ai/http://example.com
+# 默认直连原站流式下载并在本地抽取正文，失败（非 HTML、正文过短、请求出错）时
+# 回退到 Jina Reader 的公开端点（无需 API Key），e.g. https://r.jina.ai/http://example.com
 
-_READ_CACHE = TTLCache(ttl_seconds=600)  # 10分钟缓存
+# 正文缓存分两层（10分钟）：规范化 URL 键 -> 正文摘要，摘要 -> 正文；
+# 不同 URL（跟踪参数、移动站、跳转链接、转载）抽取出相同正文时只存一份
+_READ_CACHE = TTLCache(ttl_seconds=600, name="reader")
+_TEXT_CACHE = TTLCache(ttl_seconds=600, name="reader_text")
+# 各域名已验证的正文容器签名，命中后该容器一结束即停止下载
+_RULES = TTLCache(ttl_seconds=86400, name="extract_rules")
+# auto 模式下本地抽取可使用的超时比例，其余留给 Jina 回退
+_LOCAL_TIMEOUT_SHARE = 0.6
+# 单页最多下载的字节数
+_MAX_HTML_BYTES = 1_500_000
+_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; WeiyuReader/1.0)", "Accept": "text/html,application/xhtml+xml"}
+
+# 延迟加载模式的后台预取线程池（响应返回后再拉取正文，结果进入正文缓存）
+_PREFETCH_POOL = InstrumentedThreadPool("reader_prefetch", max_workers=4)
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _cache_get(url: str, peek: bool = False) -> Optional[str]:
+    key = url_key(url)
+    digest = _READ_CACHE.peek(key) if peek else _READ_CACHE.get(key)
+    return _TEXT_CACHE.peek(digest) if digest is not None else None
+
+
+def _cache_put(url: str, text: str):
+    digest = content_digest(text)
+    # 已有相同正文时沿用其文本对象，只新增 URL 映射
+    _TEXT_CACHE.set(digest, _TEXT_CACHE.peek(digest) or text)
+    _READ_CACHE.set(url_key(url), digest)
+
+
+def cached_digest(url: str) -> Optional[str]:
+    """已缓存正文的摘要（供索引按正文去重），不发请求。"""
+    return _READ_CACHE.peek(url_key(url)) if url else None
+
+
+def _extract_local(url: str, timeout_seconds: float) -> Optional[str]:
+    """
+    直连原站流式下载 HTML，边下载边增量解析；抽取失败返回 None。
+    URL 来自 feed 与搜索结果，不可信：只访问公网地址（每次重定向都重新校验），不让服务端替调用方访问内网。
+    """
+    host = urlsplit(url).netloc
+    rule = _RULES.get(host)
+    with http.stream(url, timeout=timeout_seconds, headers=_HEADERS, public_only=True) as resp:
+        ctype = resp.headers.get("content-type", "")
+        if "html" not in ctype.lower():
+            return None
+        parser = decoder = None
+        total = 0
+        for chunk in resp.iter_bytes():
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(sniff_charset(ctype, chunk[:4096]))(errors="replace")
+                parser = ContentExtractor(rule=rule)
+            parser.feed(decoder.decode(chunk))
+            total += len(chunk)
+            if parser.done or total >= _MAX_HTML_BYTES:
+                break
+    if parser is None:
+        return None
+    result = parser.result()
+    if not result["text"]:
+        return None
+    if result["rule"] and result["rule"] != rule:
+        _RULES.set(host, result["rule"])
+    return result["text"]
+
+
+def _extract_jina(url: str, timeout_seconds: float) -> Optional[str]:
+    # 兼容http/https，进行URL编码
+    encoded = quote(url, safe="/:?&=%#")
+    return http.get(f"https://r.jina.ai/{encoded}", timeout=timeout_seconds).text or None
+
+
+def _extract(url: str, timeout_seconds: float, max_chars: int) -> Optional[str]:
+    """按 READER_BACKEND 抽取正文并写入缓存：auto 先本地抽取，失败再用 Jina Reader。"""
+    backend = reader_backend()
+    text = None
+    t0 = time.monotonic()
+    if backend != "jina":
+        local_timeout = timeout_seconds * _LOCAL_TIMEOUT_SHARE if backend == "auto" else timeout_seconds
+        try:
+            text = _extract_local(url, local_timeout)
+        except Exception:
+            text = None
+        inc("weiyu_reader_total", backend="local", result="ok" if text else "fail")
+    if text is None and backend != "local":
+        try:
+            text = _extract_jina(url, max(1.0, timeout_seconds - (time.monotonic() - t0)))
+        except Exception:
+            text = None
+        inc("weiyu_reader_total", backend="jina", result="ok" if text else "fail")
+    if not text:
+        return None
+    # 截断以避免极长内容影响性能
+    text = text[:max_chars]
+    _cache_put(url, text)
+    return text
 
 
 def fetch_content(url: str, timeout_seconds: float = 6.0, max_chars: int = 4000) -> Optional[str]:
     if not url:
         return None
 
-    cached = _READ_CACHE.get(url)
+    cached = _cache_get(url)
     if cached is not None:
         return cached
-
-    try:
-        # 兼容http/https，进行URL编码
-        encoded = quote(url, safe="/:?&=%#")
-        reader_url = f"https://r.jina.ai/{encoded}"
-        with httpx.Client(timeout=timeout_seconds) as client:
-            resp = client.get(reader_url)
-            resp.raise_for_status()
-            text = resp.text
-            if not text:
-                return None
-            # 截断以避免极长内容影响性能
-            text = text[:max_chars]
-            _READ_CACHE.set(url, text)
-            return text
-    except Exception:
-        return None
+    return _extract(url, timeout_seconds, max_chars)
 
 
-def fetch_contents_bulk(urls: List[str], timeout_seconds: float = 4.0, max_chars: int = 4000, max_workers: int = 6) -> Dict[str, Optional[str]]:
+def fetch_contents_bulk(urls: List[str], timeout_seconds: float = 4.0, max_chars: int = 4000, max_workers: int = 6, deadline: Optional[Deadline] = None) -> Dict[str, Optional[str]]:
     """
     并发批量拉取正文，提升整体速度；自动复用缓存。
-    返回：{url: content or None}
+    返回：{url: content or None}；传入 deadline 时，预算内未完成的 URL 不出现在结果中。
     """
     results: Dict[str, Optional[str]] = {}
     # 先尝试命中缓存，减少网络请求
     pending: List[str] = []
     for u in urls:
-        cached = _READ_CACHE.get(u)
+        cached = _cache_get(u)
         if cached is not None:
             results[u] = cached
         else:
@@ -56,28 +143,64 @@ def fetch_contents_bulk(urls: List[str], timeout_seconds: float = 4.0, max_chars
         return results
 
     def _task(u: str) -> Optional[str]:
-        try:
-            encoded = quote(u, safe="/:?&=%#")
-            reader_url = f"https://r.jina.ai/{encoded}"
-            with httpx.Client(timeout=timeout_seconds) as client:
-                resp = client.get(reader_url)
-                resp.raise_for_status()
-                text = resp.text
-                if not text:
-                    return None
-                text = text[:max_chars]
-                _READ_CACHE.set(u, text)
-                return text
-        except Exception:
-            return None
+        return _extract(u, budget_timeout(deadline, timeout_seconds), max_chars)
+
+    # 规范化后相同的 URL 只抓取一次
+    by_key: Dict[str, List[str]] = {}
+    for u in pending:
+        by_key.setdefault(url_key(u), []).append(u)
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_map = {executor.submit(_task, u): u for u in pending}
-        for fut in as_completed(future_map):
-            u = future_map[fut]
+    executor = InstrumentedThreadPool("reader", max_workers=max_workers)
+    try:
+        future_map = {executor.submit(_task, group[0]): group for group in by_key.values()}
+        for fut in completed_within(future_map, deadline):
             try:
-                results[u] = fut.result()
+                text = fut.result()
             except Exception:
-                results[u] = None
+                text = None
+            for u in future_map[fut]:
+                results[u] = text
+    finally:
+        executor.shutdown(wait=deadline is None, cancel_futures=deadline is not None)
+
+    return results
+
 
-    return results
\ No newline at end of file
+def cached_content(url: str) -> Optional[str]:
+    """仅查缓存，不发请求。"""
+    return _cache_get(url, peek=True) if url else None
+
+
+def prefetch_contents(urls: List[str], timeout_seconds: float = 4.0, max_chars: int = 4000) -> int:
+    """把未缓存的 URL 提交到后台预取，立即返回提交数。"""
+    pending: Dict[str, str] = {}
+    for u in urls:
+        if u and _cache_get(u, peek=True) is None:
+            pending.setdefault(url_key(u), u)
+    with _INFLIGHT_LOCK:
+        pending = {k: u for k, u in pending.items() if k not in _INFLIGHT}
+        for k, u in pending.items():
+            fut = _PREFETCH_POOL.submit(fetch_content, u, timeout_seconds, max_chars)
+            _INFLIGHT[k] = fut
+            fut.add_done_callback(lambda _f, k=k: _forget_inflight(k))
+    return len(pending)
+
+
+def _forget_inflight(key: str):
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.pop(key, None)
+
+
+def load_content(url: str, timeout_seconds: float = 6.0, max_chars: int = 4000) -> Optional[str]:
+    """按需加载正文：命中缓存直接返回；正在后台预取则等待其结果，避免重复请求；否则立即抽取。"""
+    cached = cached_content(url)
+    if cached is not None:
+        return cached
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(url_key(url))
+    if fut is not None:
+        try:
+            return fut.result(timeout=timeout_seconds)
+        except Exception:
+            return cached_content(url)
+    return fetch_content(url, timeout_seconds=timeout_seconds, max_chars=max_chars)
@@ -1,9 +1,15 @@
 from typing import List, Dict, Tuple
-import feedparser
-import httpx
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import calendar
+from app.utils import feed_registry, http
+from typing import Optional
 from app.utils.cache import TTLCache
 from app.utils.terms import expand_terms, normalize_text
+from app.utils.pool import get_process_pool
+from app.utils.instrument import InstrumentedThreadPool
+from app.utils.deadline import Deadline, budget_timeout, completed_within
+from app.utils.relevance import score_entries
+from app.utils.timeparse import parse_ts
+from app.config import rss_relevance_engine
 from difflib import SequenceMatcher
 
 
@@ -21,27 +27,69 @@ DEFAULT_FEEDS = [
     "https://rsshub.app/ifeng/news",
 ]
 
-# 5分钟缓存，减少重复拉取
-_FEED_CACHE = TTLCache(ttl_seconds=300)
+# 5分钟缓存，减少重复拉取（feed 调度器写入的条目按该 feed 的刷新周期延长有效期）
+_FEED_CACHE = TTLCache(ttl_seconds=300, name="rss_feed")
+
+
+def rss_feeds() -> List[str]:
+    """当前 RSS 源：注册表（config/feeds.json）中的 rss 源，注册表为空时使用 DEFAULT_FEEDS。"""
+    return feed_registry.rss_urls() or DEFAULT_FEEDS
+
+
+def store_feed(url: str, content: bytes, ttl: float):
+    """由 feed 调度器写入新拉取的内容，请求路径随后直接命中缓存。"""
+    _FEED_CACHE.set(url, content, ttl=ttl)
 
 
 def _get_feed_content(url: str, timeout_seconds: float = 3.0) -> Tuple[str, bytes]:
     """
-    返回 (url, content_bytes)。若失败返回 (url, b"").
-    使用简单的缓存以降低重复请求带来的速度问题。
+    返回 (url, content_bytes)。若失败（含熔断跳过）返回 (url, b"")，失败情况可在 /health/feeds 查看。
+    使用简单的缓存以降低重复请求带来的速度问题；主地址失败或熔断时依次尝试注册表中配置的镜像。
     """
     cached = _FEED_CACHE.get(url)
     if cached is not None:
         return url, cached
-    try:
-        with httpx.Client(timeout=timeout_seconds) as client:
-            resp = client.get(url)
-            resp.raise_for_status()
-            content = resp.content
+    for candidate in feed_registry.mirror_urls(url):
+        try:
+            content = http.get(candidate, timeout=timeout_seconds, feed=True).content
+        except Exception:
+            continue
         _FEED_CACHE.set(url, content)
         return url, content
-    except Exception:
-        return url, b""
+    return url, b""
+
+
+def _entry_ts(entry) -> Optional[int]:
+    """条目发布时间（epoch 秒）：优先用 feedparser 已解析的 UTC 时间，否则解析原始字符串。"""
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    if parsed:
+        try:
+            return calendar.timegm(parsed)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return parse_ts(entry.get("published", "") or entry.get("updated", ""))
+
+
+def fetch_feed_entries(url: str, timeout_seconds: float = 3.0) -> List[Dict]:
+    """拉取（或命中缓存）并解析单个 feed：[{title, summary, url, published_at, published_ts, source}]，失败返回空列表。"""
+    _, content = _get_feed_content(url, timeout_seconds)
+    if not content:
+        return []
+    import feedparser  # 首次解析时才载入（约 20ms），缩短进程冷启动
+
+    parsed = feedparser.parse(content)
+    source_title = parsed.feed.get("title", "RSS")
+    return [
+        {
+            "title": e.get("title", ""),
+            "summary": e.get("summary", "") or e.get("description", ""),
+            "url": e.get("link", ""),
+            "published_at": e.get("published", "") or e.get("updated", ""),
+            "published_ts": _entry_ts(e),
+            "source": source_title,
+        }
+        for e in parsed.entries
+    ]
 
 
 def _relevance(title: str, summary: str, terms: List[str]) -> Dict:
@@ -77,53 +125,102 @@ def _relevance(title: str, summary: str, terms: List[str]) -> Dict:
     return {"related": related, "score": score, "reason": reason, "summary": sent}
 
 
-def fetch_rss_items(query: str, max_items: int = 10, feeds: List[str] = None, timeout_seconds: float = 3.0, max_workers: int = 6) -> List[Dict]:
+def _parse_and_score(content: bytes, terms: List[str], max_items: int, since_ts: Optional[int] = None) -> List[Dict]:
+    """
+    解析单个 feed 并完成相关性评分，仅返回相关条目。
+    传入 since_ts 时，发布时间早于它的条目在评分前即被丢弃（发布时间未知的保留）。
+    作为进程池任务时，输入为原始字节、输出为过滤后的少量条目，进程间通信开销最小。
+    """
+    import feedparser
+
+    parsed = feedparser.parse(content)
+    source_title = parsed.feed.get("title", "RSS")
+    entries = []
+    for entry in parsed.entries:
+        ts = _entry_ts(entry)
+        if since_ts and ts is not None and ts < since_ts:
+            continue
+        entries.append((
+            entry.get("title", ""),
+            entry.get("summary", "") or entry.get("description", ""),
+            entry.get("link", ""),
+            entry.get("published", "") or entry.get("updated", ""),
+            ts,
+        ))
+    # 在爬取判断前先总结并判断相关性
+    if rss_relevance_engine() == "difflib":
+        rels = [_relevance(title, summary, terms) for title, summary, _, _, _ in entries]
+    else:
+        rels = score_entries([(title, summary) for title, summary, _, _, _ in entries], terms)
+
+    matched: List[Dict] = []
+    for (title, summary, link, published, ts), rel in zip(entries, rels):
+        if not rel["related"]:
+            continue
+
+        matched.append({
+            "title": title,
+            "summary": summary,
+            "source": source_title,
+            "published_at": published,
+            "published_ts": ts,
+            "url": link,
+            "relevance": rel,
+        })
+        if len(matched) >= max_items:
+            break
+    return matched
+
+
+def fetch_rss_items(query: str, max_items: int = 10, feeds: List[str] = None, timeout_seconds: float = 3.0, max_workers: int = 6, deadline: Optional[Deadline] = None, since_ts: Optional[int] = None) -> List[Dict]:
     """
     从若干 RSS 源抓取最新条目，并根据 query 做简单过滤（标题/摘要包含关键字）。
-    返回结构：[{title, summary, source, published_at, url}]
+    返回结构：[{title, summary, source, published_at, published_ts, url}]
+    传入 since_ts（epoch 秒）时只保留该时间之后发布的条目，在相关性评分之前过滤。
+    开启进程池（CPU_POOL_WORKERS）时，解析与评分在子进程中执行，不占用请求线程的 GIL。
+    传入 deadline 时，预算耗尽即返回已完成部分，未完成的下载/解析被取消。
     """
     if feeds is None:
-        feeds = DEFAULT_FEEDS
+        feeds = rss_feeds()
 
     items: List[Dict] = []
+    # 多词匹配（联想主题词）：与 feed 无关，只需计算一次
+    terms = expand_terms(query)
+    pool = get_process_pool()
+    parse_futures = []
 
     # 并发拉取RSS，显著降低等待时间
     futures = []
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    executor = InstrumentedThreadPool("rss_fetch", max_workers=max_workers)
+    try:
         for url in feeds:
-            futures.append(executor.submit(_get_feed_content, url, timeout_seconds))
-        for fut in as_completed(futures):
+            futures.append(executor.submit(_get_feed_content, url, budget_timeout(deadline, timeout_seconds)))
+        for fut in completed_within(futures, deadline):
             try:
                 url, content = fut.result()
             except Exception:
                 continue
             if not content:
                 continue
-            parsed = feedparser.parse(content)
-            source_title = parsed.feed.get("title", "RSS")
-            # 多词匹配（联想主题词）
-            terms = expand_terms(query)
-            for entry in parsed.entries:
-                title = entry.get("title", "")
-                summary = entry.get("summary", "") or entry.get("description", "")
-                link = entry.get("link", "")
-                published = entry.get("published", "") or entry.get("updated", "")
-                # 在爬取判断前先总结并判断相关性
-                rel = _relevance(title, summary, terms)
-                if not rel["related"]:
-                    continue
-
-                items.append({
-                    "title": title,
-                    "summary": summary,
-                    "source": source_title,
-                    "published_at": published,
-                    "url": link,
-                    "relevance": rel,
-                })
-                if len(items) >= max_items:
-                    break
+            if pool is not None:
+                # 下载完成即提交解析，网络等待与 CPU 计算相互重叠
+                parse_futures.append(pool.submit(_parse_and_score, content, terms, max_items, since_ts))
+                continue
+            items.extend(_parse_and_score(content, terms, max_items - len(items), since_ts))
             if len(items) >= max_items:
                 break
+    finally:
+        # 有预算时不再等待未完成的下载（其单次超时已压缩在预算内）
+        executor.shutdown(wait=deadline is None, cancel_futures=deadline is not None)
+
+    for fut in completed_within(parse_futures, deadline):
+        if len(items) >= max_items:
+            fut.cancel()
+            continue
+        try:
+            matched = fut.result()
+        except Exception:
+            continue
+        items.extend(matched[:max_items - len(items)])
 
-    return items
\ No newline at end of file
+    return items
@@ -1,23 +1,32 @@
-import httpx
+from app.utils import http
+from app.utils.search_cache import cached_search, quota_available
 from typing import List, Dict
 
 
 SERPER_ENDPOINT = "https://google.serper.dev/search"
 
 
-def search_serper(query: str, api_key: str, num: int = 6, gl: str = "cn", hl: str = "zh-cn") -> List[Dict]:
+def search_serper(query: str, api_key: str, num: int = 6, gl: str = "cn", hl: str = "zh-cn", timeout: float = 10) -> List[Dict]:
     """
     使用 Serper.dev 的 Google Search API 进行联网搜索。
 
     返回统一结构：[{title, summary, source, published_at, url}]
+    结果按规范化查询缓存，并受每日配额令牌桶约束（见 app/utils/search_cache.py）。
     """
+    return cached_search("serper", query, num, lambda: _search(query, api_key, num, gl, hl, timeout), variant=f"{gl}/{hl}")
+
+
+def serper_quota_available(query: str, num: int = 6, gl: str = "cn", hl: str = "zh-cn") -> bool:
+    """该查询可由缓存满足或仍有配额。"""
+    return quota_available("serper", query, num, variant=f"{gl}/{hl}")
+
+
+def _search(query: str, api_key: str, num: int, gl: str, hl: str, timeout: float) -> List[Dict]:
     headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
     payload = {"q": query, "gl": gl, "hl": hl}
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.post(SERPER_ENDPOINT, headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = http.post(SERPER_ENDPOINT, timeout=timeout, headers=headers, json=payload)
+        data = resp.json()
     except Exception:
         return []
 
@@ -1,13 +1,17 @@
-from typing import Dict, List
-import re
+from typing import Dict, List, Optional
 from difflib import SequenceMatcher
-import httpx
-import feedparser
+from app.utils import feed_registry, http
 from app.utils.cache import TTLCache
 from app.utils.terms import expand_terms, normalize_text
 from app.config import trend_platform_whitelist
+from app.utils.instrument import InstrumentedThreadPool
+from app.utils.deadline import Deadline, budget_timeout, completed_within
+from app.utils import trend_store
+from app.utils.events import cluster_titles
+import threading
+import time
 
-_TREND_CACHE = TTLCache(ttl_seconds=300)
+_TREND_CACHE = TTLCache(ttl_seconds=300, name="trending")
 
 
 TREND_FEEDS = {
@@ -24,30 +28,130 @@ TREND_FEEDS = {
 }
 
 
+def trend_feeds() -> Dict[str, str]:
+    """当前热榜源 {platform: url}：注册表（config/feeds.json）中的 trend 源，注册表为空时使用 TREND_FEEDS。"""
+    return feed_registry.trend_platforms() or TREND_FEEDS
+
+
+def _platform_of(feed_url: str) -> str:
+    for platform, url in trend_feeds().items():
+        if url == feed_url:
+            return platform
+    return feed_url
+
+
+def _parse_entries(content: bytes) -> List[Dict]:
+    import feedparser  # 延迟载入，缩短进程冷启动
+
+    parsed = feedparser.parse(content)
+    return [{"title": e.get("title", ""), "link": e.get("link", "")} for e in getattr(parsed, "entries", [])]
+
+
+def _on_fresh(feed_url: str, entries: List[Dict]):
+    if not entries:
+        return
+    platform = _platform_of(feed_url)
+    _update_latest(platform, entries)
+    # 新拉取的榜单写入快照历史（按平台限频）
+    try:
+        trend_store.append_snapshot(platform, [e["title"] for e in entries])
+    except Exception:
+        pass
+
+
+def store_feed(url: str, content: bytes, ttl: float):
+    """由 feed 调度器写入新拉取的榜单：更新缓存、最新榜单与快照历史。"""
+    _TREND_CACHE.set(url, content, ttl=ttl)
+    _on_fresh(url, _parse_entries(content))
+
+
 def _fetch_entries(feed_url: str, timeout: float = 5.0) -> List[Dict]:
     cached = _TREND_CACHE.get(feed_url)
     if cached is not None:
-        parsed = feedparser.parse(cached)
-    else:
+        return _parse_entries(cached)
+    # 主地址失败或熔断时依次尝试注册表中配置的镜像
+    for candidate in feed_registry.mirror_urls(feed_url):
         try:
-            with httpx.Client(timeout=timeout) as client:
-                resp = client.get(feed_url)
-                resp.raise_for_status()
-                content = resp.content
-            _TREND_CACHE.set(feed_url, content)
-            parsed = feedparser.parse(content)
+            content = http.get(candidate, timeout=timeout, feed=True).content
         except Exception:
-            return []
-    entries = []
-    for e in getattr(parsed, "entries", []):
-        entries.append({
-            "title": e.get("title", ""),
-            "link": e.get("link", ""),
-        })
-    return entries
+            continue
+        _TREND_CACHE.set(feed_url, content)
+        entries = _parse_entries(content)
+        _on_fresh(feed_url, entries)
+        return entries
+    return []
+
+
+# 各平台最新榜单与据此物化的跨平台事件簇：榜单刷新时（拉取线程/调度器上）重新聚类并整体替换，
+# 读取方只取当前快照，不加锁也不触发聚类
+_EVENTS_LOCK = threading.Lock()
+_LATEST: Dict[str, List[Dict]] = {}
+_LATEST_VERSION = 0
+_EVENTS_STATE = {"version": 0, "platforms": [], "clusters": [], "by_title": {}, "built_at": None}
+
 
+def _update_latest(platform: str, entries: List[Dict]):
+    global _EVENTS_STATE, _LATEST_VERSION
+    with _EVENTS_LOCK:
+        _LATEST[platform] = entries
+        _LATEST_VERSION += 1
+        version = _LATEST_VERSION
+        latest = dict(_LATEST)
+    # 聚类在锁外进行；并发刷新时只发布版本更新的结果，最新版本的快照包含所有平台的最新榜单
+    flat = [(p, rank, e.get("title", "")) for p, entries in latest.items() for rank, e in enumerate(entries, start=1)]
+    clusters = cluster_titles(flat)
+    by_title = {}
+    for c in clusters:
+        for t in c["titles"]:
+            by_title[(t["platform"], normalize_text(t["title"]))] = c
+    state = {"version": version, "platforms": sorted(latest), "clusters": clusters, "by_title": by_title, "built_at": time.time()}
+    with _EVENTS_LOCK:
+        if version > _EVENTS_STATE["version"]:
+            _EVENTS_STATE = state
+
+
+def _events_state() -> Dict:
+    return _EVENTS_STATE
+
+
+def refresh_trends(deadline: Optional[Deadline] = None) -> Dict[str, List[Dict]]:
+    """并发拉取白名单内全部平台热榜（命中缓存时不发请求），返回 {platform: entries}；预算内未返回的平台缺省。"""
+    whitelist = set(trend_platform_whitelist() or [])
+    platforms = [(p, u) for p, u in trend_feeds().items() if not whitelist or p in whitelist]
+    fetched: Dict[str, List[Dict]] = {}
+    executor = InstrumentedThreadPool("trending", max_workers=max(1, len(platforms)))
+    try:
+        future_map = {
+            executor.submit(_fetch_entries, url, budget_timeout(deadline, 5.0)): platform
+            for platform, url in platforms
+        }
+        for fut in completed_within(future_map, deadline):
+            try:
+                fetched[future_map[fut]] = fut.result()
+            except Exception:
+                fetched[future_map[fut]] = []
+    finally:
+        executor.shutdown(wait=deadline is None, cancel_futures=deadline is not None)
+    return fetched
+
+
+def current_events(min_platforms: int = 2) -> Dict:
+    """当前跨平台热点事件（覆盖平台数 ≥ min_platforms 的事件簇）。"""
+    state = _events_state()
+    events = [c for c in state["clusters"] if len(c["platforms"]) >= min_platforms]
+    return {"built_at": state["built_at"], "platforms": state["platforms"], "events": events}
+
+
+def events_for_titles(items: List[Dict]) -> List[Dict]:
+    """per-topic 报告使用：查出 [{platform, title}] 命中的事件簇（去重，保持簇的排序）。"""
+    state = _events_state()
+    hit = {}
+    for it in items:
+        c = state["by_title"].get((it.get("platform"), normalize_text(it.get("title", ""))))
+        if c is not None:
+            hit[c["id"]] = c
+    return [c for c in state["clusters"] if c["id"] in hit]
 
-_re_punct = re.compile(r"[\s#·・\-—_，,。\.！!？\?、/\\:：;；\[\]\(\)【】『』“”\"']+")
 
 def _match_title(title: str, terms: List[str]) -> bool:
     tl = (title or "").lower()
@@ -70,62 +174,25 @@ def _match_title(title: str, terms: List[str]) -> bool:
     return False
 
 
-def _expand_terms(query: str) -> List[str]:
-    """轻量同义词与变体扩展：
-    - 原始查询
-    - 去除常见修饰/尾缀（如“是什么”“怎么回事”“最新消息”等）
-    - 按空格/标点拆分的子词
-    - 针对常见英文别名（如 XPENG/XPEV）做大小写与缩写扩展
-    """
-    q = (query or "").strip()
-    terms: List[str] = []
-    if q:
-        terms.append(q)
-        # 去除常见中文尾缀/修饰词
-        cleaned = _re_punct.sub(" ", q)
-        cleaned = cleaned.replace("是什么", "").replace("怎么回事", "")
-        cleaned = cleaned.replace("最新消息", "").replace("最新", "")
-        cleaned = cleaned.replace("事件", "").replace("热搜", "")
-        cleaned = cleaned.replace("曝光", "").replace("官宣", "")
-        cleaned = cleaned.replace("发布会", "").replace("发布", "")
-        cleaned = cleaned.replace("涨价", "").replace("降价", "")
-        cq = cleaned.strip()
-        if cq and cq != q:
-            terms.append(cq)
-        # 拆分子词（中英文混合场景、包含空格的品牌名等）
-        for tok in cq.split():
-            if tok and tok not in terms:
-                terms.append(tok)
-
-        low = q.lower()
-        if "小鹏" in q:
-            terms.extend(["小鹏汽车", "xpeng", "xpev", "xpeng motors"]) 
-        if any(t in low for t in ["xpeng", "xpev"]):
-            terms.extend(["XPENG", "XPEV", "xpeng motors"]) 
-    # 去重保持顺序
-    seen = set()
-    dedup = []
-    for t in terms:
-        if t not in seen:
-            dedup.append(t)
-            seen.add(t)
-    return dedup
-
-
-def trending_presence(query: str) -> Dict:
+def trending_presence(query: str, deadline: Optional[Deadline] = None) -> Dict:
     """
     在各平台热榜中检测是否存在与 query 相关的条目。
     返回：{platform: {present: bool, matched: [titles...]}}
+    各平台热榜并发拉取；传入 deadline 时，预算内未返回的平台标记 timed_out=True。
     """
     q = (query or "").strip().lower()
     terms = expand_terms(query)
     # 仅处理白名单平台
     whitelist = set(trend_platform_whitelist() or [])
+    platforms = [(p, u) for p, u in trend_feeds().items() if not whitelist or p in whitelist]
+    fetched = refresh_trends(deadline)
+
     result = {}
-    for platform, url in TREND_FEEDS.items():
-        if whitelist and platform not in whitelist:
+    for platform, _url in platforms:
+        if platform not in fetched:
+            result[platform] = {"present": False, "matched": [], "matched_items": [], "timed_out": True}
             continue
-        entries = _fetch_entries(url)
+        entries = fetched[platform]
         matched_titles: List[str] = []
         matched_items: List[Dict] = []
         if q:
@@ -139,4 +206,21 @@ def trending_presence(query: str) -> Dict:
             "matched": matched_titles,
             "matched_items": matched_items,
         }
-    return result
\ No newline at end of file
+    return result
+
+def rank_trajectory(query: str, days: int = 14) -> Dict:
+    """
+    话题在各平台热榜的排名轨迹（来自快照历史）：
+    {platform: {first_seen, last_seen, best_rank, points: [{ts, rank, title}]}}
+    """
+    terms = expand_terms(query) or [query]
+    # 倒排索引先筛出候选，只对候选做（含模糊相似度的）精确匹配
+    ids = {tid for tid, title in trend_store.similar_titles(terms) if _match_title(title, terms)}
+    records = trend_store.query(ids, since=time.time() - days * 86400)
+    out: Dict[str, Dict] = {}
+    for r in records:
+        p = out.setdefault(r["platform"], {"first_seen": r["ts"], "last_seen": r["ts"], "best_rank": r["rank"], "points": []})
+        p["last_seen"] = r["ts"]
+        p["best_rank"] = min(p["best_rank"], r["rank"])
+        p["points"].append({"ts": r["ts"], "rank": r["rank"], "title": r["title"]})
+    return out
@@ -1,15 +1,20 @@
-import httpx
+from app.utils import http
+from app.utils.search_cache import cached_search
 from typing import List, Dict
 
 
 WIKI_ENDPOINT = "https://zh.wikipedia.org/w/api.php"
 
 
-def search_wiki(query: str, num: int = 6) -> List[Dict]:
+def search_wiki(query: str, num: int = 6, timeout: float = 10) -> List[Dict]:
     """
     使用中文维基百科搜索 API，返回页面 URL 与摘要（snippet）。
     返回结构：[{title, summary, source, published_at, url}]
     """
+    return cached_search("wiki", query, num, lambda: _search(query, num, timeout))
+
+
+def _search(query: str, num: int, timeout: float) -> List[Dict]:
     params = {
         "action": "query",
         "list": "search",
@@ -19,10 +24,8 @@ def search_wiki(query: str, num: int = 6) -> List[Dict]:
         "utf8": 1,
     }
     try:
-        with httpx.Client(timeout=10) as client:
-            resp = client.get(WIKI_ENDPOINT, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = http.get(WIKI_ENDPOINT, timeout=timeout, params=params)
+        data = resp.json()
     except Exception:
         return []
 
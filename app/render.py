@@ -0,0 +1,327 @@
+"""
+渲染子系统：
+- 进程内唯一的 Jinja2 Environment（模板只编译一次，并写入磁盘字节码缓存供新进程复用）
+- 导出用的内联 CSS 在启动时读取一次
+- 导出产物（HTML/Markdown）按报告内容哈希缓存于内存，预先 gzip，并以哈希作为 ETag 支持条件请求
+- JSON 报告：去掉重复的热榜结构，支持字段投影与素材分页，按报告 id 缓存供看板轮询
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import jinja2
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config import template_cache_dir, export_cache_size
+from app.utils.cache import TTLCache
+
+try:
+    # 可选依赖：安装后 JSON 序列化快一个数量级，未安装时回退到标准库
+    import orjson
+except ImportError:
+    orjson = None
+
+TEMPLATE_DIR = "templates"
+_CSS_PATH = Path("static/style.css")
+_CSS_LINK = '<link rel="stylesheet" href="/static/style.css" />'
+
+
+def _build_env() -> jinja2.Environment:
+    bcc = None
+    cache_dir = template_cache_dir()
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            bcc = jinja2.FileSystemBytecodeCache(cache_dir)
+        except OSError:
+            bcc = None
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        autoescape=jinja2.select_autoescape(["html"]),
+        bytecode_cache=bcc,
+        # 模板在进程生命周期内不变，跳过每次 get_template 的 mtime 检查
+        auto_reload=False,
+    )
+
+
+ENV = _build_env()
+_INLINE_CSS = f"<style>\n{_CSS_PATH.read_text(encoding='utf-8')}\n</style>" if _CSS_PATH.exists() else "<style>\n\n</style>"
+
+
+def render_html_export(context: Dict) -> str:
+    html = ENV.get_template("report.html").render(context)
+    # 只替换 <head> 中的第一处样式链接，避免对整篇文档做全量替换
+    return html.replace(_CSS_LINK, _INLINE_CSS, 1)
+
+
+def render_markdown(topic: str, report: Dict) -> str:
+    lines: List[str] = []
+    lines.append(f"# 舆情报告 - {topic}")
+    lines.append("")
+    if report.get("generated_at"):
+        lines.append(f"生成时间：{report['generated_at']}")
+    lines.append(f"素材条数：{report['stats']['item_count']} | 来源域名数：{report['stats']['domain_count']}")
+    lines.append("")
+    if report.get('missing_sections'):
+        lines.append(f"> 部分数据缺失（快速模式预算 {report.get('budget_seconds')} 秒）：")
+        for m in report['missing_sections']:
+            lines.append(f"> - {m['section']}：{m['detail']}")
+        lines.append("")
+    lines.append("## 关键指标")
+    lines.append(f"- 维基浏览量（中文）：{report['metrics'].get('wiki_pageviews_zh', 'N/A')}")
+    lines.append(f"- 维基浏览量（英文）：{report['metrics'].get('wiki_pageviews_en', 'N/A')}")
+    lines.append(f"- RSS 命中条数：{report['metrics'].get('rss_mentions_count', 0)}")
+    if report['metrics'].get('platform_whitelist'):
+        plats = ", ".join(report['metrics']['platform_whitelist'])
+        lines.append(f"- 平台白名单：{plats}")
+    lines.append("")
+    lines.append("## 热点关键词（Top10）")
+    for kw in report.get('keywords', []):
+        lines.append(f"- {kw['word']} x{kw['count']}")
+    lines.append("")
+    lines.append("## 情感/倾向")
+    s = report.get('sentiment', {})
+    lines.append(f"- 积极：{s.get('positive', 0)}；消极：{s.get('negative', 0)}；分值：{s.get('score', 0)}；倾向：{s.get('tendency', 'N/A')}")
+    lines.append("")
+    lines.append("## 平台热榜匹配")
+    ta = report['metrics'].get('trending_agg', {})
+    for key, label in [
+        ('weibo_items', '微博'), ('zhihu_items', '知乎'), ('bilibili_items', '哔哩哔哩'),
+        ('sina_items', '新浪'), ('toutiao_items', '今日头条'), ('douyin_items', '抖音'), ('xiaohongshu_items', '小红书')
+    ]:
+        items = ta.get(key) or []
+        if items:
+            lines.append(f"- {label}热榜匹配：")
+            for it in items:
+                title = it.get('title', '')
+                link = it.get('link', '')
+                lines.append(f"  - [{title}]({link})")
+    lines.append("")
+    lines.append("## 总体摘要")
+    lines.append(report.get('summary', ''))
+    lines.append("")
+    lines.append("## 后续行动建议")
+    for a in report.get('actions', []):
+        lines.append(f"- {a}")
+    return "\n".join(lines)
+
+
+# ---- 导出产物缓存 ----
+
+_ARTIFACTS: "OrderedDict[str, Dict]" = OrderedDict()
+_ARTIFACT_LOCK = threading.Lock()
+
+_FORMATS = {
+    "html": "text/html; charset=utf-8",
+    "md": "text/markdown; charset=utf-8",
+}
+
+
+def export_report_view(report: Dict) -> Dict:
+    """导出产物按内容哈希复用，去掉 generated_at，避免复用时展示首次生成的时间。"""
+    return {k: v for k, v in report.items() if k != "generated_at"}
+
+
+def report_digest(report: Dict, topic: str, source: str, fast: bool, fmt: str) -> str:
+    """
+    报告内容哈希：忽略每次生成都会变化的字段（generated_at、fetch_time、report_id），
+    使内容未变的重复导出命中同一产物与 ETag。debug 会渲染进产物，因此计入哈希；
+    generated_at 不计入，导出产物也不渲染它（见 export_report_view）。
+    """
+    stable = {k: v for k, v in report.items() if k not in ("generated_at", "report_id")}
+    stable["items"] = [
+        {k: v for k, v in it.items() if k != "fetch_time"} for it in report.get("items", [])
+    ]
+    payload = json.dumps(
+        {"fmt": fmt, "topic": topic, "source": source, "fast": fast, "report": stable},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_artifact(digest: str) -> Optional[Dict]:
+    with _ARTIFACT_LOCK:
+        art = _ARTIFACTS.get(digest)
+        if art is not None:
+            _ARTIFACTS.move_to_end(digest)
+        return art
+
+
+def put_artifact(digest: str, fmt: str, text: str, filename: str) -> Dict:
+    body = text.encode("utf-8")
+    art = {
+        "etag": f'"{digest}"',
+        "fmt": fmt,
+        "media_type": _FORMATS.get(fmt, "application/octet-stream"),
+        "body": body,
+        "gzip": gzip.compress(body, compresslevel=6),
+        "filename": filename,
+    }
+    with _ARTIFACT_LOCK:
+        _ARTIFACTS[digest] = art
+        _ARTIFACTS.move_to_end(digest)
+        while len(_ARTIFACTS) > export_cache_size():
+            _ARTIFACTS.popitem(last=False)
+    return art
+
+
+def content_disposition(filename: str) -> str:
+    """兼容非 ASCII 文件名（RFC 6266 / RFC 5987）：提供 ASCII 回退名与 UTF-8 编码名。"""
+    ascii_name = "".join(c if (c.isascii() and (c.isalnum() or c in "._-")) else "_" for c in filename)
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    candidates = [t.strip() for t in inm.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def artifact_response(request: Request, digest: str, art: Dict) -> Response:
+    """按 If-None-Match 返回 304，按 Accept-Encoding 返回预压缩的 gzip 正文。"""
+    headers = {
+        "ETag": art["etag"],
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "Content-Location": f"/reports/{digest}.{art['fmt']}",
+        "Content-Disposition": content_disposition(art["filename"]),
+    }
+    if _etag_matches(request, art["etag"]):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in (request.headers.get("accept-encoding") or "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=art["gzip"], media_type=art["media_type"], headers=headers)
+    return Response(content=art["body"], media_type=art["media_type"], headers=headers)
+
+
+# ---- JSON 报告 API ----
+
+# 报告体积较大：除 30 分钟过期外再限制条数，超出时淘汰最早登记的报告
+_JSON_REPORTS = TTLCache(ttl_seconds=1800, name="json_reports", max_items=500)
+_MAX_PAGE_SIZE = 100
+
+
+def store_report(report: Dict) -> str:
+    """缓存报告供 /api/reports/{id} 轮询，返回报告 id（延迟加载报告沿用已有 id）。"""
+    report_id = report.setdefault("report_id", uuid.uuid4().hex[:12])
+    _JSON_REPORTS.set(report_id, report)
+    return report_id
+
+
+def get_report(report_id: str) -> Optional[Dict]:
+    return _JSON_REPORTS.get(report_id)
+
+
+def _compact(report: Dict) -> Dict:
+    """
+    去掉重复结构：metrics.trending 每个平台只保留 matched_items（matched 为其标题列表），
+    trending_agg 为按平台再次拼装的同一批条目，整体省略。
+    """
+    out = dict(report)
+    metrics = dict(out.get("metrics") or {})
+    metrics.pop("trending_agg", None)
+    trending = {}
+    for platform, data in (metrics.get("trending") or {}).items():
+        entry = {"present": data.get("present", False), "items": data.get("matched_items", [])}
+        if data.get("timed_out"):
+            entry["timed_out"] = True
+        trending[platform] = entry
+    metrics["trending"] = trending
+    out["metrics"] = metrics
+    return out
+
+
+def _path_tree(paths: List[str]) -> Dict:
+    """["a.b", "a.c", "d"] -> {"a": {"b": {}, "c": {}}, "d": {}}；空字典表示取整个子树。"""
+    tree: Dict = {}
+    whole = set()  # 已整体选取的路径，其下更细的路径无需再记
+    for path in sorted(paths, key=lambda p: p.count(".")):
+        parts = [p for p in path.strip().split(".") if p]
+        if not parts or any(".".join(parts[:i]) in whole for i in range(1, len(parts))):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = {}
+        whole.add(".".join(parts))
+    return tree
+
+
+def _include(value: Any, tree: Dict) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_include(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: _include(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+def _exclude(value: Any, tree: Dict) -> Any:
+    if isinstance(value, list):
+        return [_exclude(v, tree) for v in value]
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            if k not in tree:
+                out[k] = v
+            elif tree[k]:
+                out[k] = _exclude(v, tree[k])
+        return out
+    return value
+
+
+def project_report(report: Dict, fields: str = "", exclude: str = "", page: int = 1, page_size: int = 20) -> Dict:
+    """
+    JSON 报告视图：先去重复结构并对 items 分页，再按 fields（点号路径，列表按元素应用，如 items.title）
+    选取、按 exclude 剔除（如 items.content）。分页信息见 items_page。
+    """
+    out = _compact(report)
+    items = out.get("items") or []
+    page_size = max(1, min(page_size, _MAX_PAGE_SIZE))
+    pages = max(1, -(-len(items) // page_size))
+    page = max(1, min(page, pages))
+    out["items"] = items[(page - 1) * page_size: page * page_size]
+    out["items_page"] = {"page": page, "page_size": page_size, "total": len(items), "pages": pages}
+    include_paths = [f for f in fields.split(",") if f.strip()]
+    if include_paths:
+        out = _include(out, _path_tree(include_paths + ["report_id", "items_page"]))
+    exclude_paths = [f for f in exclude.split(",") if f.strip()]
+    if exclude_paths:
+        out = _exclude(out, _path_tree(exclude_paths))
+    return out
+
+
+def _json_default(value: Any):
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+def dumps_json(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def json_response(request: Request, value: Any) -> Response:
+    """紧凑 JSON；以正文哈希作 ETag 支持轮询时的 304，按 Accept-Encoding 压缩。"""
+    body = dumps_json(value)
+    etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if len(body) > 1024 and "gzip" in (request.headers.get("accept-encoding") or "").lower():
+        headers["Content-Encoding"] = "gzip"
+        body = gzip.compress(body, compresslevel=5)
+    return Response(content=body, media_type="application/json", headers=headers)
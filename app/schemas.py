@@ -7,4 +7,5 @@ class Item(BaseModel):
     summary: str
     source: Optional[str] = None
     published_at: Optional[str] = None
+    published_ts: Optional[int] = None
     url: Optional[str] = None
\ No newline at end of file
@@ -1,27 +1,72 @@
 import time
-from typing import Any, Dict, Tuple
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+# 所有缓存实例的弱引用登记表，便于统一清空（基准测试冷启动）与观测
+_REGISTRY: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
 
 
 class TTLCache:
     """简单的内存TTL缓存，用于减少重复网络请求。
 
     cache[key] = (expire_ts, value)
+    过期条目只在读取时清除；键不断变化（如每次请求新生成的 id）的缓存应设置 max_items，
+    超出时按写入顺序淘汰最旧的条目（同一 TTL 下即最先过期的条目）。
     """
 
-    def __init__(self, ttl_seconds: int = 300):
+    def __init__(self, ttl_seconds: int = 300, name: str = "", max_items: int = 0):
         self.ttl = ttl_seconds
+        self.name = name
+        self.max_items = max_items
         self._store: Dict[str, Tuple[float, Any]] = {}
+        # 命中统计（用于 /metrics 的缓存命中率）
+        self.hits = 0
+        self.misses = 0
+        _REGISTRY.add(self)
 
     def get(self, key: str):
         item = self._store.get(key)
         if not item:
+            self.misses += 1
             return None
         expire, value = item
         if time.time() > expire:
             self._store.pop(key, None)
+            self.misses += 1
             return None
+        self.hits += 1
         return value
 
-    def set(self, key: str, value: Any):
-        expire_ts = time.time() + self.ttl
-        self._store[key] = (expire_ts, value)
\ No newline at end of file
+    def peek(self, key: str):
+        """读取但不计入命中统计。"""
+        item = self._store.get(key)
+        if not item or time.time() > item[0]:
+            return None
+        return item[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """ttl 缺省使用实例的 ttl_seconds（后台按周期刷新的条目可单独指定更长的有效期）。"""
+        expire_ts = time.time() + (self.ttl if ttl is None else ttl)
+        # 先移除再写入，使重写的键排到最后（淘汰顺序即写入顺序）
+        self._store.pop(key, None)
+        self._store[key] = (expire_ts, value)
+        while self.max_items and len(self._store) > self.max_items:
+            try:
+                self._store.pop(next(iter(self._store)), None)
+            except (StopIteration, RuntimeError):
+                break
+
+    def clear(self):
+        self._store.clear()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+def all_caches() -> List[TTLCache]:
+    return list(_REGISTRY)
+
+
+def clear_all_caches():
+    for c in all_caches():
+        c.clear()
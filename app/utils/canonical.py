@@ -0,0 +1,106 @@
+"""
+URL 规范化与正文摘要：同一篇文章经不同链接（utm_* 等跟踪参数、m. 移动站、末尾斜杠、
+RSSHub/站点跳转链接）到达时归为同一条素材，正文相同的不同 URL 共用一份缓存与索引文档。
+
+- canonical_url：素材入库时改写 url，仍是可直接抓取的地址（保留原 host）
+- url_key：缓存/去重键，在 canonical_url 基础上再去掉 www./m. 等主机前缀与协议
+- content_digest：抽取后正文的摘要（忽略空白差异）
+"""
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的跟踪/分享参数（utm_* 另按前缀匹配）
+_TRACKING_PARAMS = {
+    "spm", "fbclid", "gclid", "yclid", "msclkid", "mc_cid", "mc_eid", "from", "share_source", "share_medium",
+    "share_plat", "share_tag", "share_token", "shareuid", "isappinstalled", "scene", "clicktime", "enterid",
+    "wfr", "ref", "ref_src", "ref_url", "track_id", "sharer_shareid", "sharer_sharetime", "_wv", "tt_from",
+}
+# 跳转链接中承载目标地址的参数名
+_TARGET_PARAMS = ("target", "url", "u", "q", "to", "redirect", "redirect_url", "link", "dest", "goto")
+# 已知的跳转服务（host 或 host+path 前缀）；其它 host 仅当路径像跳转（redirect/jump/link）时才展开
+_REDIRECTORS = ("link.zhihu.com", "link.juejin.cn", "www.google.com/url", "weibo.cn/sinaurl", "www.jianshu.com/go-wild",
+                "link.csdn.net", "t.me/iv", "rsshub.app/redirect")
+_REDIRECT_PATH = re.compile(r"/(redirect|jump|go|link|out|url)\b", re.I)
+# url_key 中忽略的移动站/默认子域名前缀
+_HOST_PREFIXES = ("www.", "m.", "mobile.", "wap.", "3g.")
+
+
+def _unwrap_redirect(parts) -> str:
+    host_path = f"{parts.netloc}{parts.path}".rstrip("/")
+    if not (parts.netloc in _REDIRECTORS or any(host_path.startswith(r) for r in _REDIRECTORS) or _REDIRECT_PATH.search(parts.path)):
+        return ""
+    params = dict(parse_qsl(parts.query, keep_blank_values=False))
+    for name in _TARGET_PARAMS:
+        target = params.get(name, "").strip()
+        if target.lower().startswith(("http%3a", "https%3a")):
+            # 二次编码的目标地址
+            target = unquote(target)
+        if target.startswith(("http://", "https://")):
+            return target
+    return ""
+
+
+@lru_cache(maxsize=8192)
+def canonical_url(url: str) -> str:
+    """规范化可抓取的 URL；非 http(s) 或无法解析的原样返回。"""
+    url = (url or "").strip()
+    for _ in range(3):  # 跳转链接可能多层嵌套
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url
+        if parts.scheme.lower() not in ("http", "https") or not parts.netloc:
+            return url
+        target = _unwrap_redirect(parts)
+        if not target:
+            break
+        url = target
+    scheme = parts.scheme.lower()
+    host = parts.netloc.lower()
+    if (scheme == "http" and host.endswith(":80")) or (scheme == "https" and host.endswith(":443")):
+        host = host.rsplit(":", 1)[0]
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def url_key(url: str) -> str:
+    """缓存/去重键：忽略协议与 www./m. 等主机前缀。"""
+    canon = canonical_url(url)
+    parts = urlsplit(canon)
+    if not parts.netloc:
+        return canon
+    host = parts.netloc
+    for prefix in _HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") >= 2:
+            host = host[len(prefix):]
+            break
+    path = "" if parts.path == "/" else parts.path
+    return f"{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def content_digest(text: str) -> str:
+    return hashlib.blake2b(" ".join((text or "").split()).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def canonicalize_items(items: Iterable[Dict]) -> List[Dict]:
+    """就地规范化素材 url，并按 url_key 去重（保留首条）。"""
+    out, keys = [], set()
+    for it in items:
+        url = it.get("url")
+        if url:
+            it["url"] = canonical_url(url)
+            key = url_key(url)
+            if key in keys:
+                continue
+            keys.add(key)
+        out.append(it)
+    return out
@@ -0,0 +1,232 @@
+"""
+上游调用录制/回放（CASSETTE_MODE=record|replay），用于可复现的性能分析：
+录下一次真实（或桩服务）运行的全部上游请求与响应，之后离线按原始或缩放后的耗时回放，
+同一份报告可在本地反复复现与剖析。所有 provider 的 HTTP 都经过 app/utils/http.py，在那里统一接入。
+
+磁盘格式（CASSETTE_PATH，仅追加）：文件头 b"WCR1"，其后每条记录为
+    <meta_len:uint32, body_len:uint32> + meta（JSON）+ body（zlib 压缩）
+新建磁带的第一条记录为 {clock: 录制当天（UTC，YYYY-MM-DD）}；回放时 today() 冻结为该日期，
+按当天推算日期区间的请求（如维基浏览量）在隔天回放时仍生成与录制时相同的 URL。
+meta = {k: 请求键, s: 状态码, ct: Content-Type, t: 耗时秒, e: 异常类型（超时/连接失败时）, b: 响应体摘要}。
+内容相同的响应体只存第一次（后续记录 body_len=0，按摘要引用），反复拉取的 feed 不会重复占用空间。
+
+请求键 = 方法 + 原始 URL（路由改写前）+ 排序后的查询参数 + JSON 请求体摘要，不含请求头。
+同一请求键录到多次时按录制顺序依次回放，用完后重复最后一次；回放中未录到的请求按连接失败处理，不访问网络。
+Meilisearch 客户端不经过 http.py，回放时视为未配置。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import httpx
+
+from app.config import cassette_latency_scale, cassette_mode, cassette_path
+
+_MAGIC = b"WCR1"
+_RECORD = struct.Struct("<II")
+# 回放时可还原的异常类型；其它异常统一按连接失败处理
+_ERRORS = {
+    "ConnectTimeout": httpx.ConnectTimeout,
+    "ReadTimeout": httpx.ReadTimeout,
+    "WriteTimeout": httpx.WriteTimeout,
+    "PoolTimeout": httpx.PoolTimeout,
+    "ConnectError": httpx.ConnectError,
+    "ReadError": httpx.ReadError,
+    "RemoteProtocolError": httpx.RemoteProtocolError,
+}
+
+_LOCK = threading.Lock()
+_WRITER = {"path": None, "bodies": set()}
+_TAPE: Dict[str, Any] = {"path": None, "entries": {}, "bodies": {}, "cursor": {}, "clock": None}
+
+
+def recording() -> bool:
+    return cassette_mode() == "record"
+
+
+def replaying() -> bool:
+    return cassette_mode() == "replay"
+
+
+def request_key(method: str, url: str, params: Optional[Dict[str, Any]] = None, json_body: Any = None) -> str:
+    key = f"{method.upper()} {url}"
+    if params:
+        key += ("&" if urlsplit(url).query else "?") + urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+    if json_body is not None:
+        raw = json.dumps(json_body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        key += " #" + hashlib.blake2b(raw, digest_size=8).hexdigest()
+    return key
+
+
+# ---- 录制 ----
+
+def record(key: str, seconds: float, response: Optional[httpx.Response] = None, error: Optional[BaseException] = None):
+    """追加一条记录（响应或异常）。写入失败不影响请求本身。"""
+    body = response.content if response is not None else b""
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest() if response is not None else ""
+    meta = {"k": key, "t": round(seconds, 4)}
+    if response is not None:
+        meta.update(s=response.status_code, ct=response.headers.get("content-type", ""), b=digest)
+    else:
+        meta["e"] = type(error).__name__ if error is not None else "ConnectError"
+    path = cassette_path()
+    try:
+        with _LOCK:
+            if _WRITER["path"] != path:
+                _WRITER.update(path=path, bodies=_existing_bodies(path))
+            payload = b""
+            if digest and digest not in _WRITER["bodies"]:
+                payload = zlib.compress(body, 6)
+                _WRITER["bodies"].add(digest)
+            meta_raw = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            new = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, "ab") as f:
+                if new:
+                    clock = json.dumps({"clock": datetime.utcnow().date().isoformat()}).encode("utf-8")
+                    f.write(_MAGIC + _RECORD.pack(len(clock), 0) + clock)
+                f.write(_RECORD.pack(len(meta_raw), len(payload)) + meta_raw + payload)
+    except OSError:
+        pass
+
+
+def _existing_bodies(path: str) -> set:
+    """继续向已有磁带追加时，沿用其中已存的响应体，避免重复写入。"""
+    return {meta["b"] for meta, _ in _read(path) if meta.get("b")}
+
+
+# ---- 回放 ----
+
+def _read(path: str) -> List[Tuple[Dict, bytes]]:
+    out = []
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return out
+    if not data.startswith(_MAGIC):
+        return out
+    pos = len(_MAGIC)
+    while pos + _RECORD.size <= len(data):
+        meta_len, body_len = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        meta = json.loads(data[pos:pos + meta_len])
+        pos += meta_len
+        out.append((meta, data[pos:pos + body_len]))
+        pos += body_len
+    return out
+
+
+def _tape() -> Dict:
+    """调用方持有 _LOCK。"""
+    path = cassette_path()
+    if _TAPE["path"] != path:
+        entries: Dict[str, List[Dict]] = {}
+        bodies: Dict[str, bytes] = {}
+        clock = None
+        for meta, payload in _read(path):
+            if "k" not in meta:
+                clock = clock or meta.get("clock")
+                continue
+            if payload:
+                bodies[meta["b"]] = zlib.decompress(payload)
+            entries.setdefault(meta["k"], []).append(meta)
+        _TAPE.update(path=path, entries=entries, bodies=bodies, cursor={}, clock=clock)
+    return _TAPE
+
+
+def today() -> date:
+    """当天日期（UTC）；回放带录制时钟的磁带时冻结为录制当天。"""
+    if replaying():
+        with _LOCK:
+            clock = _tape()["clock"]
+        if clock:
+            return date.fromisoformat(clock)
+    return datetime.utcnow().date()
+
+
+def _next(key: str) -> Optional[Dict]:
+    with _LOCK:
+        tape = _tape()
+        metas = tape["entries"].get(key)
+        if not metas:
+            return None
+        i = tape["cursor"].get(key, 0)
+        tape["cursor"][key] = i + 1
+        return metas[min(i, len(metas) - 1)]
+
+
+def _build(meta: Optional[Dict], key: str, method: str, url: str) -> httpx.Response:
+    if meta is None:
+        raise httpx.ConnectError(f"not in cassette: {key}")
+    if meta.get("e"):
+        raise _ERRORS.get(meta["e"], httpx.ConnectError)(f"recorded {meta['e']}: {key}")
+    with _LOCK:
+        body = _TAPE["bodies"].get(meta.get("b"), b"")
+    headers = {"content-type": meta["ct"]} if meta.get("ct") else {}
+    return httpx.Response(meta["s"], headers=headers, content=body, request=httpx.Request(method, url))
+
+
+def _delay(meta: Optional[Dict]) -> float:
+    return (meta or {}).get("t", 0.0) * cassette_latency_scale()
+
+
+def replay(key: str, method: str, url: str) -> httpx.Response:
+    """按录制顺序返回该请求的响应（或抛出录制时的异常），先按缩放后的原始耗时等待。"""
+    meta = _next(key)
+    wait = _delay(meta)
+    if wait > 0:
+        time.sleep(wait)
+    return _build(meta, key, method, url)
+
+
+async def areplay(key: str, method: str, url: str) -> httpx.Response:
+    meta = _next(key)
+    wait = _delay(meta)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return _build(meta, key, method, url)
+
+
+def rewind():
+    """回放游标归零并重新载入磁带（同一进程内重复回放时使用）。"""
+    with _LOCK:
+        _TAPE["path"] = None
+
+
+def summary(path: Optional[str] = None) -> Dict:
+    records = _read(path or cassette_path())
+    clock = next((m["clock"] for m, _ in records if "clock" in m), None)
+    records = [(m, p) for m, p in records if "k" in m]
+    hosts = Counter(urlsplit(m["k"].split(" ", 1)[1]).netloc for m, _ in records)
+    return {
+        "clock": clock,
+        "records": len(records),
+        "requests": len({m["k"] for m, _ in records}),
+        "errors": sum(1 for m, _ in records if m.get("e")),
+        "bodies": sum(1 for _, p in records if p),
+        "stored_bytes": sum(len(p) for _, p in records),
+        "recorded_seconds": round(sum(m.get("t", 0.0) for m, _ in records), 3),
+        "hosts": dict(hosts.most_common()),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect an upstream cassette")
+    ap.add_argument("path", nargs="?", default=None, help="磁带文件（默认 CASSETTE_PATH）")
+    args = ap.parse_args()
+    print(json.dumps(summary(args.path), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
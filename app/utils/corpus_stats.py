@@ -0,0 +1,211 @@
+"""
+语料文档频率（DF）统计：素材入库时增量累加，供关键词按 TF-IDF 排序。
+
+DATA_DIR/corpus/ 下两个文件：
+- df.bin：头部 <magic:4s, buckets:uint32, docs:uint64>，其后为 buckets 个 uint32 计数；
+  词项按 crc32 取模落桶，不保存词表本身，体积固定（默认 2^20 桶，4MB），哈希冲突只会高估 DF
+- seen.bin：已计入文档键（规范化 URL 等）的 8 字节哈希，按计入顺序排列，超过上限淘汰最早的
+
+查询一批词的 IDF 只需逐词查桶，与语料规模无关。Web 工作进程与监控进程可能同时写入：各进程只在内存中累积
+本进程新计入的文档（文档键哈希 + 所在桶），由后台线程每 _SAVE_INTERVAL 秒在 corpus/.lock 文件锁下重新读取磁盘上的
+计数、并入其他进程未计入的文档后原子替换两个文件，再以合并结果刷新本进程的视图；请求线程从不做磁盘写入。
+桶数（CORPUS_DF_BUCKETS）与文件不一致时重新开始统计。
+"""
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # 非 POSIX 平台没有 flock：退化为无锁合并，多进程同时落盘时可能丢失一次增量
+    fcntl = None
+
+from app.config import corpus_df_buckets, data_dir
+
+_HEADER = struct.Struct("<4sIQ")
+_MAGIC = b"WDF1"
+# 已计入文档键的上限；被淘汰的旧文档再次入库会被重复计数一次
+_MAX_SEEN = 200000
+# 后台合并落盘的间隔（秒）；进程退出时由 flush() 补写
+_SAVE_INTERVAL = 30.0
+
+_LOCK = threading.Lock()
+# 串行化本进程内的合并落盘（跨进程由文件锁保证）
+_FLUSH_LOCK = threading.Lock()
+_DF: Optional[array] = None
+_SEEN: "OrderedDict[int, None]" = OrderedDict()
+# 本进程已计入内存、尚未并入磁盘的文档：(文档键哈希, 所在桶)
+_PENDING: List[Tuple[int, Tuple[int, ...]]] = []
+_STATE = {"docs": 0, "saved_at": 0.0, "dir": None}
+_FLUSHER: Optional[threading.Thread] = None
+
+
+def _dir() -> str:
+    return os.path.join(data_dir(), "corpus")
+
+
+def _path(name: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or _dir(), name)
+
+
+def _read(directory: str, buckets: int) -> Tuple[array, int, "OrderedDict[int, None]"]:
+    """读取磁盘上的计数表与已计入文档键；文件缺失、损坏或桶数不一致时返回空表。"""
+    df, docs, seen = array("I", bytes(4 * buckets)), 0, OrderedDict()
+    try:
+        with open(_path("df.bin", directory), "rb") as f:
+            magic, n, stored_docs = _HEADER.unpack(f.read(_HEADER.size))
+            if magic == _MAGIC and n == buckets:
+                loaded = array("I")
+                loaded.fromfile(f, n)
+                df, docs = loaded, stored_docs
+        if docs:
+            hashes = array("Q")
+            with open(_path("seen.bin", directory), "rb") as f:
+                hashes.frombytes(f.read())
+            seen.update((h, None) for h in hashes)
+    except (OSError, EOFError, struct.error, ValueError):
+        pass
+    return df, docs, seen
+
+
+def _load():
+    """首次使用（或 DATA_DIR 变化）时载入计数表。调用方持有 _LOCK。"""
+    global _DF, _SEEN
+    if _STATE["dir"] == _dir() and _DF is not None:
+        return
+    _DF, docs, _SEEN = _read(_dir(), corpus_df_buckets())
+    _PENDING.clear()
+    _STATE.update(docs=docs, saved_at=time.time(), dir=_dir())
+
+
+def _merge(directory: str, buckets: int, pending: List[Tuple[int, Tuple[int, ...]]]) -> Tuple[array, int, "OrderedDict[int, None]"]:
+    """在文件锁下把 pending 并入磁盘上的最新计数（跳过其他进程已计入的文档）并原子替换，返回合并后的计数。"""
+    os.makedirs(directory, exist_ok=True)
+    with open(_path(".lock", directory), "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        df, docs, seen = _read(directory, buckets)
+        for h, bs in pending:
+            if h in seen:
+                continue
+            seen[h] = None
+            for b in bs:
+                df[b] += 1
+            docs += 1
+        while len(seen) > _MAX_SEEN:
+            seen.popitem(last=False)
+        for name, payload in (
+            ("df.bin", _HEADER.pack(_MAGIC, len(df), docs) + df.tobytes()),
+            ("seen.bin", array("Q", seen).tobytes()),
+        ):
+            tmp = f"{_path(name, directory)}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, _path(name, directory))
+    return df, docs, seen
+
+
+def _flush_loop():
+    while True:
+        time.sleep(_SAVE_INTERVAL)
+        flush()
+
+
+def _ensure_flusher():
+    global _FLUSHER
+    with _LOCK:
+        if _FLUSHER is not None and _FLUSHER.is_alive():
+            return
+        _FLUSHER = threading.Thread(target=_flush_loop, name="weiyu-corpus-flush", daemon=True)
+        _FLUSHER.start()
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) % len(_DF)
+
+
+def _doc_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def add_documents(docs: Iterable[Tuple[str, Iterable[str]]]) -> int:
+    """
+    计入一批文档：docs 为 (文档键, 词项) 序列，同一文档键只计一次，文档内重复词项只计一次。
+    返回新计入的文档数。只更新内存，落盘由后台线程完成。
+    """
+    added = 0
+    with _LOCK:
+        _load()
+        for key, terms in docs:
+            if not key:
+                continue
+            h = _doc_hash(key)
+            if h in _SEEN:
+                continue
+            _SEEN[h] = None
+            bs = tuple({_bucket(t) for t in terms})
+            for b in bs:
+                _DF[b] += 1
+            _PENDING.append((h, bs))
+            added += 1
+        if not added:
+            return 0
+        while len(_SEEN) > _MAX_SEEN:
+            _SEEN.popitem(last=False)
+        _STATE["docs"] += added
+    _ensure_flusher()
+    return added
+
+
+def idf_weights(terms: Iterable[str]) -> Dict[str, float]:
+    """平滑 IDF：log((N+1)/(df+1)) + 1；语料为空时所有词权重为 1（退化为按词频排序）。"""
+    with _LOCK:
+        _load()
+        n = _STATE["docs"]
+        return {t: math.log((n + 1) / (_DF[_bucket(t)] + 1)) + 1 for t in terms}
+
+
+def flush():
+    """把本进程未落盘的文档并入磁盘（后台线程定时调用；服务/监控进程退出时也会调用）。"""
+    global _DF, _SEEN
+    with _FLUSH_LOCK:
+        with _LOCK:
+            if _DF is None or not _PENDING:
+                return
+            directory, buckets = _STATE["dir"], len(_DF)
+            pending = list(_PENDING)
+            del _PENDING[:]
+        try:
+            df, docs, seen = _merge(directory, buckets, pending)
+        except OSError:
+            with _LOCK:
+                if _STATE["dir"] == directory:
+                    _PENDING[:0] = pending
+            return
+        with _LOCK:
+            if _STATE["dir"] != directory:
+                return
+            # 合并期间新计入的文档仍在 _PENDING 中，叠加到合并结果上作为本进程的新视图
+            for h, bs in _PENDING:
+                if h in seen:
+                    continue
+                seen[h] = None
+                for b in bs:
+                    df[b] += 1
+                docs += 1
+            _DF, _SEEN = df, seen
+            _STATE.update(docs=docs, saved_at=time.time())
+
+
+def stats() -> Dict:
+    with _LOCK:
+        _load()
+        return {"docs": _STATE["docs"], "buckets": len(_DF), "seen": len(_SEEN), "dirty": bool(_PENDING)}
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout, as_completed
+from typing import Iterable, Iterator, Optional
+
+
+class Deadline:
+    """
+    请求级时间预算：在编排器中创建，沿调用链传给各阶段。
+    - remaining()：剩余秒数
+    - timeout(default)：取阶段默认超时与剩余预算中的较小值，作为单次网络请求的超时
+    - share(fraction)：按总预算的比例切出子预算（不超过父预算的剩余时间）
+    """
+
+    def __init__(self, budget_seconds: float, _expires_at: Optional[float] = None):
+        self.budget = budget_seconds
+        self.expires_at = _expires_at if _expires_at is not None else time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout(self, default: float, floor: float = 0.05) -> float:
+        return max(floor, min(default, self.remaining()))
+
+    def share(self, fraction: float) -> "Deadline":
+        expires = min(self.expires_at, time.monotonic() + self.budget * fraction)
+        return Deadline(self.budget * fraction, _expires_at=expires)
+
+
+def budget_timeout(deadline: Optional[Deadline], default: float) -> float:
+    """无预算时返回默认超时，有预算时返回剩余预算内的超时。"""
+    return deadline.timeout(default) if deadline is not None else default
+
+
+def completed_within(futures: Iterable[Future], deadline: Optional[Deadline]) -> Iterator[Future]:
+    """
+    as_completed 的预算版本：超出预算后停止等待并取消尚未开始的任务。
+    调用方需自行以 shutdown(wait=False) 关闭线程池，避免在 with 退出时阻塞等待。
+    """
+    futures = list(futures)
+    try:
+        for fut in as_completed(futures, timeout=deadline.remaining() if deadline is not None else None):
+            yield fut
+    except FutureTimeout:
+        for fut in futures:
+            fut.cancel()
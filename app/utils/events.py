@@ -0,0 +1,72 @@
+import hashlib
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from app.utils.terms import normalize_text
+
+# 字符 2-gram 集合的 Dice 系数阈值：同一事件的不同表述通常共享过半二元组
+_DICE_THRESHOLD = 0.5
+# 至少共享的二元组数，避免极短标题（如“小鹏”）把所有含它的标题连成一簇
+_MIN_SHARED = 3
+
+
+def _bigrams(text: str) -> frozenset:
+    if len(text) < 2:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_titles(entries: Sequence[Tuple[str, int, str]], threshold: float = _DICE_THRESHOLD) -> List[Dict]:
+    """
+    对所有平台热榜标题做事件聚类：entries 为 [(platform, rank, title)]。
+    规范化标题的字符 2-gram 经倒排索引找出候选对，Dice ≥ threshold 的标题并查集合并，
+    从而把同一事件的不同表述（#话题#、加减修饰词、语序微调）归为一簇。
+    返回 [{id, title, platforms, ranks: {platform: best_rank}, titles: [{platform, rank, title}]}]，
+    按覆盖平台数降序、最佳排名升序。
+    """
+    norms = [normalize_text(t) for _, _, t in entries]
+    grams = [_bigrams(n) for n in norms]
+    parent = list(range(len(entries)))
+
+    index: Dict[str, List[int]] = defaultdict(list)
+    for i, g in enumerate(grams):
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in g:
+            for j in index[gram]:
+                shared[j] += 1
+            index[gram].append(i)
+        for j, n in shared.items():
+            if n >= _MIN_SHARED and 2 * n / (len(g) + len(grams[j])) >= threshold:
+                parent[_find(parent, i)] = _find(parent, j)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(entries)):
+        if norms[i]:
+            groups[_find(parent, i)].append(i)
+
+    clusters: List[Dict] = []
+    for members in groups.values():
+        ranks: Dict[str, int] = {}
+        titles = []
+        for i in members:
+            plat, rank, title = entries[i]
+            ranks[plat] = min(rank, ranks.get(plat, rank))
+            titles.append({"platform": plat, "rank": rank, "title": title})
+        titles.sort(key=lambda x: x["rank"])
+        head = titles[0]["title"]
+        clusters.append({
+            "id": hashlib.sha1(normalize_text(head).encode("utf-8")).hexdigest()[:12],
+            "title": head,
+            "platforms": sorted(ranks),
+            "ranks": ranks,
+            "titles": titles,
+        })
+    clusters.sort(key=lambda c: (-len(c["platforms"]), min(c["ranks"].values())))
+    return clusters
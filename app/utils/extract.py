@@ -0,0 +1,238 @@
+"""
+本地正文抽取：增量解析 HTML（html.parser），按 readability 式文本密度打分选出正文容器。
+
+- 段落：块级元素结束时把其中累积的文本记为一段，记录链接文字占比与祖先节点链
+- 打分：有效段落（足够长、链接占比低）给父节点加 1 + 逗号数 + 长度分，祖父节点加一半；
+  class/id 命中正/负向模式的节点整体加/减分，script/style/nav/footer 等直接跳过
+- 正文：得分最高节点下的全部有效段落
+- 域名规则：抽取成功后记下正文容器的签名（tag#id / tag.class），同域名后续页面命中该容器
+  关闭时即可结束解析，调用方据此提前停止下载
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+# 不含正文的元素：其内部文本整体丢弃
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "form", "nav", "header", "footer", "aside", "button", "select", "textarea"}
+# 结束时切分段落的块级元素
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "td", "pre", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6", "dd", "figcaption"}
+_VOID_TAGS = {"br", "img", "hr", "meta", "link", "input", "source", "wbr", "area", "base", "col", "embed", "param", "track"}
+_NEGATIVE = re.compile(r"comment|footer|sidebar|side-bar|nav|menu|related|recommend|share|social|advert|banner|sponsor|popup|breadcrumb|copyright|login|tag-list|hot-list", re.I)
+# 命中负向模式但同时像页面骨架（wrapper/container 等）的容器不跳过，只降权
+_LAYOUT = re.compile(r"wrap|container|layout|page|body", re.I)
+_POSITIVE = re.compile(r"article|content|post|entry|main|body|text|detail|story|news", re.I)
+_COMMAS = re.compile(r"[，,。；;！!？?]")
+
+# 计入打分的最短段落长度与最大链接文字占比
+_MIN_PARAGRAPH = 20
+_MAX_LINK_DENSITY = 0.5
+# 少于该长度视为抽取失败（由调用方回退到 Jina Reader）
+MIN_TEXT_CHARS = 200
+
+
+class _Node:
+    __slots__ = ("id", "tag", "signature", "parent", "score", "class_weight", "chars", "all_chars", "link_chars")
+
+    def __init__(self, nid: int, tag: str, signature: str, parent: Optional["_Node"], class_weight: float):
+        self.id = nid
+        self.tag = tag
+        self.signature = signature
+        self.parent = parent
+        self.score = 0.0
+        self.class_weight = class_weight
+        # 子树内有效段落字数、全部段落字数与其中的链接文字数
+        self.chars = 0
+        self.all_chars = 0
+        self.link_chars = 0.0
+
+
+def _signature(tag: str, attrs: Dict[str, str]) -> Tuple[str, float, bool]:
+    ident = (attrs.get("id") or "").strip()
+    classes = (attrs.get("class") or "").split()
+    sig = f"{tag}#{ident}" if ident else (f"{tag}.{classes[0]}" if classes else tag)
+    marker = f"{ident} {' '.join(classes)}"
+    weight = 0.0
+    skip = False
+    if marker.strip():
+        negative = bool(_NEGATIVE.search(marker))
+        positive = bool(_POSITIVE.search(marker))
+        weight = 25.0 * (positive - negative)
+        skip = negative and not positive and not _LAYOUT.search(marker)
+    return sig, weight, skip
+
+
+class ContentExtractor(HTMLParser):
+    """
+    增量正文抽取器：反复 feed(text) 后调用 result()。
+    rule 为该域名已知的正文容器签名；命中的容器关闭且已有足够文本时 done 置 True，调用方可停止下载。
+    """
+
+    def __init__(self, rule: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.rule = rule
+        self.done = False
+        self.title = ""
+        self._stack: List[_Node] = []
+        self._skip_depth = 0
+        self._in_title = False
+        self._in_link = 0
+        self._buf: List[str] = []
+        self._link_chars = 0
+        self._paragraphs: List[Tuple[str, bool, Tuple[int, ...]]] = []
+        self._nodes: Dict[int, _Node] = {}
+        self._rule_nodes: set = set()
+        self._next_id = 0
+
+    # ---- 解析回调 ----
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self._buf.append("\n")
+            return
+        if self._skip_depth or tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag == "a":
+            self._in_link += 1
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        attr_map = {k: v or "" for k, v in attrs}
+        sig, weight, skip = _signature(tag, attr_map)
+        if skip and tag in _BLOCK_TAGS and tag not in ("p", "li", "td"):
+            # 评论区/侧栏等容器整体跳过
+            self._skip_depth += 1
+            return
+        node = _Node(self._next_id, tag, sig, self._stack[-1] if self._stack else None, weight)
+        self._next_id += 1
+        self._nodes[node.id] = node
+        if self.rule and sig == self.rule:
+            self._rule_nodes.add(node.id)
+        self._stack.append(node)
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        if self._skip_depth:
+            self._skip_depth -= 1
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag == "a" and self._in_link:
+            self._in_link -= 1
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        # 容错：关闭到最近的同名节点，忽略未闭合的内层元素
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].tag == tag:
+                closed = self._stack[i]
+                del self._stack[i:]
+                if closed.id in self._rule_nodes and closed.chars >= MIN_TEXT_CHARS:
+                    self.done = True
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        if not data.strip():
+            if self._buf and not self._buf[-1].endswith(" "):
+                self._buf.append(" ")
+            return
+        self._buf.append(data)
+        if self._in_link:
+            self._link_chars += len(data.strip())
+
+    # ---- 段落与打分 ----
+
+    def _flush(self):
+        text = " ".join("".join(self._buf).split())
+        link_chars = self._link_chars
+        self._buf = []
+        self._link_chars = 0
+        if not text:
+            return
+        density = min(1.0, link_chars / max(len(text), 1))
+        usable = density <= _MAX_LINK_DENSITY
+        self._paragraphs.append((text, usable, tuple(n.id for n in self._stack)))
+        for n in self._stack:
+            n.all_chars += len(text)
+            n.link_chars += len(text) * density
+            if usable:
+                n.chars += len(text)
+        if len(text) < _MIN_PARAGRAPH or not usable or not self._stack:
+            return
+        gain = 1 + len(_COMMAS.findall(text)) + min(len(text) // 100, 3)
+        parent = self._stack[-1]
+        parent.score += gain
+        if parent.parent is not None:
+            parent.parent.score += gain / 2
+
+    def _best(self) -> Optional[_Node]:
+        best, best_score = None, 0.0
+        for node in self._nodes.values():
+            if node.score <= 0:
+                continue
+            # 链接密度高的节点（导航、列表页）降权
+            density = node.link_chars / max(node.all_chars, 1)
+            score = (node.score + node.class_weight) * (1 - density)
+            if score > best_score:
+                best, best_score = node, score
+        return best
+
+    def result(self) -> Dict:
+        """{text, title, rule}：rule 为正文容器签名（抽取失败时 text 为空）。"""
+        self._flush()
+        node = None
+        if self.rule and self._rule_nodes:
+            # 已知规则命中：取文本最多的那个匹配节点
+            candidate = max((self._nodes[i] for i in self._rule_nodes), key=lambda n: n.chars)
+            if candidate.chars >= MIN_TEXT_CHARS:
+                node = candidate
+        if node is None:
+            node = self._best()
+        if node is None:
+            return {"text": "", "title": self.title.strip(), "rule": None}
+        parts = [t for t, usable, anc in self._paragraphs if usable and node.id in anc]
+        text = "\n".join(parts)
+        return {"text": text if len(text) >= MIN_TEXT_CHARS else "", "title": self.title.strip(), "rule": node.signature}
+
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+
+def sniff_charset(content_type: str, head: bytes) -> str:
+    """按 Content-Type、<meta charset> 顺序确定编码，默认 utf-8；GB2312/GBK 统一按 GB18030 解码。"""
+    m = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+    charset = m.group(1) if m else None
+    if not charset:
+        mm = _META_CHARSET.search(head)
+        charset = mm.group(1).decode("ascii", "ignore") if mm else "utf-8"
+    charset = charset.lower()
+    if charset in ("gb2312", "gbk"):
+        charset = "gb18030"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return charset
+
+
+def extract_html(html: bytes, content_type: str = "", rule: Optional[str] = None, chunk_size: int = 16384) -> Dict:
+    """对完整 HTML 字节做抽取（按块喂给增量解析器，与流式下载走同一路径），供离线 fixture 使用。"""
+    decoder = codecs.getincrementaldecoder(sniff_charset(content_type, html[:4096]))(errors="replace")
+    parser = ContentExtractor(rule=rule)
+    for i in range(0, len(html), chunk_size):
+        parser.feed(decoder.decode(html[i:i + chunk_size]))
+        if parser.done:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+    return parser.result()
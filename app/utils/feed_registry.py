@@ -0,0 +1,121 @@
+"""
+Feed 注册表：从配置文件（FEED_REGISTRY_PATH，默认 config/feeds.json，修改后自动热加载）读取全部 RSS/热榜源。
+
+文件结构：
+- defaults：{interval, priority}，feed 未写时使用
+- feeds：[{url, kind: rss|trend, platform（热榜平台名，kind=trend 时必填）, interval（秒）, priority（越大越先调度）, host}]，
+  host 缺省取 url 的主机名，用于按主机限流与镜像；同一 url 可同时登记为 rss 与 trend（只拉取一次）
+- hosts：{host: {concurrency, min_interval}}，按主机的并发上限与相邻两次请求的最小间隔（礼貌限速），缺省用 FEED_HOST_* 配置
+- mirrors：{host: [镜像 host, ...]}，如 RSSHub 公共实例；主实例失败或熔断时按顺序改用镜像（同路径）
+
+文件缺失或无效时注册表为空，调用方回退到内置的 DEFAULT_FEEDS / TREND_FEEDS。
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from app.config import feed_host_concurrency, feed_host_min_interval_seconds, feed_registry_path
+
+# 检查配置文件 mtime 的间隔（秒）
+_RELOAD_CHECK_S = 2.0
+_DEFAULT_INTERVAL = 300
+_DEFAULT_PRIORITY = 5
+
+_LOCK = threading.Lock()
+_STATE = {"registry": None, "mtime": None, "path": None, "checked": 0.0, "version": 0}
+
+
+def _empty() -> Dict:
+    return {"feeds": [], "hosts": {}, "mirrors": {}}
+
+
+def _load(path: str) -> Dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return _empty()
+    defaults = data.get("defaults") or {}
+    interval = int(defaults.get("interval") or _DEFAULT_INTERVAL)
+    priority = int(defaults.get("priority") or _DEFAULT_PRIORITY)
+    reg = _empty()
+    seen = set()
+    for raw in data.get("feeds") or []:
+        url = (raw.get("url") or "").strip() if isinstance(raw, dict) else ""
+        kind = raw.get("kind", "rss") if url else ""
+        if kind not in ("rss", "trend") or (kind, url) in seen or (kind == "trend" and not raw.get("platform")):
+            continue
+        seen.add((kind, url))
+        feed = {
+            "url": url,
+            "kind": kind,
+            "platform": raw.get("platform") or "",
+            "interval": max(30, int(raw.get("interval") or interval)),
+            "priority": int(raw.get("priority", priority)),
+            "host": (raw.get("host") or urlsplit(url).netloc).lower(),
+        }
+        reg["feeds"].append(feed)
+    for host, limits in (data.get("hosts") or {}).items():
+        reg["hosts"][host.lower()] = {
+            "concurrency": max(1, int(limits.get("concurrency") or feed_host_concurrency())),
+            "min_interval": max(0.0, float(limits.get("min_interval", feed_host_min_interval_seconds()))),
+        }
+    for host, mirrors in (data.get("mirrors") or {}).items():
+        reg["mirrors"][host.lower()] = [m.strip().lower() for m in mirrors if m and m.strip()]
+    return reg
+
+
+def _registry() -> Dict:
+    now = time.monotonic()
+    st = _STATE
+    if st["registry"] is not None and now - st["checked"] < _RELOAD_CHECK_S:
+        return st["registry"]
+    with _LOCK:
+        path = feed_registry_path()
+        try:
+            mtime: Optional[float] = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        st["checked"] = now
+        if st["registry"] is None or mtime != st["mtime"] or path != st["path"]:
+            st["registry"] = _load(path)
+            st["mtime"], st["path"] = mtime, path
+            st["version"] += 1
+        return st["registry"]
+
+
+def version() -> int:
+    """注册表版本号，配置文件每次重新载入后递增（调度器据此同步 feed 集合）。"""
+    _registry()
+    return _STATE["version"]
+
+
+def feeds(kind: Optional[str] = None) -> List[Dict]:
+    return [f for f in _registry()["feeds"] if kind is None or f["kind"] == kind]
+
+
+def rss_urls() -> List[str]:
+    """按优先级从高到低排列的 RSS 源。"""
+    return [f["url"] for f in sorted(feeds("rss"), key=lambda f: -f["priority"])]
+
+
+def trend_platforms() -> Dict[str, str]:
+    """{热榜平台: url}，按注册表顺序。"""
+    return {f["platform"]: f["url"] for f in feeds("trend")}
+
+
+def host_limits(host: str) -> Tuple[int, float]:
+    """(并发上限, 最小请求间隔秒)。"""
+    limits = _registry()["hosts"].get(host.lower())
+    if limits is None:
+        return feed_host_concurrency(), feed_host_min_interval_seconds()
+    return limits["concurrency"], limits["min_interval"]
+
+
+def mirror_urls(url: str) -> List[str]:
+    """url 本身及其在各镜像上的同路径地址（按配置顺序）。"""
+    parts = urlsplit(url)
+    return [url] + [urlunsplit(parts._replace(netloc=m)) for m in _registry()["mirrors"].get(parts.netloc.lower(), [])]
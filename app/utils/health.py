@@ -0,0 +1,240 @@
+"""
+上游健康度登记表：按 feed（完整 URL）与 host 两个粒度记录
+- 最近请求的耗时分位数（p50/p95）与错误率
+- 熔断器：连续失败达到阈值后打开（open；host 粒度只统计超时/连接失败，且要求窗口错误率过半，
+  避免个别失效路由拖垮同一 host 上的其它 feed），请求路径直接跳过，不占超时与线程池槽位；
+  冷却结束后由后台线程做半开（half-open）探测，成功则关闭，失败则冷却时间翻倍
+- 自适应超时：样本足够时取 p95 的若干倍，并夹在 [下限, 调用方默认值] 之间
+正文抽取会访问大量一次性的文章源站，登记表最多保留 _MAX_ENTRIES 条，超出时淘汰最久未请求的非熔断条目。
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import breaker_cooldown_seconds, breaker_failure_threshold
+from app.utils.instrument import gauge_remove, gauge_set, inc
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_WINDOW = 50
+_MIN_SAMPLES = 5
+_HOST_OPEN_ERROR_RATE = 0.5
+_P95_FACTOR = 2.0
+# 低于该值的超时（多为 deadline 压缩所致）不计为上游失败，自适应超时也不低于此值
+_MIN_JUDGED_TIMEOUT_S = 1.0
+_MAX_COOLDOWN_S = 600.0
+_PROBE_TIMEOUT_S = 5.0
+_PROBE_TICK_S = 1.0
+_MAX_ENTRIES = 2000
+
+
+class CircuitOpenError(RuntimeError):
+    """目标上游处于熔断状态，请求未发出。"""
+
+
+class _Health:
+    def __init__(self, kind: str, key: str):
+        self.kind = kind
+        self.key = key
+        self.latencies: Deque[float] = deque(maxlen=_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.cooldown = 0.0
+        self.probe_at = 0.0
+        self.last_error = ""
+        self.last_url = key
+        # 曾经来自不可信 URL（public_only 抓取）：半开探测同样只访问公网地址
+        self.public_only = False
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))]
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "kind": self.kind,
+            "key": self.key,
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.outcomes.count(False) / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "consecutive_failures": self.consecutive_failures,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "next_probe_in_s": round(max(0.0, self.probe_at - time.monotonic()), 1) if self.state != CLOSED else None,
+            "last_error": self.last_error,
+        }
+
+
+_LOCK = threading.Lock()
+_REGISTRY: "OrderedDict[Tuple[str, str], _Health]" = OrderedDict()
+_PROBER: Optional[threading.Thread] = None
+
+
+def _get(kind: str, key: str) -> _Health:
+    """取（或新建）登记项并标记为最近使用。调用方持有 _LOCK。"""
+    h = _REGISTRY.get((kind, key))
+    if h is None:
+        h = _REGISTRY[(kind, key)] = _Health(kind, key)
+        _evict()
+    else:
+        _REGISTRY.move_to_end((kind, key))
+    return h
+
+
+def _evict():
+    """超出上限时从最久未使用的一端淘汰已关闭的条目；熔断中的条目等待探测，不淘汰。调用方持有 _LOCK。"""
+    excess = len(_REGISTRY) - _MAX_ENTRIES
+    if excess <= 0:
+        return
+    victims = []
+    for k, h in _REGISTRY.items():
+        if h.state == CLOSED:
+            victims.append(k)
+            if len(victims) >= excess:
+                break
+    for k in victims:
+        h = _REGISTRY.pop(k)
+        gauge_remove("weiyu_breaker_state", kind=h.kind, target=h.key)
+
+
+def _set_state(h: _Health, state: str):
+    h.state = state
+    gauge_set("weiyu_breaker_state", _STATE_VALUE[state], kind=h.kind, target=h.key)
+
+
+def _keys(host: str, feed: Optional[str]) -> List[Tuple[str, str]]:
+    keys = [("host", host)]
+    if feed:
+        keys.append(("feed", feed))
+    return keys
+
+
+def allow(host: str, feed: Optional[str] = None) -> bool:
+    """请求路径调用：host 或 feed 的熔断非关闭状态时返回 False（半开状态只允许后台探测）。"""
+    with _LOCK:
+        for kind, key in _keys(host, feed):
+            h = _REGISTRY.get((kind, key))
+            if h is not None and h.state != CLOSED:
+                inc("weiyu_breaker_short_circuits_total", kind=kind, target=key)
+                return False
+    return True
+
+
+def record(host: str, feed: Optional[str], url: str, seconds: float, outcome: str, timeout: float,
+           error: str = "", responded: bool = False, public_only: bool = False):
+    """
+    记录一次上游调用结果。outcome: ok / error / timeout；
+    responded=True 表示上游返回了 HTTP 响应（非 2xx），此时 host 视为可达；
+    public_only=True 表示 url 不可信，之后对该上游的探测也只允许公网地址。
+    """
+    if outcome == "timeout" and timeout < _MIN_JUDGED_TIMEOUT_S:
+        return
+    opened = False
+    threshold = breaker_failure_threshold()
+    with _LOCK:
+        for kind, key in _keys(host, feed):
+            ok = outcome == "ok" or (kind == "host" and responded)
+            h = _get(kind, key)
+            h.requests += 1
+            h.outcomes.append(ok)
+            h.last_url = url
+            h.public_only = h.public_only or public_only
+            if outcome == "ok":
+                h.latencies.append(seconds)
+            if ok:
+                h.consecutive_failures = 0
+                continue
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.last_error = error or outcome
+            if kind == "host" and h.outcomes.count(False) < len(h.outcomes) * _HOST_OPEN_ERROR_RATE:
+                continue
+            if h.state == CLOSED and h.consecutive_failures >= threshold:
+                h.cooldown = breaker_cooldown_seconds()
+                h.probe_at = time.monotonic() + h.cooldown
+                _set_state(h, OPEN)
+                opened = True
+    if opened:
+        _ensure_prober()
+
+
+def adaptive_timeout(host: str, feed: Optional[str], default: float) -> float:
+    """按已观测 p95（优先 feed，其次 host）给出超时；样本不足时返回 default。"""
+    with _LOCK:
+        for kind, key in reversed(_keys(host, feed)):
+            h = _REGISTRY.get((kind, key))
+            if h is None or len(h.latencies) < _MIN_SAMPLES:
+                continue
+            p95 = h.percentile(95) or 0.0
+            return min(default, max(_MIN_JUDGED_TIMEOUT_S, p95 * _P95_FACTOR))
+    return default
+
+
+def snapshot() -> Dict[str, List[Dict]]:
+    with _LOCK:
+        items = [h.snapshot() for h in _REGISTRY.values()]
+    return {
+        "feeds": sorted((x for x in items if x["kind"] == "feed"), key=lambda x: x["key"]),
+        "hosts": sorted((x for x in items if x["kind"] == "host"), key=lambda x: x["key"]),
+    }
+
+
+def reset():
+    with _LOCK:
+        for h in _REGISTRY.values():
+            gauge_set("weiyu_breaker_state", 0, kind=h.kind, target=h.key)
+        _REGISTRY.clear()
+
+
+def _probe(h: _Health):
+    # 延迟导入：http 模块依赖本模块
+    from app.utils import http
+
+    # feed 需要 2xx；host 只要有 HTTP 响应即视为恢复
+    limit = 400 if h.kind == "feed" else 500
+    try:
+        status = http.probe(h.last_url, timeout=_PROBE_TIMEOUT_S, public_only=h.public_only)
+        ok = status < limit
+        err = f"HTTP {status}"
+    except Exception as e:
+        ok = False
+        err = type(e).__name__
+    with _LOCK:
+        if ok:
+            h.consecutive_failures = 0
+            _set_state(h, CLOSED)
+        else:
+            h.last_error = f"probe: {err}"
+            h.cooldown = min(_MAX_COOLDOWN_S, h.cooldown * 2)
+            h.probe_at = time.monotonic() + h.cooldown
+            _set_state(h, OPEN)
+
+
+def _probe_loop():
+    while True:
+        time.sleep(_PROBE_TICK_S)
+        now = time.monotonic()
+        with _LOCK:
+            due = [h for h in _REGISTRY.values() if h.state == OPEN and h.probe_at <= now]
+            for h in due:
+                _set_state(h, HALF_OPEN)
+        for h in due:
+            _probe(h)
+
+
+def _ensure_prober():
+    global _PROBER
+    with _LOCK:
+        if _PROBER is not None and _PROBER.is_alive():
+            return
+        _PROBER = threading.Thread(target=_probe_loop, name="weiyu-health-probe", daemon=True)
+        _PROBER.start()
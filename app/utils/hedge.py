@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.deadline import Deadline
+from app.utils.instrument import InstrumentedThreadPool, inc
+
+Candidate = Tuple[str, Callable[[], List[Dict]]]
+
+
+def _safe_result(fut: Future) -> List[Dict]:
+    try:
+        return fut.result() or []
+    except Exception:
+        return []
+
+
+def hedged_race(
+    candidates: Sequence[Candidate],
+    hedge_delay: float,
+    accept: Callable[[List[Dict]], bool],
+    deadline: Optional[Deadline] = None,
+    on_late_result: Optional[Callable[[str, List[Dict]], None]] = None,
+    fallback_only: Collection[str] = (),
+) -> Tuple[str, List[Dict]]:
+    """
+    对冲式数据源竞速：candidates 按优先级排列。
+    - 先启动第 1 个；若 hedge_delay 内没有合格结果，启动下一个（已在运行的不取消，并发竞速）
+    - 某个源返回但不合格时，立即启动下一个
+    - fallback_only 中的源（如按次计费的 API）不参与计时对冲：只在已启动的源全部返回且都不合格（空结果或失败）后才启动
+    - 第一个满足 accept 的结果胜出；尚未开始的候选被取消，仍在运行的落败者完成后交给 on_late_result（用于缓存预热）
+    - 无合格结果时，按优先级返回第一个非空结果
+    返回 (胜出源名称, items)。
+    """
+    if not candidates:
+        return "", []
+    executor = InstrumentedThreadPool("search_hedge", max_workers=len(candidates))
+    futures: Dict[Future, int] = {}
+    results: Dict[int, List[Dict]] = {}
+    next_idx = 0
+    winner: Optional[int] = None
+
+    def _launch():
+        nonlocal next_idx
+        name, fn = candidates[next_idx]
+        futures[executor.submit(fn)] = next_idx
+        if next_idx > 0:
+            inc("weiyu_search_hedges_total", provider=name)
+        next_idx += 1
+
+    try:
+        _launch()
+        next_launch_at = time.monotonic() + hedge_delay
+        while winner is None:
+            # 以“结果尚未收取”为准：两轮之间已完成的源也要在本轮收取
+            pending = [f for f in futures if futures[f] not in results]
+            if not pending:
+                if next_idx >= len(candidates):
+                    break
+                _launch()
+                next_launch_at = time.monotonic() + hedge_delay
+                continue
+            timed = next_idx < len(candidates) and candidates[next_idx][0] not in fallback_only
+            timeout = max(0.0, next_launch_at - time.monotonic()) if timed else None
+            if deadline is not None:
+                timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            rejected = False
+            for f in done:
+                idx = futures[f]
+                results[idx] = _safe_result(f)
+                if winner is None and accept(results[idx]):
+                    winner = idx
+                elif winner is None:
+                    rejected = True
+            if winner is not None or (deadline is not None and deadline.expired()):
+                break
+            # 仅兜底的源要等已启动的源全部落空
+            if not timed and any(not f.done() for f in futures):
+                continue
+            # 超过对冲延迟，或有源返回了不合格结果：启动下一个兜底源
+            if next_idx < len(candidates) and (rejected or time.monotonic() >= next_launch_at):
+                _launch()
+                next_launch_at = time.monotonic() + hedge_delay
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for f, idx in futures.items():
+        if idx in results or idx == winner:
+            continue
+        if on_late_result is not None and not f.cancelled():
+            name = candidates[idx][0]
+            f.add_done_callback(lambda fut, name=name: (not fut.cancelled()) and on_late_result(name, _safe_result(fut)))
+
+    if winner is not None:
+        inc("weiyu_search_wins_total", provider=candidates[winner][0])
+        return candidates[winner][0], results[winner]
+    for idx in sorted(results):
+        if results[idx]:
+            return candidates[idx][0], results[idx]
+    return "", []
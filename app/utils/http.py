@@ -0,0 +1,363 @@
+import ipaddress
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, Iterable, Iterator, Optional
+from urllib.parse import urlsplit
+import httpx
+
+from app.config import http_max_connections, upstream_override
+from app.utils import cassette, feed_registry, health
+from app.utils.instrument import record_upstream
+
+# 所有 provider 的上游 HTTP 调用统一经过此模块，便于集中做路由改写、耗时与错误统计、
+# 健康度/熔断与自适应超时等横切处理；录制/回放（CASSETTE_MODE）也在这里接入
+
+# public_only 抓取时手动跟随的最大重定向次数
+_MAX_REDIRECTS = 5
+
+_CLIENT_LOCK = threading.Lock()
+_CLIENT: Optional[httpx.Client] = None
+
+
+def client() -> httpx.Client:
+    """
+    进程内共享的同步客户端（线程安全）：按主机复用 TCP/TLS 连接，SSL 上下文只创建一次
+    （每次新建 Client 约 30ms）。超时按请求传入；不保存响应 Cookie，各请求之间互不影响。
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                n = http_max_connections()
+                _CLIENT = httpx.Client(
+                    limits=httpx.Limits(max_connections=n, max_keepalive_connections=max(1, n // 2)),
+                    cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+                )
+    return _CLIENT
+
+
+def close():
+    """关闭共享客户端（服务退出时调用）；之后再次使用会重新创建。"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        shared, _CLIENT = _CLIENT, None
+    if shared is not None:
+        shared.close()
+
+
+def _route(url: str) -> str:
+    base = upstream_override()
+    if not base:
+        return url
+    parts = urlsplit(url)
+    routed = f"{base}/{parts.netloc}{parts.path}"
+    if parts.query:
+        routed += f"?{parts.query}"
+    return routed
+
+
+class HostBusyError(httpx.TimeoutException):
+    """在超时预算内没有等到 feed 主机的并发名额或礼貌间隔（请求未发出）。"""
+
+
+class _HostGate:
+    __slots__ = ("concurrency", "min_interval", "inflight", "next_slot", "requests")
+
+    def __init__(self, concurrency: int, min_interval: float):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.inflight = 0
+        self.next_slot = 0.0
+        self.requests = 0
+
+
+# feed 主机的并发与礼貌限速在进程内只有一份：请求路径、话题监控（get(feed=True)）与 feed 调度器共用，
+# 上限取自注册表 hosts（未配置的主机用 FEED_HOST_CONCURRENCY / FEED_HOST_MIN_INTERVAL_S）
+_GATES: Dict[str, _HostGate] = {}
+_GATES_COND = threading.Condition()
+
+
+def _gate(host: str) -> _HostGate:
+    """调用方持有 _GATES_COND；每次取用时同步注册表中的最新上限（注册表热加载）。"""
+    concurrency, min_interval = feed_registry.host_limits(host)
+    gate = _GATES.get(host)
+    if gate is None:
+        gate = _GATES[host] = _HostGate(concurrency, min_interval)
+    else:
+        gate.concurrency, gate.min_interval = concurrency, min_interval
+    return gate
+
+
+def host_try_acquire(host: str) -> bool:
+    """不等待地占用主机的一个并发名额（供调度器使用）；已满载返回 False。成功后须调用 host_release()。"""
+    with _GATES_COND:
+        gate = _gate(host)
+        if gate.inflight >= gate.concurrency:
+            return False
+        gate.inflight += 1
+        return True
+
+
+def host_reserve(host: str) -> float:
+    """预订主机的下一个请求时刻，返回需等待的秒数（相邻两次请求至少间隔 min_interval）。"""
+    with _GATES_COND:
+        gate = _gate(host)
+        now = time.time()
+        start = max(now, gate.next_slot)
+        gate.next_slot = start + gate.min_interval
+        gate.requests += 1
+        return start - now
+
+
+def host_release(host: str):
+    with _GATES_COND:
+        gate = _GATES.get(host)
+        if gate is not None and gate.inflight > 0:
+            gate.inflight -= 1
+        _GATES_COND.notify_all()
+
+
+def host_stats(hosts: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    with _GATES_COND:
+        out = {}
+        for host in hosts:
+            gate = _gate(host)
+            out[host] = {"concurrency": gate.concurrency, "min_interval": gate.min_interval, "inflight": gate.inflight,
+                         "requests": gate.requests}
+        return out
+
+
+@contextmanager
+def _host_slot(host: str, timeout: float) -> Iterator[float]:
+    """
+    阻塞等待主机的并发名额与礼貌间隔，产出剩余的超时预算；等待本身计入 timeout，
+    预算耗尽时抛出 HostBusyError（不计入健康度，调用方照常改用镜像或放弃）。
+    """
+    deadline = time.time() + timeout
+    with _GATES_COND:
+        while True:
+            gate = _gate(host)
+            if gate.inflight < gate.concurrency:
+                gate.inflight += 1
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise HostBusyError(f"feed host busy: {host}")
+            _GATES_COND.wait(remaining)
+    try:
+        delay = host_reserve(host)
+        if time.time() + delay >= deadline:
+            raise HostBusyError(f"feed host rate limited: {host}")
+        if delay > 0:
+            time.sleep(delay)
+        yield deadline - time.time()
+    finally:
+        host_release(host)
+
+
+@contextmanager
+def _tracked(url: str, timeout: float, feed: bool = False, public_only: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    单次上游调用的熔断检查、自适应超时与耗时/健康度记录；调用方在成功时置 call["outcome"] = "ok"。
+    被 public_only 校验拒绝（BlockedAddressError）的调用没有发出，不计入健康度，也就不会触发熔断后的探测。
+    """
+    host = urlsplit(url).netloc
+    feed_key = url if feed else None
+    if not health.allow(host, feed_key):
+        raise health.CircuitOpenError(url)
+    call = {"timeout": health.adaptive_timeout(host, feed_key, timeout), "outcome": "error", "responded": False}
+    error = ""
+    t0 = time.perf_counter()
+    try:
+        yield call
+    except httpx.TimeoutException:
+        call["outcome"] = "timeout"
+        raise
+    except BlockedAddressError:
+        call["outcome"] = "blocked"
+        raise
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        record_upstream(host, dt, call["outcome"])
+        if call["outcome"] != "blocked":
+            health.record(host, feed_key, url, dt, call["outcome"], call["timeout"], error=error, responded=call["responded"],
+                          public_only=public_only)
+
+
+def _exchange(method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+    """发出一次请求并返回完整响应；录制模式下写入磁带，回放模式下只从磁带读取。"""
+    if not (cassette.recording() or cassette.replaying()):
+        return client().request(method, _route(url), timeout=timeout, **kwargs)
+    key = cassette.request_key(method, url, kwargs.get("params"), kwargs.get("json"))
+    if cassette.replaying():
+        return cassette.replay(key, method, url)
+    t0 = time.perf_counter()
+    try:
+        resp = client().request(method, _route(url), timeout=timeout, **kwargs)
+    except httpx.TransportError as e:
+        cassette.record(key, time.perf_counter() - t0, error=e)
+        raise
+    cassette.record(key, time.perf_counter() - t0, resp)
+    return resp
+
+
+def _send(method: str, url: str, timeout: float, feed: bool = False, **kwargs) -> httpx.Response:
+    with _tracked(url, timeout, feed) as call:
+        resp = _exchange(method, url, call["timeout"], **kwargs)
+        call["responded"] = True
+        resp.raise_for_status()
+        call["outcome"] = "ok"
+        return resp
+
+
+def get(url: str, timeout: float, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+        feed: bool = False) -> httpx.Response:
+    """
+    GET 并在非 2xx 时抛出 httpx.HTTPStatusError；目标处于熔断状态时抛出 health.CircuitOpenError（不发请求）。
+    feed=True 时额外按完整 URL 统计健康度（用于固定的 RSS/热榜源），并遵守该主机的并发上限与礼貌间隔
+    （与 feed 调度器共用计数；回放磁带时不发请求，不限速）。
+    """
+    if not feed or cassette.replaying():
+        return _send("GET", url, timeout, feed=feed, params=params, headers=headers)
+    with _host_slot(urlsplit(url).netloc.lower(), timeout) as remaining:
+        return _send("GET", url, remaining, feed=feed, params=params, headers=headers)
+
+
+def post(url: str, timeout: float, json: Any = None, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """POST JSON 并在非 2xx 时抛出 httpx.HTTPStatusError。"""
+    return _send("POST", url, timeout, headers=headers, json=json)
+
+
+async def aget(client: httpx.AsyncClient, url: str, timeout: float, headers: Optional[Dict[str, str]] = None,
+               feed: bool = False) -> httpx.Response:
+    """
+    异步 GET（由调用方持有并复用 AsyncClient 的连接池），熔断、自适应超时、统计与录制/回放同 get()。
+    不做主机限速：feed 调度器在事件循环里自行用 host_try_acquire()/host_reserve() 占用同一份主机名额。
+    """
+    with _tracked(url, timeout, feed) as call:
+        key = cassette.request_key("GET", url) if cassette.recording() or cassette.replaying() else ""
+        if cassette.replaying():
+            resp = await cassette.areplay(key, "GET", url)
+        else:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.get(_route(url), headers=headers, timeout=call["timeout"])
+            except httpx.TransportError as e:
+                if key:
+                    cassette.record(key, time.perf_counter() - t0, error=e)
+                raise
+            if key:
+                cassette.record(key, time.perf_counter() - t0, resp)
+        call["responded"] = True
+        resp.raise_for_status()
+        call["outcome"] = "ok"
+        return resp
+
+
+class BlockedAddressError(httpx.RequestError):
+    """目标解析到回环、内网、链路本地或保留地址（public_only 抓取时拒绝）。"""
+
+
+def _check_public(url: str):
+    parts = urlsplit(url)
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        port = None
+    if parts.scheme not in ("http", "https") or not parts.hostname or port is None:
+        raise BlockedAddressError(f"unsupported url: {url}")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise httpx.ConnectError(f"cannot resolve {parts.hostname}") from e
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedAddressError(f"non-public address {ip} for {parts.hostname}")
+
+
+def _open_public(url: str, timeout: float, headers: Optional[Dict[str, str]]) -> httpx.Response:
+    """逐跳校验目标地址并手动跟随重定向，返回尚未读取响应体的流式响应。"""
+    c = client()
+    current = url
+    for _ in range(_MAX_REDIRECTS + 1):
+        _check_public(current)
+        resp = c.send(c.build_request("GET", current, headers=headers, timeout=timeout), stream=True)
+        if not resp.is_redirect or resp.next_request is None:
+            return resp
+        current = str(resp.next_request.url)
+        resp.close()
+    raise httpx.TooManyRedirects(f"too many redirects: {url}")
+
+
+@contextmanager
+def stream(url: str, timeout: float, headers: Optional[Dict[str, str]] = None, public_only: bool = False) -> Iterator[httpx.Response]:
+    """
+    流式 GET（跟随重定向）：在 with 块内用 resp.iter_bytes() 逐块读取，提前退出 with 即停止下载并关闭连接。
+    非 2xx 时抛出 httpx.HTTPStatusError；with 块内抛出的异常同样计为该上游的失败。
+    public_only=True（URL 来自外部、不可信）时，首跳与每次重定向的目标都须解析为公网地址，否则抛出 BlockedAddressError；
+    配置 UPSTREAM_OVERRIDE 时请求固定发往改写后的地址，不做该校验。
+    录制/回放模式下整体读取响应体（与磁带一致），调用方照常逐块读取。
+    """
+    with _tracked(url, timeout, public_only=public_only) as call:
+        if cassette.replaying():
+            resp = _exchange("GET", url, call["timeout"], headers=headers, follow_redirects=True)
+            call["responded"] = True
+            resp.raise_for_status()
+            yield resp
+            call["outcome"] = "ok"
+            return
+        c = client()
+        t0 = time.perf_counter()
+        try:
+            if public_only and not upstream_override():
+                resp = _open_public(url, call["timeout"], headers)
+            else:
+                resp = c.send(c.build_request("GET", _route(url), headers=headers, timeout=call["timeout"]), stream=True, follow_redirects=True)
+        except httpx.TransportError as e:
+            if cassette.recording():
+                cassette.record(cassette.request_key("GET", url), time.perf_counter() - t0, error=e)
+            raise
+        try:
+            if cassette.recording():
+                resp.read()
+                cassette.record(cassette.request_key("GET", url), time.perf_counter() - t0, resp)
+            call["responded"] = True
+            resp.raise_for_status()
+            yield resp
+        finally:
+            resp.close()
+        call["outcome"] = "ok"
+
+
+def probe(url: str, timeout: float, public_only: bool = False) -> int:
+    """
+    熔断半开探测：绕过熔断检查发送 GET，返回 HTTP 状态码。
+    public_only=True（该上游来自不可信 URL）时与 stream() 一样逐跳校验公网地址，被拒绝时抛出 BlockedAddressError。
+    """
+    host = urlsplit(url).netloc
+    if cassette.replaying():
+        # 回放不访问网络：探测直接视为成功，熔断状态由回放的响应决定
+        return 200
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        if public_only and not upstream_override():
+            resp = _open_public(url, timeout, None)
+            resp.close()
+            status = resp.status_code
+        else:
+            status = client().get(_route(url), timeout=timeout).status_code
+        outcome = "ok" if status < 400 else "error"
+        return status
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        record_upstream(host, time.perf_counter() - t0, outcome)
@@ -0,0 +1,227 @@
+"""
+轻量观测层：
+- span(stage)：阶段耗时（直方图）
+- record_upstream(host, ...)：按上游 host 统计耗时、错误与超时
+- InstrumentedThreadPool：线程池排队深度与活跃任务数；提交方处于请求剖析中时，任务同样被剖析
+- collect_timings()：收集单次请求内的耗时明细，供报告 debug 段使用
+- render_prometheus()：导出 Prometheus 文本格式
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.cache import all_caches
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LOCK = threading.Lock()
+# (metric, labels) -> [bucket_counts..., count, sum]
+_HISTOGRAMS: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_COUNTERS: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_GAUGES: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+_HELP = {
+    "weiyu_stage_seconds": ("histogram", "Duration of analysis stages"),
+    "weiyu_upstream_seconds": ("histogram", "Duration of upstream HTTP calls by host"),
+    "weiyu_upstream_errors_total": ("counter", "Upstream HTTP failures by host and kind"),
+    "weiyu_pool_queue_depth": ("gauge", "Tasks submitted but not yet started, by thread pool"),
+    "weiyu_pool_active": ("gauge", "Tasks currently running, by thread pool"),
+    "weiyu_breaker_state": ("gauge", "Circuit breaker state by upstream (0 closed, 1 half-open, 2 open)"),
+    "weiyu_breaker_short_circuits_total": ("counter", "Upstream calls skipped because the circuit is open"),
+    "weiyu_search_cache_total": ("counter", "Search result cache lookups by provider and result"),
+    "weiyu_search_quota_tokens": ("gauge", "Remaining token-bucket quota by paid search provider"),
+    "weiyu_monitor_cycles_total": ("counter", "Watchlist monitor fetch cycles"),
+    "weiyu_monitor_alerts_total": ("counter", "Watchlist monitor spike alerts by kind"),
+    "weiyu_monitor_topics": ("gauge", "Topics on the monitor watchlist"),
+    "weiyu_feed_fetch_total": ("counter", "Scheduled feed refreshes by result (ok, mirror, error)"),
+    "weiyu_feed_inflight": ("gauge", "Scheduled feed requests in flight"),
+    "weiyu_feed_lag_seconds": ("gauge", "Largest delay between a feed's due time and its dispatch"),
+    "weiyu_feed_registry_feeds": ("gauge", "Feeds scheduled from the registry"),
+    "weiyu_startup_seconds": ("gauge", "Worker startup time by phase (import, warmup steps, ready)"),
+    "weiyu_reader_total": ("counter", "Article text extractions by backend (local/jina) and result"),
+    "weiyu_cache_hits_total": ("counter", "TTLCache hits"),
+    "weiyu_cache_misses_total": ("counter", "TTLCache misses"),
+    "weiyu_cache_hit_ratio": ("gauge", "TTLCache hit ratio since start"),
+    "weiyu_cache_entries": ("gauge", "TTLCache stored entries"),
+}
+
+# 当前请求的耗时收集器（None 表示未开启）
+_COLLECTOR: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("weiyu_timings", default=None)
+# 当前请求的剖析器（app/utils/profiling.RequestProfiler，None 表示未开启）；线程池任务经其 task() 执行
+TASK_PROFILER: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("weiyu_task_profiler", default=None)
+
+
+def _key(metric: str, labels: Dict[str, str]):
+    return metric, tuple(sorted(labels.items()))
+
+
+def observe(metric: str, seconds: float, **labels: str):
+    key = _key(metric, labels)
+    with _LOCK:
+        h = _HISTOGRAMS.get(key)
+        if h is None:
+            h = [0.0] * (len(_BUCKETS) + 2)
+            _HISTOGRAMS[key] = h
+        for i, le in enumerate(_BUCKETS):
+            if seconds <= le:
+                h[i] += 1
+        h[-2] += 1
+        h[-1] += seconds
+
+
+def inc(metric: str, value: float = 1.0, **labels: str):
+    key = _key(metric, labels)
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0.0) + value
+
+
+def gauge_add(metric: str, value: float, **labels: str):
+    key = _key(metric, labels)
+    with _LOCK:
+        _GAUGES[key] = _GAUGES.get(key, 0.0) + value
+
+
+def gauge_set(metric: str, value: float, **labels: str):
+    key = _key(metric, labels)
+    with _LOCK:
+        _GAUGES[key] = value
+
+
+def gauge_remove(metric: str, **labels: str):
+    """删除一条 gauge 序列（其标签对应的对象已不再跟踪时调用）。"""
+    key = _key(metric, labels)
+    with _LOCK:
+        _GAUGES.pop(key, None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        observe("weiyu_stage_seconds", dt, stage=stage)
+        col = _COLLECTOR.get()
+        if col is not None:
+            with _LOCK:
+                col["stages"].append({"stage": stage, "ms": round(dt * 1000, 2)})
+
+
+def record_upstream(host: str, seconds: float, outcome: str = "ok"):
+    """outcome: ok / error / timeout / blocked（public_only 校验拒绝，未发出）"""
+    observe("weiyu_upstream_seconds", seconds, host=host)
+    if outcome != "ok":
+        inc("weiyu_upstream_errors_total", host=host, kind=outcome)
+    col = _COLLECTOR.get()
+    if col is not None:
+        with _LOCK:
+            h = col["upstream"].setdefault(host, {"count": 0, "total_ms": 0.0, "errors": 0})
+            h["count"] += 1
+            h["total_ms"] = round(h["total_ms"] + seconds * 1000, 2)
+            if outcome != "ok":
+                h["errors"] += 1
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict]:
+    """在 with 块内收集阶段与上游耗时：{"stages": [...], "upstream": {host: {...}}}。"""
+    col = {"stages": [], "upstream": {}}
+    token = _COLLECTOR.set(col)
+    try:
+        yield col
+    finally:
+        _COLLECTOR.reset(token)
+
+
+def _call(fn, args, kwargs):
+    profiler = TASK_PROFILER.get()
+    if profiler is None:
+        return fn(*args, **kwargs)
+    with profiler.task():
+        return fn(*args, **kwargs)
+
+
+class InstrumentedThreadPool(ThreadPoolExecutor):
+    """记录排队深度/活跃数的线程池，并把提交方的 contextvars（含耗时收集器与请求剖析器）传递到工作线程。"""
+
+    def __init__(self, name: str, max_workers: Optional[int] = None):
+        super().__init__(max_workers=max_workers)
+        self._pool_name = name
+
+    def submit(self, fn, /, *args, **kwargs):
+        ctx = contextvars.copy_context()
+        name = self._pool_name
+        gauge_add("weiyu_pool_queue_depth", 1, pool=name)
+
+        def _run():
+            gauge_add("weiyu_pool_queue_depth", -1, pool=name)
+            gauge_add("weiyu_pool_active", 1, pool=name)
+            try:
+                return ctx.run(_call, fn, args, kwargs)
+            finally:
+                gauge_add("weiyu_pool_active", -1, pool=name)
+
+        try:
+            fut = super().submit(_run)
+        except Exception:
+            gauge_add("weiyu_pool_queue_depth", -1, pool=name)
+            raise
+        # 排队中被取消的任务不会执行 _run，需在此回收排队计数
+        fut.add_done_callback(lambda f: f.cancelled() and gauge_add("weiyu_pool_queue_depth", -1, pool=name))
+        return fut
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _cache_samples():
+    out = []
+    for c in all_caches():
+        name = c.name or "unnamed"
+        hits, misses = c.hits, c.misses
+        total = hits + misses
+        labels = (("cache", name),)
+        out.append(("weiyu_cache_hits_total", labels, hits))
+        out.append(("weiyu_cache_misses_total", labels, misses))
+        out.append(("weiyu_cache_hit_ratio", labels, round(hits / total, 4) if total else 0.0))
+        out.append(("weiyu_cache_entries", labels, len(c)))
+    return out
+
+
+def render_prometheus() -> str:
+    with _LOCK:
+        hists = {k: list(v) for k, v in _HISTOGRAMS.items()}
+        samples = [(m, l, v) for (m, l), v in _COUNTERS.items()]
+        samples += [(m, l, v) for (m, l), v in _GAUGES.items()]
+    samples += _cache_samples()
+
+    by_metric: Dict[str, List[str]] = {}
+    for (metric, labels), h in sorted(hists.items()):
+        lines = by_metric.setdefault(metric, [])
+        for i, le in enumerate(_BUCKETS):
+            lines.append(f"{metric}_bucket{_fmt_labels(labels, ('le', str(le)))} {int(h[i])}")
+        lines.append(f"{metric}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {int(h[-2])}")
+        lines.append(f"{metric}_count{_fmt_labels(labels)} {int(h[-2])}")
+        lines.append(f"{metric}_sum{_fmt_labels(labels)} {round(h[-1], 6)}")
+    for metric, labels, value in sorted(samples, key=lambda x: (x[0], x[1])):
+        by_metric.setdefault(metric, []).append(f"{metric}{_fmt_labels(labels)} {value}")
+
+    out: List[str] = []
+    for metric in sorted(by_metric):
+        kind, help_text = _HELP.get(metric, ("untyped", metric))
+        out.append(f"# HELP {metric} {help_text}")
+        out.append(f"# TYPE {metric} {kind}")
+        out.extend(by_metric[metric])
+    return "\n".join(out) + "\n"
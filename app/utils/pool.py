@@ -0,0 +1,58 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.config import cpu_pool_workers, cpu_pool_chunk_size
+
+# 进程池为进程级单例：首次使用时按配置创建，避免每个请求重复拉起子进程
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    返回共享的进程池；未开启（CPU_POOL_WORKERS=0）时返回 None。
+    使用 spawn 上下文，避免在多线程的 Web 进程中 fork 带来的死锁风险。
+    """
+    global _POOL
+    workers = cpu_pool_workers()
+    if workers <= 0:
+        return None
+    if _POOL is not None:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            ctx = multiprocessing.get_context("spawn")
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+    return _POOL
+
+
+def shutdown_process_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+
+def chunked(seq: Sequence[Any], size: int) -> List[Sequence[Any]]:
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def map_chunked(fn: Callable[[Sequence[Any]], List[Any]], seq: Sequence[Any], chunk_size: Optional[int] = None) -> List[Any]:
+    """
+    将 seq 按块提交给进程池执行 fn（fn 接收一个批次并返回等长列表），按原顺序拼接结果。
+    未开启进程池时直接在当前线程执行，行为保持一致。
+    """
+    if not seq:
+        return []
+    pool = get_process_pool()
+    if pool is None:
+        return list(fn(seq))
+    size = chunk_size or cpu_pool_chunk_size()
+    futures = [pool.submit(fn, list(batch)) for batch in chunked(seq, size)]
+    results: List[Any] = []
+    for fut in futures:
+        results.extend(fut.result())
+    return results
@@ -0,0 +1,216 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
+
+from app.config import profiling_top_n, profiling_sample_interval_ms
+from app.utils.cache import TTLCache
+from app.utils.instrument import TASK_PROFILER
+
+# 剖析结果保留 30 分钟，供 /profile/{id} 下载
+_PROFILE_CACHE = TTLCache(ttl_seconds=1800, name="profiles")
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+def _frame_label(code) -> str:
+    fname = code.co_filename
+    if fname.startswith(_PROJECT_ROOT):
+        fname = os.path.relpath(fname, os.path.dirname(_PROJECT_ROOT))
+    else:
+        fname = os.path.basename(fname)
+    return f"{code.co_name} ({fname}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """
+    采样剖析：按固定间隔抓取本请求相关线程（thread_ids）的调用栈，累计为折叠栈（flamegraph.pl / speedscope 可直接读取）。
+    thread_ids 为处理请求的线程，加上正在执行本请求线程池任务（RSS 解析、相关度评分、指标拉取等）的工作线程；
+    其他线程可能在处理并发的请求，不采样。仅保留经过项目代码的栈。
+    """
+
+    def __init__(self, interval_s: float, thread_id: int):
+        super().__init__(daemon=True)
+        self.interval_s = interval_s
+        self.thread_ids: Set[int] = {thread_id}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval_s):
+            self.samples += 1
+            frames = sys._current_frames()
+            for tid in list(self.thread_ids):
+                labels: List[str] = []
+                in_project = False
+                f = frames.get(tid)
+                while f is not None:
+                    code = f.f_code
+                    if code.co_filename.startswith(_PROJECT_ROOT):
+                        in_project = True
+                    labels.append(_frame_label(code))
+                    f = f.f_back
+                if in_project:
+                    self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join(timeout=1.0)
+
+
+class RequestProfiler:
+    """
+    单请求剖析器（with 语法）：
+    - cprofile：确定性剖析，输出 Top-N 函数表
+    - sample：采样剖析，输出折叠栈与按自身采样数排序的 Top-N 表
+    两种模式都覆盖进入 with 的线程，以及本请求提交到 InstrumentedThreadPool 的任务（经 contextvar 传递，
+    见 task()）；并发的其他请求不计入。进程池（CPU_POOL_WORKERS）中的任务不在剖析范围内。
+    结果写入缓存，返回 profile id。
+    """
+
+    def __init__(self, mode: str = "cprofile", label: str = ""):
+        self.mode = mode if mode in PROFILE_MODES else "cprofile"
+        self.label = label
+        self.id = uuid.uuid4().hex[:12]
+        self._prof: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self._task_profs: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._token = None
+        self._t0 = 0.0
+        self.result: Dict = {}
+
+    @contextmanager
+    def task(self) -> Iterator[None]:
+        """在工作线程中执行本请求的线程池任务：cprofile 模式单独剖析该任务，sample 模式期间采样该线程。"""
+        if self._closed:
+            yield
+            return
+        if self._sampler is not None:
+            tid = threading.get_ident()
+            self._sampler.thread_ids.add(tid)
+            try:
+                yield
+            finally:
+                self._sampler.thread_ids.discard(tid)
+            return
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # 该线程已有其他剖析器在运行
+            yield
+            return
+        try:
+            yield
+        finally:
+            prof.disable()
+            with self._lock:
+                if not self._closed:
+                    self._task_profs.append(prof)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        self._token = TASK_PROFILER.set(self)
+        if self.mode == "sample":
+            self._sampler = _Sampler(profiling_sample_interval_ms() / 1000.0, threading.get_ident())
+            self._sampler.start()
+        else:
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+        top_n = profiling_top_n()
+        TASK_PROFILER.reset(self._token)
+        with self._lock:
+            # 请求结束后仍在运行的任务（对冲落败者等）不再计入
+            self._closed = True
+        if self._prof is not None:
+            self._prof.disable()
+            top, collapsed = self._cprofile_table(top_n), ""
+        else:
+            self._sampler.stop()
+            top, collapsed = self._sample_table(top_n), self._collapsed()
+        self.result = {
+            "id": self.id,
+            "mode": self.mode,
+            "label": self.label,
+            "wall_ms": wall_ms,
+            "top": top,
+            "collapsed": collapsed,
+        }
+        _PROFILE_CACHE.set(self.id, self.result)
+        return False
+
+    def _cprofile_table(self, top_n: int) -> List[Dict]:
+        stats = pstats.Stats(self._prof, stream=io.StringIO())
+        for prof in self._task_profs:
+            try:
+                stats.add(prof)
+            except TypeError:
+                # 任务内没有任何调用记录
+                pass
+        rows = []
+        for (fname, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+            rows.append({
+                "function": f"{func} ({os.path.basename(fname)}:{line})",
+                "ncalls": nc,
+                "tottime_ms": round(tt * 1000, 3),
+                "cumtime_ms": round(ct * 1000, 3),
+            })
+        rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+        return rows[:top_n]
+
+    def _sample_table(self, top_n: int) -> List[Dict]:
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, n in self._sampler.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += n
+            for fr in set(frames):
+                total_counts[fr] += n
+        interval_ms = profiling_sample_interval_ms()
+        return [
+            {
+                "function": fr,
+                "self_samples": n,
+                "total_samples": total_counts[fr],
+                "self_ms_est": n * interval_ms,
+            }
+            for fr, n in self_counts.most_common(top_n)
+        ]
+
+    def _collapsed(self) -> str:
+        return "\n".join(f"{stack} {n}" for stack, n in self._sampler.stacks.most_common()) + "\n"
+
+
+def get_profile(profile_id: str) -> Optional[Dict]:
+    return _PROFILE_CACHE.get(profile_id)
+
+
+def format_table(result: Dict) -> str:
+    """将 Top-N 结果格式化为等宽文本表格。"""
+    lines = [f"profile {result['id']} mode={result['mode']} wall={result['wall_ms']}ms {result.get('label', '')}".rstrip()]
+    rows = result.get("top") or []
+    if result["mode"] == "cprofile":
+        lines.append(f"{'tottime_ms':>12} {'cumtime_ms':>12} {'ncalls':>8}  function")
+        for r in rows:
+            lines.append(f"{r['tottime_ms']:>12} {r['cumtime_ms']:>12} {r['ncalls']:>8}  {r['function']}")
+    else:
+        lines.append(f"{'self':>8} {'total':>8} {'self_ms':>8}  function")
+        for r in rows:
+            lines.append(f"{r['self_samples']:>8} {r['total_samples']:>8} {r['self_ms_est']:>8}  {r['function']}")
+    return "\n".join(lines) + "\n"
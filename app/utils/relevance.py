@@ -0,0 +1,71 @@
+import math
+from collections import Counter
+from itertools import repeat
+from operator import add, mul
+from typing import Dict, List, Sequence, Tuple
+
+from app.utils.terms import normalize_text
+
+SparseVec = Dict[str, float]
+
+
+def _ngram_vector(text: str) -> Tuple[SparseVec, float]:
+    """将规范化文本转为字符 n-gram 词频向量（以 n-gram 为键的哈希稀疏表），返回 (vec, L2 范数)。"""
+    # 1/2/3-gram 通过错位拼接在 C 层生成并计数，避免 Python 级逐字符循环
+    bigrams = list(map(add, text, text[1:]))
+    vec: SparseVec = Counter(text)
+    vec.update(bigrams)
+    vec.update(map(add, bigrams, text[2:]))
+    return vec, math.hypot(*vec.values())
+
+
+def _cosine(a: SparseVec, a_norm: float, b: SparseVec, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    # 遍历较小的向量，复杂度与短文本（通常是检索词）成正比
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(map(mul, a.values(), map(b.get, a.keys(), repeat(0))))
+    return dot / (a_norm * b_norm)
+
+
+def score_entries(entries: Sequence[Tuple[str, str]], terms: List[str]) -> List[Dict]:
+    """
+    批量相关性评分：一次性对整个 feed 的 [(title, summary)] 与全部检索词打分。
+    检索词的小写形式与 n-gram 向量只计算一次，每个条目的标题/摘要只规范化一次；
+    模糊相似度使用哈希 n-gram 向量的余弦相似度替代逐对 SequenceMatcher。
+    返回与 rss._relevance 相同的结构：[{related, score, reason, summary}]
+    """
+    terms_low = [term.lower() for term in terms]
+    term_vecs = [_ngram_vector(normalize_text(term)) for term in terms]
+
+    results: List[Dict] = []
+    for title, summary in entries:
+        t = (title or "")
+        s = (summary or "")
+        tl = t.lower()
+        sl = s.lower()
+        # 命中计数与权重
+        hit_title = sum(1 for term in terms_low if term in tl)
+        hit_summary = sum(1 for term in terms_low if term in sl)
+        # 规范化后模糊相似度
+        tv, tn = _ngram_vector(normalize_text(t))
+        sv, sn = _ngram_vector(normalize_text(s))
+        fuzzy = 0.0
+        for vec, norm in term_vecs:
+            fuzzy = max(fuzzy, _cosine(vec, norm, tv, tn), _cosine(vec, norm, sv, sn))
+        score = hit_title * 2 + hit_summary + (fuzzy if fuzzy >= 0.6 else 0)
+        related = (hit_title > 0) or (hit_summary > 0) or (fuzzy >= 0.8)
+        # 生成用于判断的简要总结（命中句优先）
+        sent = ""
+        if hit_summary:
+            for seg in s.replace("。", ".").split("."):
+                segl = seg.lower()
+                if any(term in segl for term in terms_low):
+                    sent = seg.strip()
+                    break
+        if not sent:
+            sent = (s[:180] + "...") if s else (t[:180] + "...")
+        reason = f"title_hits={hit_title}, summary_hits={hit_summary}, fuzzy={round(fuzzy,2)}"
+        results.append({"related": related, "score": score, "reason": reason, "summary": sent})
+    return results
@@ -0,0 +1,204 @@
+"""
+数据源无关的检索结果缓存 + 付费数据源令牌桶限流。
+
+- 缓存键：数据源 + 规范化查询（terms.query_key，只剥离“最新消息”等噪声修饰词）+ 影响结果的参数；新鲜期按数据源配置
+- 令牌桶：容量为每日配额，按配额/86400 每秒匀速回填
+- 余量低于预留比例时，已有缓存（即使已过新鲜期）的查询直接用缓存，把配额留给新话题；
+  令牌耗尽或上游失败时同样回退到过期缓存，仍无则返回空，由调用方切换到更便宜的数据源
+
+令牌桶余量与缓存结果持久化在 DATA_DIR/search_cache.sqlite3：进程重启或多个工作进程/监控进程共享同一份配额
+（扣减在 sqlite 写事务内完成，跨进程互斥），缓存也跨进程复用；进程内另有一层内存缓存挡住热点查询。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.config import data_dir, search_cache_stale_seconds, search_cache_ttl_seconds, search_daily_quota
+from app.utils.cache import TTLCache
+from app.utils.instrument import gauge_set, inc
+from app.utils.terms import query_key
+
+# 余量低于容量的该比例时，只为新查询消耗配额
+_RESERVE_RATIO = 0.2
+# 每写入这么多条缓存清理一次彻底过期的行
+_PURGE_EVERY = 200
+
+_DB_LOCK = threading.Lock()
+_DB: Dict = {"path": None, "conn": None, "writes": 0}
+
+
+def _db() -> sqlite3.Connection:
+    """调用方持有 _DB_LOCK。DATA_DIR 变化时重新打开。"""
+    path = os.path.join(data_dir(), "search_cache.sqlite3")
+    if _DB["path"] != path:
+        os.makedirs(data_dir(), exist_ok=True)
+        # isolation_level=None：手动 BEGIN IMMEDIATE，扣减配额时先取得写锁
+        conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS quota (provider TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " provider TEXT NOT NULL, key TEXT NOT NULL, ts REAL NOT NULL, num INTEGER NOT NULL, items TEXT NOT NULL,"
+            " PRIMARY KEY (provider, key))"
+        )
+        if _DB["conn"] is not None:
+            _DB["conn"].close()
+        _DB.update(path=path, conn=conn, writes=0)
+    return _DB["conn"]
+
+
+class TokenBucket:
+    """按数据源持久化的令牌桶；余量与上次回填时间存于 sqlite，按墙钟时间回填。"""
+
+    def __init__(self, provider: str, capacity: float, refill_per_second: float):
+        self.provider = provider
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+
+    def _current(self, conn: sqlite3.Connection, now: float) -> float:
+        row = conn.execute("SELECT tokens, ts FROM quota WHERE provider = ?", (self.provider,)).fetchone()
+        if row is None:
+            return self.capacity
+        tokens, ts = row
+        return min(self.capacity, tokens + max(0.0, now - ts) * self.refill_per_second)
+
+    def available(self) -> float:
+        with _DB_LOCK:
+            return self._current(_db(), time.time())
+
+    def take(self) -> bool:
+        with _DB_LOCK:
+            conn = _db()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens = self._current(conn, now)
+                if tokens >= 1:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO quota (provider, tokens, ts) VALUES (?, ?, ?)",
+                        (self.provider, tokens - 1, now),
+                    )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return tokens >= 1
+
+
+_LOCK = threading.Lock()
+_CACHES: Dict[str, TTLCache] = {}
+_BUCKETS: Dict[str, Optional[TokenBucket]] = {}
+
+
+def _retention(provider: str) -> float:
+    # 过期时间取“新鲜期 + 过期保留期”，新鲜与否由条目内的时间戳判断
+    return search_cache_ttl_seconds(provider) + search_cache_stale_seconds()
+
+
+def _cache(provider: str) -> TTLCache:
+    with _LOCK:
+        c = _CACHES.get(provider)
+        if c is None:
+            c = _CACHES[provider] = TTLCache(ttl_seconds=_retention(provider), name=f"search_{provider}")
+        return c
+
+
+def _bucket(provider: str) -> Optional[TokenBucket]:
+    with _LOCK:
+        if provider not in _BUCKETS:
+            quota = search_daily_quota(provider)
+            _BUCKETS[provider] = TokenBucket(provider, quota, quota / 86400.0) if quota else None
+        return _BUCKETS[provider]
+
+
+def _key(query: str, variant: str) -> str:
+    return f"{query_key(query)}|{variant}"
+
+
+def _lookup(provider: str, key: str, count: bool = True) -> Optional[Dict]:
+    """先查进程内缓存，未命中再查 sqlite（其他进程或重启前写入的结果），命中后回填内存。"""
+    cache = _cache(provider)
+    entry = cache.get(key) if count else cache.peek(key)
+    if entry is not None:
+        return entry
+    with _DB_LOCK:
+        row = _db().execute(
+            "SELECT ts, num, items FROM results WHERE provider = ? AND key = ? AND ts >= ?",
+            (provider, key, time.time() - _retention(provider)),
+        ).fetchone()
+    if row is None:
+        return None
+    entry = {"ts": row[0], "num": row[1], "items": json.loads(row[2])}
+    cache.set(key, entry)
+    return entry
+
+
+def _save(provider: str, key: str, entry: Dict):
+    _cache(provider).set(key, entry)
+    raw = json.dumps(entry["items"], ensure_ascii=False, default=str)
+    try:
+        with _DB_LOCK:
+            conn = _db()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (provider, key, ts, num, items) VALUES (?, ?, ?, ?, ?)",
+                (provider, key, entry["ts"], entry["num"], raw),
+            )
+            _DB["writes"] += 1
+            if _DB["writes"] % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM results WHERE provider = ? AND ts < ?", (provider, time.time() - _retention(provider)))
+    except sqlite3.Error:
+        # 持久化失败不影响本次结果，进程内缓存仍然有效
+        pass
+
+
+def _usable(entry: Optional[Dict], num: int) -> bool:
+    # 之前按更小的 num 截断过的结果不能满足更大的 num
+    return bool(entry) and (entry["num"] >= num or len(entry["items"]) < entry["num"])
+
+
+def _copy(items: List[Dict], num: int) -> List[Dict]:
+    # 下游会就地补充字段（正文、域名等），返回副本避免污染缓存
+    return [dict(it) for it in items[:num]]
+
+
+def quota_available(provider: str, query: str, num: int, variant: str = "") -> bool:
+    """该查询能否从此数据源得到结果（有缓存，或配额未耗尽）。不计入缓存命中统计。"""
+    if _usable(_lookup(provider, _key(query, variant), count=False), num):
+        return True
+    bucket = _bucket(provider)
+    return bucket is None or bucket.available() >= 1
+
+
+def cached_search(provider: str, query: str, num: int, fetch: Callable[[], List[Dict]], variant: str = "") -> List[Dict]:
+    """
+    带缓存/配额控制的检索：fetch 为实际请求上游的无参函数。
+    variant 用于区分影响结果的其它参数（如时间范围、地区）。
+    """
+    key = _key(query, variant)
+    entry = _lookup(provider, key)
+    if not _usable(entry, num):
+        entry = None
+    if entry and time.time() - entry["ts"] < search_cache_ttl_seconds(provider):
+        inc("weiyu_search_cache_total", provider=provider, result="fresh")
+        return _copy(entry["items"], num)
+
+    bucket = _bucket(provider)
+    if bucket is not None:
+        tokens = bucket.available()
+        gauge_set("weiyu_search_quota_tokens", round(tokens, 2), provider=provider)
+        if entry and tokens < bucket.capacity * _RESERVE_RATIO:
+            inc("weiyu_search_cache_total", provider=provider, result="stale")
+            return _copy(entry["items"], num)
+        if not bucket.take():
+            inc("weiyu_search_cache_total", provider=provider, result="stale" if entry else "quota_exhausted")
+            return _copy(entry["items"], num) if entry else []
+
+    inc("weiyu_search_cache_total", provider=provider, result="miss")
+    items = fetch()
+    if items:
+        _save(provider, key, {"ts": time.time(), "num": num, "items": _copy(items, len(items))})
+        return items
+    # 上游失败/无结果时回退到过期缓存
+    return _copy(entry["items"], num) if entry else items
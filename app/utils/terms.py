@@ -1,5 +1,12 @@
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import json
+import os
 import re
+import threading
+import time
+
+from app.config import term_dictionary_path
 
 _re_punct = re.compile(r"[\s#·・\-—_，,。\.！!？\?、/\\:：;；\[\]\(\)【】『』“”\"']+")
 
@@ -10,37 +17,200 @@ def normalize_text(text: str) -> str:
         return ""
     return _re_punct.sub("", t)
 
-def expand_terms(query: str) -> List[str]:
+# Built-in fallback used when the dictionary file is missing or invalid.
+_DEFAULT_MODIFIERS = ["是什么", "怎么回事", "最新消息", "最新", "事件", "热搜", "曝光", "官宣", "发布会", "发布", "涨价", "降价"]
+_DEFAULT_ALIASES = [["小鹏汽车", "小鹏", "xpeng", "xpev", "xpeng motors"]]
+# Modifiers that never change what a query asks about; only these are dropped from cache keys
+# (涨价/降价/发布会 select different results and stay in the key).
+_DEFAULT_NOISE = ["是什么", "怎么回事", "最新消息", "最新"]
+# Short CJK aliases that are also everyday words (美的 in 最美的, 平安 in 平安夜); they only
+# count when they form a whole query or a whole whitespace/punctuation-delimited token.
+_DEFAULT_AMBIGUOUS = ["美的", "理想", "平安", "长城", "小米", "苹果"]
+
+# How often (seconds) the dictionary file mtime is checked for hot reload.
+_RELOAD_CHECK_S = 2.0
+
+_MODIFIER = -1
+_NOISE = -2
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def _is_token_edge(text: str, i: int) -> bool:
+    return i < 0 or i >= len(text) or bool(_re_punct.match(text[i]))
+
+
+class _Automaton:
     """
-    Lightweight synonym and variant expansion for Chinese/English mixed topics.
-    - Original query
-    - Remove common suffixes/modifiers (e.g., "是什么", "怎么回事", "最新消息")
-    - Split into sub tokens
-    - Known brand aliases (e.g., XPENG/XPEV)
+    Aho-Corasick automaton over lowercase patterns. One pass over the query finds every
+    modifier and alias occurrence. Output payload: _MODIFIER / _NOISE, or the alias group index.
+    Patterns are (text, payload) or (text, payload, whole); whole patterns only match a
+    complete token (delimited by whitespace, punctuation or the text edges).
+    """
+
+    def __init__(self, patterns: List[Tuple]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[int, int, bool]]] = [[]]  # (pattern length, payload, whole)
+        for pat, payload, *flags in patterns:
+            node = 0
+            for ch in pat:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((len(pat), payload, bool(flags and flags[0])))
+        # BFS for failure links
+        queue = list(self.goto[0].values())
+        while queue:
+            node = queue.pop(0)
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return [(start, end, payload)]. ASCII-alphanumeric patterns must sit on word boundaries."""
+        found = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for length, payload, whole in self.out[node]:
+                start, end = i - length + 1, i + 1
+                if whole and not (_is_token_edge(text, start - 1) and _is_token_edge(text, end)):
+                    continue
+                if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(text[i]) and end < len(text) and _is_word_char(text[end]):
+                    continue
+                found.append((start, end, payload))
+        return found
+
+
+class _TermDictionary:
+    def __init__(self, modifiers: List[str], aliases: List[List[str]], ambiguous: List[str], noise: List[str], version: int):
+        self.version = version
+        self.groups = [[a for a in g if a] for g in aliases if g]
+        self.ambiguous = {a.lower() for a in ambiguous if a}
+        noise_set = {n.lower() for n in noise if n}
+        words = dict.fromkeys([m.lower() for m in modifiers if m] + sorted(noise_set))
+        patterns = [(m, _NOISE if m in noise_set else _MODIFIER) for m in words]
+        for gi, group in enumerate(self.groups):
+            patterns.extend((a.lower(), gi, a.lower() in self.ambiguous) for a in group)
+        self.automaton = _Automaton(patterns)
+
+
+_LOCK = threading.Lock()
+_STATE = {"dict": None, "mtime": None, "path": None, "checked": 0.0, "version": 0}
+
+
+def _load_dictionary(path: str) -> Tuple[List[str], List[List[str]], List[str], List[str]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        ambiguous, noise = data.get("ambiguous"), data.get("noise")
+        return (
+            list(data.get("modifiers") or []),
+            [list(g) for g in data.get("aliases") or []],
+            list(_DEFAULT_AMBIGUOUS if ambiguous is None else ambiguous),
+            list(_DEFAULT_NOISE if noise is None else noise),
+        )
+    except Exception:
+        return _DEFAULT_MODIFIERS, _DEFAULT_ALIASES, _DEFAULT_AMBIGUOUS, _DEFAULT_NOISE
+
+
+def _dictionary() -> _TermDictionary:
+    """Current compiled dictionary; recompiles when the file (or TERM_DICT_PATH) changes."""
+    now = time.monotonic()
+    st = _STATE
+    if st["dict"] is not None and now - st["checked"] < _RELOAD_CHECK_S:
+        return st["dict"]
+    with _LOCK:
+        path = term_dictionary_path()
+        try:
+            mtime: Optional[float] = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        st["checked"] = now
+        if st["dict"] is None or mtime != st["mtime"] or path != st["path"]:
+            modifiers, aliases, ambiguous, noise = _load_dictionary(path)
+            st["version"] += 1
+            st["dict"] = _TermDictionary(modifiers, aliases, ambiguous, noise, st["version"])
+            st["mtime"], st["path"] = mtime, path
+            _expand_cached.cache_clear()
+            _core_cached.cache_clear()
+        return st["dict"]
+
+
+def _strip_modifiers(text: str, matches: List[Tuple[int, int, int]], kinds: Tuple[int, ...] = (_MODIFIER, _NOISE)) -> str:
+    """Remove modifier occurrences of the given kinds, leftmost-longest and non-overlapping."""
+    spans = sorted(((s, e) for s, e, p in matches if p in kinds), key=lambda x: (x[0], -x[1]))
+    out, pos = [], 0
+    for s, e in spans:
+        if s < pos:
+            continue
+        out.append(text[pos:s])
+        pos = e
+    out.append(text[pos:])
+    return "".join(out)
+
+
+@lru_cache(maxsize=4096)
+def _core_cached(query: str, version: int, noise_only: bool = False) -> str:
+    cleaned = _re_punct.sub(" ", query)
+    low = cleaned.lower()
+    d = _STATE["dict"]
+    # lower() keeps offsets for CJK/ASCII; otherwise strip on the lowercase text
+    base = cleaned if len(low) == len(cleaned) else low
+    kinds = (_NOISE,) if noise_only else (_MODIFIER, _NOISE)
+    return _strip_modifiers(base, d.automaton.matches(low), kinds).strip()
+
+
+def core_query(query: str) -> str:
+    """Strip punctuation (to spaces) and common modifiers, keeping the core topic words."""
+    return _core_cached((query or "").strip(), _dictionary().version)
+
+
+def query_key(query: str) -> str:
+    """
+    Normalized cache key: "小鹏汽车 最新消息" and "小鹏汽车" map to the same key. Only noise
+    modifiers are dropped; "小鹏汽车 涨价" and "小鹏汽车 降价" keep distinct keys.
     """
     q = (query or "").strip()
-    terms: List[str] = []
-    if not q:
-        return terms
-
-    terms.append(q)
-    # remove common modifiers
-    cleaned = _re_punct.sub(" ", q)
-    for w in ["是什么", "怎么回事", "最新消息", "最新", "事件", "热搜", "曝光", "官宣", "发布会", "发布", "涨价", "降价"]:
-        cleaned = cleaned.replace(w, "")
-    cq = cleaned.strip()
+    return normalize_text(_core_cached(q, _dictionary().version, True)) or normalize_text(q)
+
+
+@lru_cache(maxsize=4096)
+def _expand_cached(q: str, version: int) -> Tuple[str, ...]:
+    d = _STATE["dict"]
+    terms: List[str] = [q]
+    cq = _core_cached(q, version)
     if cq and cq != q:
         terms.append(cq)
     for tok in cq.split():
         if tok and tok not in terms:
             terms.append(tok)
-
-    low = q.lower()
-    # sample brand alias expansion (extend as needed)
-    if "小鹏" in q:
-        terms.extend(["小鹏汽车", "xpeng", "xpev", "xpeng motors"]) 
-    if any(t in low for t in ["xpeng", "xpev"]):
-        terms.extend(["XPENG", "XPEV", "xpeng motors"]) 
+    # alias groups hit anywhere in the query (single automaton pass); the core query is scanned
+    # too, so an ambiguous alias left whole by modifier stripping ("苹果发布会" -> "苹果") still counts
+    hit_groups = []
+    for text in dict.fromkeys((q.lower(), cq.lower())):
+        for _s, _e, payload in d.automaton.matches(text):
+            if payload >= 0 and payload not in hit_groups:
+                hit_groups.append(payload)
+    for gi in hit_groups:
+        terms.extend(d.groups[gi])
 
     # deduplicate keep order
     seen = set()
@@ -49,4 +219,48 @@ def expand_terms(query: str) -> List[str]:
         if t not in seen:
             dedup.append(t)
             seen.add(t)
-    return dedup
\ No newline at end of file
+    return tuple(dedup)
+
+
+def expand_terms(query: str) -> List[str]:
+    """
+    Synonym and variant expansion for Chinese/English mixed topics, driven by the
+    term dictionary (TERM_DICT_PATH; hot-reloaded on change):
+    - Original query
+    - Query with stop-modifiers removed (e.g., "是什么", "怎么回事", "最新消息")
+    - Split into sub tokens
+    - Every member of each alias group found in the query (brands, tickers, e.g. 小鹏/XPEV);
+      ambiguous short aliases (美的, 平安, ...) only count as a whole query or token
+    Expansions are memoized per dictionary version.
+    """
+    q = (query or "").strip()
+    if not q:
+        return []
+    return list(_expand_cached(q, _dictionary().version))
+
+
+def _spaced(text: str) -> str:
+    return " ".join(_re_punct.sub(" ", (text or "").lower()).split())
+
+
+class TermIndex:
+    """
+    Matches many term groups against a text in one automaton pass: groups maps a key
+    (e.g. a watched topic) to its terms. Punctuation and hashtag markers are treated as
+    spaces on both sides, so ASCII terms keep their word boundaries; ambiguous dictionary
+    aliases only match as whole tokens.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.keys = list(groups)
+        ambiguous = _dictionary().ambiguous
+        patterns = []
+        for i, key in enumerate(self.keys):
+            for term in {_spaced(t) for t in groups[key]}:
+                if term:
+                    patterns.append((term, i, term in ambiguous))
+        self._automaton = _Automaton(patterns)
+
+    def match(self, text: str) -> List[str]:
+        hit = {payload for _, _, payload in self._automaton.matches(_spaced(text))}
+        return [self.keys[i] for i in sorted(hit)]
@@ -0,0 +1,80 @@
+"""
+发布时间归一：各数据源的 published_at 原样保留，入库时另解析出 published_ts（epoch 秒，无法解析为 None）。
+
+支持 RFC 822（RSS）、ISO 8601 / YYYY-MM-DD[ HH:MM[:SS]]（百度等）、YYYYMMDD、YYYY年M月D日、epoch 秒/毫秒。
+不带时区的时间按本机时区解释（与 fetch_time 一致）。同一字符串在多个 feed、多次请求间反复出现，按字符串缓存解析结果。
+"""
+import calendar
+import re
+import time
+from datetime import datetime
+from email.utils import mktime_tz, parsedate_tz
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+_ISO = re.compile(
+    r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T\s]+(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?\s*(Z|[+-]\d{2}:?\d{2})?)?"
+)
+_CN = re.compile(r"(\d{4})年(\d{1,2})月(\d{1,2})日(?:\s*(\d{1,2})[:时](\d{2}))?")
+
+
+def _local_ts(y, mo, d, h=0, mi=0, s=0) -> Optional[int]:
+    try:
+        return int(datetime(y, mo, d, h, mi, s).timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+@lru_cache(maxsize=16384)
+def parse_ts(value: str) -> Optional[int]:
+    s = (value or "").strip()
+    if not s:
+        return None
+    if s.isdigit():
+        if len(s) == 8:
+            return _local_ts(int(s[:4]), int(s[4:6]), int(s[6:8]))
+        if len(s) in (10, 13):
+            return int(s[:10])
+        return None
+    m = _ISO.match(s)
+    if m:
+        y, mo, d, h, mi, sec, tz = m.groups()
+        parts = (int(y), int(mo), int(d), int(h or 0), int(mi or 0), int(sec or 0))
+        if not tz:
+            return _local_ts(*parts)
+        try:
+            base = calendar.timegm(datetime(*parts).timetuple())
+        except (ValueError, OverflowError):
+            return None
+        if tz == "Z":
+            return base
+        sign = -1 if tz[0] == "-" else 1
+        digits = tz[1:].replace(":", "")
+        return base - sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+    m = _CN.search(s)
+    if m:
+        return _local_ts(*(int(g or 0) for g in m.groups()))
+    parsed = parsedate_tz(s)
+    if parsed:
+        try:
+            if parsed[9] is None:
+                return int(time.mktime(parsed[:9]))
+            return int(mktime_tz(parsed))
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def stamp_items(items: List[Dict]) -> List[Dict]:
+    """就地补上 published_ts（已有则跳过），返回原列表。"""
+    for it in items:
+        if "published_ts" not in it:
+            value = it.get("published_at")
+            it["published_ts"] = parse_ts(value) if isinstance(value, str) else None
+    return items
+
+
+def within(item: Dict, since_ts: Optional[int]) -> bool:
+    """是否在时间窗口内；发布时间未知的素材不排除。"""
+    ts = item.get("published_ts")
+    return not since_ts or ts is None or ts >= since_ts
@@ -0,0 +1,165 @@
+"""
+增量分析的话题状态：同一话题反复分析时只处理新素材，把其贡献合并进历史聚合。
+
+每个话题（按 terms.normalize_text 归一，“小鹏汽车 降价”与“小鹏汽车”各自独立）一份 JSON，存于 DATA_DIR/topics/<哈希>.json：
+- seen：已处理素材的规范化 URL 键（无 URL 时用标题）-> 首次出现时间戳
+- keywords / positive / negative：ReportAgent.score_items 的可加合计
+- domains / daily / text_len：来源域名、按日条数与正文长度合计
+- items：最近若干条素材的精简副本（供报告展示）
+内存中缓存已载入的状态，仅在有新素材时落盘（先写临时文件再原子替换）。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from app.config import data_dir, topic_state_max_items
+from app.utils.canonical import url_key
+from app.utils.terms import normalize_text
+
+# 关键词计数只保留高频部分，避免长期运行的话题状态无限增长
+_MAX_KEYWORDS = 2000
+# 已见 URL 上限：超出时淘汰最早的，被淘汰的旧素材即使再次出现也只会按新素材计一次
+_MAX_SEEN = 20000
+# 展示用素材副本中正文的保留长度（模板只展示前 300 字）
+_CONTENT_CHARS = 300
+
+_LOCK = threading.Lock()
+_TOPIC_LOCKS: Dict[str, threading.Lock] = {}
+_STATES: Dict[str, Dict] = {}
+
+
+def _key(topic: str) -> str:
+    return hashlib.blake2b(normalize_text(topic).encode("utf-8"), digest_size=10).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(data_dir(), "topics", f"{key}.json")
+
+
+def _empty(topic: str) -> Dict:
+    return {
+        "topic": topic,
+        "runs": 0,
+        "updated_at": None,
+        "seen": {},
+        "keywords": Counter(),
+        "positive": 0,
+        "negative": 0,
+        "domains": Counter(),
+        "daily": Counter(),
+        "text_len": 0,
+        "items": [],
+    }
+
+
+def _read(topic: str, key: str) -> Dict:
+    state = _empty(topic)
+    try:
+        with open(_path(key), encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return state
+    for k in ("keywords", "domains", "daily"):
+        state[k] = Counter(raw.get(k) or {})
+    for k in ("runs", "updated_at", "seen", "positive", "negative", "text_len", "items"):
+        if k in raw:
+            state[k] = raw[k]
+    return state
+
+
+def _write(key: str, state: Dict):
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def item_key(item: Dict) -> str:
+    url = item.get("url") or item.get("link")
+    return url_key(url) if url else (item.get("title") or "")
+
+
+def peek(topic: str) -> Dict:
+    """读取话题状态（不加话题锁，仅用于预先筛掉已见素材；合并时会在锁内复核）。"""
+    key = _key(topic)
+    with _LOCK:
+        state = _STATES.get(key)
+    if state is None:
+        state = _read(topic, key)
+        with _LOCK:
+            state = _STATES.setdefault(key, state)
+    return state
+
+
+def unseen(state: Dict, items: List[Dict]) -> List[Dict]:
+    """过滤出状态中未处理过的素材（同批内重复的只保留首条）。"""
+    out, keys = [], set()
+    for it in items:
+        k = item_key(it)
+        if k and k not in state["seen"] and k not in keys:
+            keys.add(k)
+            out.append(it)
+    return out
+
+
+@contextmanager
+def locked(topic: str) -> Iterator[Dict]:
+    """持有话题锁并给出可就地修改的状态；退出时若 runs 有变化则落盘。"""
+    key = _key(topic)
+    with _LOCK:
+        lock = _TOPIC_LOCKS.setdefault(key, threading.Lock())
+    with lock:
+        state = peek(topic)
+        runs = state["runs"]
+        yield state
+        if state["runs"] != runs:
+            _write(key, state)
+
+
+def merge(state: Dict, items: List[Dict], scores: Dict, aggregates: Dict):
+    """
+    把一批新素材的贡献并入状态：scores 为 ReportAgent.score_items 的结果，
+    aggregates 为 {domains: Counter, daily: Counter, text_len}。调用方需持有话题锁。
+    """
+    now = time.time()
+    for it in items:
+        state["seen"][item_key(it)] = now
+    if len(state["seen"]) > _MAX_SEEN:
+        # dict 保持插入顺序，最早见到的在前
+        for k in list(state["seen"])[: len(state["seen"]) - _MAX_SEEN]:
+            del state["seen"][k]
+    state["keywords"].update(scores["keywords"])
+    if len(state["keywords"]) > _MAX_KEYWORDS:
+        state["keywords"] = Counter(dict(state["keywords"].most_common(_MAX_KEYWORDS)))
+    state["positive"] += scores["positive"]
+    state["negative"] += scores["negative"]
+    state["domains"].update(aggregates["domains"])
+    state["daily"].update(aggregates["daily"])
+    state["text_len"] += aggregates["text_len"]
+    fresh = []
+    for it in items:
+        slim = dict(it)
+        if slim.get("content"):
+            slim["content"] = slim["content"][:_CONTENT_CHARS]
+        fresh.append(slim)
+    state["items"] = (fresh + state["items"])[: topic_state_max_items()]
+    state["runs"] += 1
+    state["updated_at"] = now
+
+
+def reset(topic: str):
+    """丢弃话题的增量状态，下次分析按全量重新开始。"""
+    key = _key(topic)
+    with _LOCK:
+        _STATES.pop(key, None)
+    try:
+        os.remove(_path(key))
+    except OSError:
+        pass
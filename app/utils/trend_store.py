@@ -0,0 +1,246 @@
+"""
+热榜快照历史：仅追加的定长记录时间序列。
+
+DATA_DIR/trends/ 下三个文件：
+- records.bin：每条 12 字节 <ts:uint32, title_id:uint32, rank:uint16, platform_id:uint8, pad>，按写入时间递增
+- titles.tsv：标题字典，每行 "规范化标题哈希\\t原始标题"，行号即 title_id
+- platforms.txt：平台字典，行号即 platform_id
+
+查询时以 mmap 只读映射 records.bin，按时间戳二分定位区间，再用 struct.iter_unpack 批量解码，
+只保留目标 title_id 的记录；磁盘与内存占用都与记录条数线性相关且很小（每天约 1MB 量级）。
+多个进程（Web 工作进程、监控、feed 调度器）可同时写入：写入在 trends/.lock 文件锁下进行，先增量读入其他进程
+追加的字典行再分配新 id，保证 id 始终等于文件行号；读取时同样先增量同步（只读完整的行）。
+标题另建规范化文本的 2-gram 倒排索引，按话题查轨迹时只需对 similar_titles() 给出的候选做精确匹配。
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # 非 POSIX 平台没有 flock：退化为单进程写入
+    fcntl = None
+
+from app.config import data_dir, trend_snapshot_interval_seconds
+from app.utils.terms import normalize_text
+
+_RECORD = struct.Struct("<IIHBx")
+
+_LOCK = threading.Lock()
+_TITLES: List[str] = []
+_TITLE_IDS: Dict[str, int] = {}
+_PLATFORMS: List[str] = []
+_PLATFORM_IDS: Dict[str, int] = {}
+_LAST_SNAPSHOT: Dict[str, float] = {}
+_LOADED_DIR: Optional[str] = None
+# 字典文件已读入的字节数：之后只读追加的部分
+_OFFSETS: Dict[str, int] = {}
+# 规范化标题（下标即 title_id）与其 2-gram 倒排表
+_NORMS: List[str] = []
+_GRAMS: Dict[str, List[int]] = {}
+
+
+def _dir() -> str:
+    return os.path.join(data_dir(), "trends")
+
+
+def _path(name: str) -> str:
+    return os.path.join(_dir(), name)
+
+
+def title_hash(title: str) -> str:
+    return hashlib.blake2b(normalize_text(title).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _add_title(line: str):
+    h, _, title = line.partition("\t")
+    tid = len(_TITLES)
+    _TITLE_IDS.setdefault(h, tid)
+    _TITLES.append(title)
+    norm = normalize_text(title)
+    _NORMS.append(norm)
+    for g in _grams(norm):
+        _GRAMS.setdefault(g, []).append(tid)
+
+
+def _add_platform(line: str):
+    _PLATFORM_IDS.setdefault(line.strip(), len(_PLATFORMS))
+    _PLATFORMS.append(line.strip())
+
+
+def _read_new(fname: str, add: Callable[[str], None]):
+    """读入字典文件自上次以来追加的完整行（行号即 id）。调用方持有 _LOCK。"""
+    try:
+        with open(_path(fname), "rb") as f:
+            f.seek(_OFFSETS.get(fname, 0))
+            data = f.read()
+    except FileNotFoundError:
+        return
+    end = data.rfind(b"\n") + 1
+    if not end:
+        return
+    _OFFSETS[fname] = _OFFSETS.get(fname, 0) + end
+    for line in data[:end].decode("utf-8").split("\n")[:-1]:
+        add(line)
+
+
+def _load():
+    """首次使用（或 DATA_DIR 变化）时载入标题/平台字典，之后增量读入其他进程追加的行。调用方持有 _LOCK。"""
+    global _LOADED_DIR
+    if _LOADED_DIR != _dir():
+        os.makedirs(_dir(), exist_ok=True)
+        _TITLES.clear()
+        _TITLE_IDS.clear()
+        _PLATFORMS.clear()
+        _PLATFORM_IDS.clear()
+        _LAST_SNAPSHOT.clear()
+        _OFFSETS.clear()
+        _NORMS.clear()
+        _GRAMS.clear()
+        _LOADED_DIR = _dir()
+    _read_new("titles.tsv", _add_title)
+    _read_new("platforms.txt", _add_platform)
+
+
+@contextmanager
+def _file_lock() -> Iterator[None]:
+    """跨进程写锁；持有期间字典文件只有本进程追加。调用方持有 _LOCK。"""
+    with open(_path(".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _intern(ids: Dict[str, int], key: str, fname: str, line: str, add: Callable[[str], None]) -> int:
+    """查找或分配 id；调用方持有文件锁且刚同步过字典，新行的行号即当前条数。"""
+    if key not in ids:
+        raw = (line + "\n").encode("utf-8")
+        with open(_path(fname), "ab") as f:
+            f.write(raw)
+        _OFFSETS[fname] = _OFFSETS.get(fname, 0) + len(raw)
+        add(line)
+    return ids[key]
+
+
+def append_snapshot(platform: str, titles: Iterable[str], ts: Optional[float] = None, force: bool = False) -> int:
+    """
+    记录一次热榜快照（titles 按榜单顺序，排名从 1 开始）；同一平台 TREND_SNAPSHOT_INTERVAL_S 内只记一次。
+    返回写入的记录数。
+    """
+    now = ts if ts is not None else time.time()
+    with _LOCK:
+        _load()
+        if not force and now - _LAST_SNAPSHOT.get(platform, 0.0) < trend_snapshot_interval_seconds():
+            return 0
+        _LAST_SNAPSHOT[platform] = now
+        with _file_lock():
+            _load()
+            pid = _intern(_PLATFORM_IDS, platform, "platforms.txt", platform, _add_platform)
+            buf = bytearray()
+            for rank, title in enumerate(titles, start=1):
+                title = " ".join((title or "").split())
+                if not title:
+                    continue
+                h = title_hash(title)
+                tid = _intern(_TITLE_IDS, h, "titles.tsv", f"{h}\t{title}", _add_title)
+                buf += _RECORD.pack(int(now), tid, min(rank, 0xFFFF), pid)
+            if buf:
+                with open(_path("records.bin"), "ab") as f:
+                    f.write(buf)
+        return len(buf) // _RECORD.size
+
+
+def titles() -> List[Tuple[int, str]]:
+    """标题字典快照：[(title_id, title)]，供调用方做匹配。"""
+    with _LOCK:
+        _load()
+        return list(enumerate(_TITLES))
+
+
+def similar_titles(terms: Iterable[str], min_ratio: float = 0.8) -> List[Tuple[int, str]]:
+    """
+    按 2-gram 倒排索引取出可能与 terms 匹配的标题 [(title_id, title)]：规范化后包含某个 term（含其全部 2-gram），
+    或长度相近、至少共享一个 2-gram（SequenceMatcher 相似度达到 min_ratio 的必要条件）。只缩小候选，精确判断由调用方完成。
+    """
+    with _LOCK:
+        _load()
+        out: Set[int] = set()
+        for term in terms:
+            nt = normalize_text(term)
+            if not nt:
+                continue
+            if len(nt) < 2:
+                # 单字词没有 2-gram，逐条检查
+                out.update(tid for tid, norm in enumerate(_NORMS) if nt in norm)
+                continue
+            postings = sorted((_GRAMS.get(g, []) for g in _grams(nt)), key=len)
+            common = set(postings[0])
+            for p in postings[1:]:
+                if not common:
+                    break
+                common.intersection_update(p)
+            out |= common
+            lo, hi = len(nt) * min_ratio / (2 - min_ratio), len(nt) * (2 - min_ratio) / min_ratio
+            for p in postings:
+                out.update(tid for tid in p if lo <= len(_NORMS[tid]) <= hi)
+        return [(tid, _TITLES[tid]) for tid in sorted(out)]
+
+
+class _TsView:
+    """把 mmap 中的记录暴露为按时间戳可二分的序列。"""
+
+    def __init__(self, mm):
+        self.mm = mm
+
+    def __len__(self):
+        return len(self.mm) // _RECORD.size
+
+    def __getitem__(self, i):
+        return _RECORD.unpack_from(self.mm, i * _RECORD.size)[0]
+
+
+def query(title_ids: Set[int], since: float, until: Optional[float] = None) -> List[Dict]:
+    """返回 [since, until] 内命中 title_ids 的记录：[{ts, platform, rank, title}]，按时间升序。"""
+    if not title_ids:
+        return []
+    with _LOCK:
+        _load()
+        platforms = list(_PLATFORMS)
+        names = list(_TITLES)
+    path = _path("records.bin")
+    if not os.path.exists(path) or os.path.getsize(path) < _RECORD.size:
+        return []
+    until = until if until is not None else time.time()
+    out: List[Dict] = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = _TsView(mm)
+        lo = bisect.bisect_left(view, int(since))
+        hi = bisect.bisect_right(view, int(until))
+        if lo >= hi:
+            return []
+        chunk = mm[lo * _RECORD.size: hi * _RECORD.size]
+    for ts, tid, rank, pid in _RECORD.iter_unpack(chunk):
+        # 读取字典之后才追加的标题不在 title_ids 中；越界 id 只可能来自损坏的文件
+        if tid in title_ids and tid < len(names):
+            out.append({"ts": ts, "platform": platforms[pid] if pid < len(platforms) else str(pid), "rank": rank, "title": names[tid]})
+    return out
+
+
+def stats() -> Dict:
+    with _LOCK:
+        _load()
+        n_titles, n_platforms = len(_TITLES), len(_PLATFORMS)
+    path = _path("records.bin")
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return {"records": size // _RECORD.size, "bytes": size, "titles": n_titles, "platforms": n_platforms}
@@ -0,0 +1,158 @@
+"""
+启动预热：新进程的缓存全空、模板未编译、延迟载入的依赖（feedparser 等）尚未导入，首个请求要承担全部冷启动开销。
+WARMUP_ENABLED=1 时 Web 服务在就绪前依次：
+
+- 拉取全部热榜与 RSS feed（WARMUP_FEEDS=0 时跳过）：注册表非空时由 feed 调度器按并发与礼貌限速各拉一次（之后后台调度从此继续排期），
+  否则并发拉取内置源
+- 编译页面模板
+- 以 WARMUP_SOURCE 并发预分析 WARMUP_TOPICS，检索、正文与指标结果进入缓存
+
+启动最多等待 WARMUP_TIMEOUT_S，超时后服务照常就绪、预热在后台继续；/ready 在预热完成前返回 503，供负载均衡与自动扩缩容判断。
+各阶段耗时见 status() 与 weiyu_startup_seconds 指标。也可单独运行以测量预热耗时：
+    python -m app.warmup --topics 小鹏汽车,华为
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import warmup_feeds_enabled, warmup_source, warmup_topics
+from app.feed_scheduler import get_scheduler
+from app.orchestrator import get_orchestrator
+from app.providers.rss import fetch_feed_entries, rss_feeds
+from app.providers.trending import refresh_trends
+from app.render import ENV
+from app.utils import feed_registry
+from app.utils.instrument import InstrumentedThreadPool, gauge_set
+
+# 预分析的并发话题数（各话题内部已有并发，再多只会挤占上游配额）
+_TOPIC_WORKERS = 4
+
+_LOCK = threading.Lock()
+_STATE: Dict = {"state": "idle", "started_at": None, "finished_at": None, "steps": {}, "topics": []}
+
+
+def _step(name: str, fn):
+    t0 = time.perf_counter()
+    try:
+        detail = fn()
+    except Exception as e:
+        detail = {"error": type(e).__name__}
+    dt = time.perf_counter() - t0
+    with _LOCK:
+        _STATE["steps"][name] = {"seconds": round(dt, 3), **(detail or {})}
+    gauge_set("weiyu_startup_seconds", dt, phase=f"warmup_{name}")
+
+
+def _warm_feeds() -> Dict:
+    if feed_registry.feeds():
+        snap = get_scheduler().run_once()
+        return {"feeds": len(snap["feeds"]), "failures": sum(1 for f in snap["feeds"] if f["last_ok"] is None)}
+    trends = refresh_trends()
+    urls = rss_feeds()
+    executor = InstrumentedThreadPool("warmup", max_workers=max(1, min(8, len(urls))))
+    try:
+        fetched = sum(1 for entries in executor.map(fetch_feed_entries, urls) if entries)
+    finally:
+        executor.shutdown(wait=True)
+    return {"feeds": len(trends) + len(urls), "failures": sum(1 for e in trends.values() if not e) + len(urls) - fetched}
+
+
+def _warm_templates() -> Dict:
+    names = ["index.html", "report.html"]
+    for name in names:
+        ENV.get_template(name)
+    return {"templates": len(names)}
+
+
+def _analyze(topic: str, source: str) -> Dict:
+    t0 = time.perf_counter()
+    try:
+        report = get_orchestrator().analyze(topic=topic, source=source, fast=True)
+        items, error = len(report.get("items") or []), ""
+    except Exception as e:
+        items, error = 0, type(e).__name__
+    out = {"topic": topic, "seconds": round(time.perf_counter() - t0, 3), "items": items}
+    if error:
+        out["error"] = error
+    return out
+
+
+def _warm_topics(topics: List[str], source: str) -> Dict:
+    if not topics:
+        return {"topics": 0}
+    executor = InstrumentedThreadPool("warmup", max_workers=min(_TOPIC_WORKERS, len(topics)))
+    try:
+        results = list(executor.map(lambda t: _analyze(t, source), topics))
+    finally:
+        executor.shutdown(wait=True)
+    with _LOCK:
+        _STATE["topics"] = results
+    return {"topics": len(results)}
+
+
+def run(topics: Optional[List[str]] = None, source: Optional[str] = None, feeds: Optional[bool] = None) -> Dict:
+    """执行一次预热（阻塞），返回 status()。同一进程内重复调用时，进行中的预热不会重复启动。"""
+    with _LOCK:
+        busy = _STATE["state"] == "running"
+        if not busy:
+            _STATE.update(state="running", started_at=time.time(), finished_at=None, steps={}, topics=[])
+    if busy:
+        return status()
+    t0 = time.perf_counter()
+    if warmup_feeds_enabled() if feeds is None else feeds:
+        _step("feeds", _warm_feeds)
+    _step("templates", _warm_templates)
+    _step("topics", lambda: _warm_topics(warmup_topics() if topics is None else topics, source or warmup_source()))
+    gauge_set("weiyu_startup_seconds", time.perf_counter() - t0, phase="warmup")
+    with _LOCK:
+        _STATE.update(state="ready", finished_at=time.time())
+    return status()
+
+
+def ready() -> bool:
+    """未开启预热时恒为 True；开启时预热完成后为 True。"""
+    return _STATE["state"] not in ("pending", "running")
+
+
+def mark_pending():
+    """lifespan 决定预热后、线程真正开始前调用，避免 /ready 在这段空档内误报就绪。"""
+    with _LOCK:
+        if _STATE["state"] != "running":
+            _STATE["state"] = "pending"
+
+
+def process_uptime() -> Optional[float]:
+    """本进程已运行的秒数（含解释器启动与模块导入；读 /proc，非 Linux 为 None），用于统计冷启动到就绪的耗时。"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def status() -> Dict:
+    with _LOCK:
+        out = {k: v for k, v in _STATE.items() if k not in ("steps", "topics")}
+        out["steps"] = {k: dict(v) for k, v in _STATE["steps"].items()}
+        out["topics"] = [dict(t) for t in _STATE["topics"]]
+    if out["started_at"] and out["finished_at"]:
+        out["seconds"] = round(out["finished_at"] - out["started_at"], 3)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Warm caches as a web worker would at startup")
+    ap.add_argument("--topics", default=None, help="逗号分隔的预分析话题（默认 WARMUP_TOPICS）")
+    ap.add_argument("--source", default=None, help="检索来源（默认 WARMUP_SOURCE）")
+    ap.add_argument("--no-feeds", action="store_true", help="跳过热榜/RSS 拉取")
+    args = ap.parse_args()
+    topics = [t.strip() for t in args.topics.split(",") if t.strip()] if args.topics is not None else None
+    print(json.dumps(run(topics=topics, source=args.source, feeds=False if args.no_feeds else None), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+本地正文抽取离线校验与基准：对 bench/fixtures/html/ 中保存的页面运行抽取器，
+按 expected.json 检查应包含/应排除的片段（或应判定为失败），并测量首次抽取与命中域名规则后的耗时。
+
+用法：
+    python -m bench.bench_extract --repeat 50 --out bench_extract.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.utils.extract import extract_html
+
+HTML_DIR = Path(__file__).parent / "fixtures" / "html"
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 3)
+
+
+def run(html_dir: Path, repeat: int) -> dict:
+    expected = json.loads((html_dir / "expected.json").read_text(encoding="utf-8"))
+    pages = {}
+    failures = []
+    for name, exp in expected.items():
+        html = (html_dir / name).read_bytes()
+        result = extract_html(html)
+        text = result["text"]
+        problems = []
+        if exp.get("fail"):
+            if text:
+                problems.append("应判定为抽取失败")
+        else:
+            problems += [f"缺少：{s}" for s in exp.get("contains", []) if s not in text]
+            problems += [f"误含：{s}" for s in exp.get("excludes", []) if s in text]
+        pages[name] = {
+            "bytes": len(html),
+            "chars": len(text),
+            "rule": result["rule"],
+            "extract_ms": _best_ms(lambda: extract_html(html), repeat),
+            "with_rule_ms": _best_ms(lambda: extract_html(html, rule=result["rule"]), repeat) if result["rule"] else None,
+            "problems": problems,
+        }
+        failures += [f"{name}: {p}" for p in problems]
+    return {"pages": pages, "failures": failures}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline HTML extraction check")
+    ap.add_argument("--dir", default=str(HTML_DIR))
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", default="")
+    args = ap.parse_args()
+    result = run(Path(args.dir), args.repeat)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+    sys.exit(1 if result["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+RSS 相关性评分基准：对比逐条 SequenceMatcher（rss._relevance）与批量 n-gram 引擎（score_entries）。
+
+用法：
+    python -m bench.bench_relevance --entries 3000 --out bench_relevance.json
+"""
+import argparse
+import json
+import random
+import time
+
+from app.providers.rss import _relevance
+from app.utils.relevance import score_entries
+from app.utils.terms import expand_terms
+
+_WORDS = [
+    "小鹏", "汽车", "发布", "新车", "降价", "销量", "电池", "芯片", "自动驾驶", "财报",
+    "用户", "投诉", "充电", "海外", "市场", "股价", "xpeng", "新能源", "政策", "补贴",
+    "天气", "足球", "电影", "手机", "科技", "教育", "旅游", "美食", "健康", "房价",
+]
+
+
+def _synthetic_entries(n: int, sentences: int = 6, seed: int = 7):
+    rnd = random.Random(seed)
+    entries = []
+    for _ in range(n):
+        title = "".join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 8)))
+        summary = "。".join(
+            "".join(rnd.choice(_WORDS) for _ in range(rnd.randint(5, 15)))
+            for _ in range(rnd.randint(max(1, sentences // 3), sentences))
+        )
+        entries.append((title, summary))
+    return entries
+
+
+def run(n_entries: int, query: str, repeat: int, sentences: int = 6) -> dict:
+    entries = _synthetic_entries(n_entries, sentences)
+    terms = expand_terms(query)
+
+    def _best(fn):
+        best = None
+        out = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        return best, out
+
+    t_difflib, rel_difflib = _best(lambda: [_relevance(t, s, terms) for t, s in entries])
+    t_ngram, rel_ngram = _best(lambda: score_entries(entries, terms))
+    agree = sum(1 for a, b in zip(rel_difflib, rel_ngram) if a["related"] == b["related"])
+    return {
+        "entries": n_entries,
+        "avg_summary_chars": round(sum(len(s) for _, s in entries) / max(1, n_entries), 1),
+        "terms": len(terms),
+        "difflib_seconds": round(t_difflib, 4),
+        "ngram_seconds": round(t_ngram, 4),
+        "speedup": round(t_difflib / t_ngram, 2) if t_ngram else None,
+        "related_agreement": round(agree / max(1, n_entries), 4),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RSS relevance scoring benchmark")
+    ap.add_argument("--entries", type=int, default=3000)
+    ap.add_argument("--query", default="小鹏汽车 降价")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--sentences", type=int, default=6, help="每条摘要的最大句数（控制摘要长度）")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args()
+    result = run(args.entries, args.query, args.repeat, args.sentences)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+冷启动基准：对本地桩上游启动全新的 uvicorn 工作进程，测量
+- import_ms：导入 app.main 的耗时（单独子进程）
+- ready_ms：从启动进程到 /ready 返回 200
+- first_ms / second_ms：就绪后第一、二次 /api/analyze 的延迟（第一次即“冷启动后首个请求”）
+- cold_start_to_first_fast_ms：启动进程到首个请求返回的总耗时
+
+分别在关闭预热、完整预热（拉取全部 feed 并预分析 --topic）与只预分析话题（WARMUP_FEEDS=0）时
+各运行 --runs 次，每次使用全新的 DATA_DIR：
+    python -m bench.bench_startup --topic 小鹏汽车 --runs 3 --latency-ms 80
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from bench.stub_server import add_stub_arguments, config_from_args, start_stub_server
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _import_ms(env: Dict[str, str]) -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return round(float(out.stdout.strip().splitlines()[-1]) * 1000, 1)
+
+
+def _wait_ready(base: str, proc: subprocess.Popen, timeout: float) -> Optional[Dict]:
+    end = time.time() + timeout
+    while time.time() < end and proc.poll() is None:
+        try:
+            with urlopen(f"{base}/ready", timeout=1) as resp:
+                return json.loads(resp.read())
+        except HTTPError as e:
+            if e.code != 503:
+                raise
+        except (URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def _analyze(base: str, topic: str, source: str) -> float:
+    body = urlencode({"topic": topic, "source": source, "fast": "on"}).encode("utf-8")
+    req = Request(f"{base}/api/analyze?fields=topic", data=body, method="POST")
+    t0 = time.perf_counter()
+    with urlopen(req, timeout=60) as resp:
+        resp.read()
+    return time.perf_counter() - t0
+
+
+def run_once(base_env: Dict[str, str], topic: str, source: str, warmup: Dict[str, str], timeout: float) -> Dict:
+    port = _free_port()
+    env = dict(base_env, DATA_DIR=tempfile.mkdtemp(prefix="weiyu_startup_"))
+    if warmup:
+        env.update(WARMUP_ENABLED="1", WARMUP_TOPICS=topic, WARMUP_SOURCE=source, **warmup)
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = _wait_ready(base, proc, timeout)
+        if ready is None:
+            return {"error": "worker did not become ready"}
+        ready_s = time.perf_counter() - t0
+        first = _analyze(base, topic, source)
+        second = _analyze(base, topic, source)
+        return {
+            "ready_ms": round(ready_s * 1000, 1),
+            "first_ms": round(first * 1000, 1),
+            "second_ms": round(second * 1000, 1),
+            "cold_start_to_first_fast_ms": round((ready_s + first) * 1000, 1),
+            "ready_after_seconds": ready["startup"].get("ready_after_seconds"),
+            "warmup_steps": ready["warmup"].get("steps", {}),
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def _median(runs, key: str) -> Optional[float]:
+    values = [r[key] for r in runs if key in r]
+    return round(statistics.median(values), 1) if values else None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cold-start benchmark: fresh uvicorn worker to first fast response")
+    ap.add_argument("--topic", default="小鹏汽车")
+    ap.add_argument("--source", default="rss", choices=["rss", "wiki", "jina", "serper", "baidu"])
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=60.0, help="等待工作进程就绪的最长秒数")
+    ap.add_argument("--out", default="")
+    add_stub_arguments(ap)
+    args = ap.parse_args()
+
+    stub = start_stub_server(config_from_args(args))
+    env = dict(
+        os.environ,
+        UPSTREAM_OVERRIDE=f"http://127.0.0.1:{stub.server_address[1]}",
+        SERPER_API_KEY="bench",
+        BAIDU_APPBUILDER_API_KEY="bench",
+        MEILISEARCH_URL="",
+        READER_MAX_AGE_DAYS="0",
+        PYTHONPATH=os.getcwd() + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    )
+    result: Dict = {"params": {"topic": args.topic, "source": args.source, "runs": args.runs, "latency_ms": args.latency_ms}}
+    result["import_ms"] = statistics.median(_import_ms(env) for _ in range(max(1, args.runs)))
+    variants = (("cold", {}), ("warmup", {"WARMUP_FEEDS": "1"}), ("warmup_topics_only", {"WARMUP_FEEDS": "0"}))
+    for name, warmup in variants:
+        runs = [run_once(env, args.topic, args.source, warmup, args.timeout) for _ in range(max(1, args.runs))]
+        result[name] = {
+            "median": {k: _median(runs, k) for k in ("ready_ms", "first_ms", "second_ms", "cold_start_to_first_fast_ms")},
+            "runs": runs,
+        }
+    stub.shutdown()
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+离线基准套件：启动本地桩上游（bench/stub_server.py），将全部上游请求改写到桩服务后测量：
+- 各阶段耗时（search / reader / pageviews / trending / report / render），冷缓存与热缓存各一次
+- Orchestrator.analyze 冷/热缓存延迟
+- N 个并发客户端压测 /analyze 的吞吐与 p50/p95/p99 延迟
+
+结果以 JSON 输出，便于多次运行间对比：
+    python -m bench.run_bench --topic 小鹏汽车 --clients 8 --requests 5 --out bench_result.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from bench.stub_server import add_stub_arguments, config_from_args, start_stub_server
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _summary(values: List[float]) -> Dict:
+    return {
+        "n": len(values),
+        "mean_ms": round(statistics.mean(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50) * 1000, 2),
+        "p95_ms": round(_percentile(values, 95) * 1000, 2),
+        "p99_ms": round(_percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def _timed(fn: Callable):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def measure_stages(topic: str, source: str) -> Dict[str, float]:
+    from app.agents.query_agent import QueryAgent
+    from app.agents.report_agent import ReportAgent
+    from app.orchestrator import Orchestrator
+    from app.providers.metrics import wiki_pageviews
+    from app.providers.reader import fetch_contents_bulk
+    from app.providers.trending import trending_presence
+    from app.main import templates
+
+    timings: Dict[str, float] = {}
+    timings["search"], items = _timed(lambda: QueryAgent().search(topic=topic, max_items=12, source=source))
+    urls = [it.get("url") for it in items[:10] if it.get("url")]
+    timings["reader"], _ = _timed(lambda: fetch_contents_bulk(urls, timeout_seconds=4.0, max_chars=4000, max_workers=6))
+    timings["pageviews"], _ = _timed(lambda: (wiki_pageviews(topic, lang="zh"), wiki_pageviews(topic, lang="en")))
+    timings["trending"], _ = _timed(lambda: trending_presence(topic))
+    timings["report"], _ = _timed(lambda: ReportAgent().generate_report(topic=topic, items=items))
+    report = Orchestrator().analyze(topic=topic, source=source)
+    template = templates.get_template("report.html")
+    ctx = {"request": None, "topic": topic, "report": report, "source": source, "fast": False}
+    timings["render"], _ = _timed(lambda: template.render(ctx))
+    return {k: round(v * 1000, 2) for k, v in timings.items()}
+
+
+def measure_analyze(topic: str, source: str, rounds: int, fast: bool) -> Dict:
+    from app.orchestrator import Orchestrator
+    from app.utils.cache import clear_all_caches
+
+    cold, warm = [], []
+    for _ in range(rounds):
+        clear_all_caches()
+        dt, _ = _timed(lambda: Orchestrator().analyze(topic=topic, source=source, fast=fast))
+        cold.append(dt)
+        dt, _ = _timed(lambda: Orchestrator().analyze(topic=topic, source=source, fast=fast))
+        warm.append(dt)
+    return {"cold": _summary(cold), "warm": _summary(warm)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_throughput(topic: str, source: str, clients: int, requests_per_client: int, fast: bool) -> Dict:
+    import httpx
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{port}/analyze"
+    form = {"topic": topic, "source": source, "fast": "on" if fast else "off"}
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def _client():
+        nonlocal errors
+        with httpx.Client(timeout=120) as client:
+            for _ in range(requests_per_client):
+                t0 = time.perf_counter()
+                try:
+                    resp = client.post(url, data=form)
+                    ok = resp.status_code == 200
+                except Exception:
+                    ok = False
+                dt = time.perf_counter() - t0
+                with lock:
+                    latencies.append(dt)
+                    if not ok:
+                        errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as ex:
+        for _ in range(clients):
+            ex.submit(_client)
+    wall = time.perf_counter() - t0
+    server.should_exit = True
+
+    out = _summary(latencies)
+    out.update({
+        "clients": clients,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 2) if wall else 0.0,
+    })
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark suite against a local stub upstream")
+    ap.add_argument("--topic", default="小鹏汽车")
+    ap.add_argument("--source", default="rss", choices=["rss", "wiki", "jina", "serper", "baidu"])
+    ap.add_argument("--fast", action="store_true")
+    ap.add_argument("--rounds", type=int, default=3, help="冷/热缓存 analyze 轮数")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=5, help="每个客户端的请求数")
+    ap.add_argument("--skip-throughput", action="store_true")
+    ap.add_argument("--out", default="")
+    add_stub_arguments(ap)
+    args = ap.parse_args()
+
+    stub_cfg = config_from_args(args)
+    stub = start_stub_server(stub_cfg)
+    os.environ["UPSTREAM_OVERRIDE"] = f"http://127.0.0.1:{stub.server_address[1]}"
+    # 付费搜索走桩服务；关闭外部索引，保证可重复
+    os.environ["SERPER_API_KEY"] = "bench"
+    os.environ["BAIDU_APPBUILDER_API_KEY"] = "bench"
+    os.environ["MEILISEARCH_URL"] = ""
+    # 桩数据的发布时间是固定的历史日期，不按时间跳过正文抽取
+    os.environ["READER_MAX_AGE_DAYS"] = "0"
+
+    from app.utils.cache import clear_all_caches
+
+    result: Dict = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {
+            "topic": args.topic,
+            "source": args.source,
+            "fast": args.fast,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "host_latency_ms": stub_cfg.host_latency_ms,
+        },
+    }
+    clear_all_caches()
+    result["stages_cold_ms"] = measure_stages(args.topic, args.source)
+    result["stages_warm_ms"] = measure_stages(args.topic, args.source)
+    result["analyze"] = measure_analyze(args.topic, args.source, args.rounds, args.fast)
+    if not args.skip_throughput:
+        clear_all_caches()
+        result["throughput"] = measure_throughput(args.topic, args.source, args.clients, args.requests, args.fast)
+    result["stub"] = {"requests": stub_cfg.request_count, "injected_errors": stub_cfg.error_count}
+    stub.shutdown()
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+离线上游桩服务：以录制的 fixtures 模拟 rsshub.app / r.jina.ai / wikimedia / Wikipedia / Serper / 百度AI搜索。
+
+配合 UPSTREAM_OVERRIDE 使用：应用把 https://host/path 改写为 {stub}/host/path。
+路由规则：优先查找 fixtures/<host>/<path 以 _ 连接>（如 fixtures/rsshub.app/36kr_newsflashes.xml），
+找不到则按 host 回退到通用 fixture（RSS 区分资讯源与热榜源）；其它 host 视为文章原站，返回 fixtures/html/<host>.html。
+
+用法：
+    python -m bench.stub_server --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.providers.trending import TREND_FEEDS
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+_TREND_PATHS = {urlsplit(u).path for u in TREND_FEEDS.values()}
+
+# host -> (通用 fixture 文件, Content-Type)
+_HOST_FIXTURES: Dict[str, Tuple[str, str]] = {
+    "rsshub.app": ("rss_default.xml", "application/rss+xml; charset=utf-8"),
+    # config/feeds.json 中配置的 RSSHub 镜像
+    "rsshub.rssforever.com": ("rss_default.xml", "application/rss+xml; charset=utf-8"),
+    "hub.slarker.me": ("rss_default.xml", "application/rss+xml; charset=utf-8"),
+    "r.jina.ai": ("reader.txt", "text/plain; charset=utf-8"),
+    "wikimedia.org": ("pageviews.json", "application/json"),
+    "zh.wikipedia.org": ("wiki_search.json", "application/json"),
+    "google.serper.dev": ("serper.json", "application/json"),
+    "qianfan.baidubce.com": ("baidu.json", "application/json"),
+}
+
+
+def _pageviews_body(path: str, fixture: bytes) -> bytes:
+    """按请求的起止日期重排录制的日浏览量时间戳，使按日缓存的补齐逻辑在任意日期下都可复现。"""
+    segs = path.rstrip("/").split("/")
+    try:
+        start = datetime.strptime(segs[-2][:8], "%Y%m%d")
+        end = datetime.strptime(segs[-1][:8], "%Y%m%d")
+        recorded = json.loads(fixture).get("items", [])
+    except (IndexError, ValueError):
+        return fixture
+    items = []
+    for i in range((end - start).days + 1):
+        src = dict(recorded[i % len(recorded)]) if recorded else {"views": 0}
+        src["timestamp"] = (start + timedelta(days=i)).strftime("%Y%m%d00")
+        items.append(src)
+    return json.dumps({"items": items}).encode()
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 host_latency_ms: Optional[Dict[str, float]] = None, fixture_dir: Path = FIXTURE_DIR, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.host_latency_ms = host_latency_ms or {}
+        self.fixture_dir = fixture_dir
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+    def delay_seconds(self, host: str) -> float:
+        base = self.host_latency_ms.get(host, self.latency_ms)
+        with self.lock:
+            jitter = self.rnd.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base + jitter) / 1000.0
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self.lock:
+            return self.rnd.random() < self.error_rate
+
+    def resolve(self, host: str, path: str) -> Optional[Tuple[Path, str]]:
+        generic = _HOST_FIXTURES.get(host)
+        if not generic:
+            # 其余 host 视为文章原站：fixtures/html/<host>.html（供本地正文抽取）
+            page = self.fixture_dir / "html" / f"{host}.html"
+            return (page, "text/html") if page.is_file() else None
+        name, ctype = generic
+        # 精确 fixture：fixtures/<host>/<path>
+        specific = self.fixture_dir / host / (path.strip("/").replace("/", "_") or "index")
+        for candidate in (specific, specific.with_suffix(Path(name).suffix)):
+            if candidate.is_file():
+                return candidate, ctype
+        if name == "rss_default.xml" and path in _TREND_PATHS:
+            name = "trend_default.xml"
+        return self.fixture_dir / name, ctype
+
+
+def _make_handler(cfg: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 响应头与响应体分两次写出；复用长连接时关闭 Nagle，避免与客户端延迟 ACK 叠加出约 40ms 的停顿
+        disable_nagle_algorithm = True
+
+        def _serve(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            parts = urlsplit(self.path)
+            segs = parts.path.lstrip("/").split("/", 1)
+            host = segs[0]
+            path = "/" + (segs[1] if len(segs) > 1 else "")
+            with cfg.lock:
+                cfg.request_count += 1
+            time.sleep(cfg.delay_seconds(host))
+            resolved = cfg.resolve(host, path)
+            if resolved is None or not resolved[0].is_file():
+                return self._reply(404, b"not found", "text/plain")
+            if cfg.should_fail():
+                with cfg.lock:
+                    cfg.error_count += 1
+                return self._reply(503, b"injected error", "text/plain")
+            fpath, ctype = resolved
+            body = fpath.read_bytes()
+            if host == "wikimedia.org":
+                body = _pageviews_body(path, body)
+            self._reply(200, body, ctype)
+
+        def _reply(self, status: int, body: bytes, ctype: str):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端已按超时/预算放弃请求
+                pass
+
+        do_GET = _serve
+        do_POST = _serve
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(cfg: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务，返回 server（server.server_address 含实际端口）。"""
+    server = ThreadingHTTPServer((host, port), _make_handler(cfg))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_host_latency(values) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for v in values or []:
+        host, _, ms = v.partition("=")
+        if host and ms:
+            out[host.strip()] = float(ms)
+    return out
+
+
+def add_stub_arguments(ap: argparse.ArgumentParser):
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="上游基础延迟")
+    ap.add_argument("--jitter-ms", type=float, default=20.0, help="延迟抖动上限")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="注入 503 的概率")
+    ap.add_argument("--host-latency", action="append", default=[], metavar="HOST=MS", help="按 host 覆盖延迟，可重复")
+    ap.add_argument("--fixtures", default=str(FIXTURE_DIR))
+    ap.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        host_latency_ms=parse_host_latency(args.host_latency),
+        fixture_dir=Path(args.fixtures),
+        seed=args.seed,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline upstream stub server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(ap)
+    args = ap.parse_args()
+    server = start_stub_server(config_from_args(args), args.host, args.port)
+    print(f"stub upstream on http://{args.host}:{server.server_address[1]} (set UPSTREAM_OVERRIDE to this)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()